@@ -0,0 +1,72 @@
+"""
+    Benchmark of traversing and printing deeply embedded trees.
+
+    Builds a synthetic chain-like tree of each depth, 
+    whose nodes have a terminal and a non-terminal child except the deepest one,
+    and reports the time per node of the traversals and the printers.
+    The time per node should stay flat as the depth grows;
+    the printers are also reported per output character
+    since the indents make the output size grow faster than the number of nodes.
+
+    Usage:
+        python benchmarks/bench_deep.py [DEPTH ...]
+"""
+
+import io
+import sys
+import time
+import typing
+
+import kail.structures as strs
+
+def build_deep_tree(depth: int) -> strs.TreeWithParent:
+    text = "(X (N a) " * depth + "(N b)" + ")" * depth
+    tree, = strs.TreeWithParent.iter_kai_penn(io.StringIO(text))
+    return tree
+
+    # ===END===
+
+def measure(task: typing.Callable[[], object], trials: int = 3) -> typing.Tuple[object, float]:
+    """
+        Run the task and take the best elapsed time of the trials.
+    """
+    result = None
+    elapsed = float("inf")
+
+    for _ in range(trials):
+        begin = time.perf_counter()
+        result = task()
+        elapsed = min(elapsed, time.perf_counter() - begin)
+
+    return result, elapsed
+
+    # ===END===
+
+def main(*depths: int) -> None:
+    for depth in depths or (500, 1000, 2000, 4000):
+        tree = build_deep_tree(depth)
+        nodes = sum(1 for _ in tree.traverse_dfs_pre())
+
+        for name, task in (
+            ("traverse_dfs_pre", lambda: sum(1 for _ in tree.traverse_dfs_pre())),
+            ("traverse_dfs_post", lambda: sum(1 for _ in tree.traverse_dfs_post())),
+            ("print_kai_penn_indented", tree.print_kai_penn_indented),
+            ("print_kail", tree.print_kail),
+            ):
+            result, elapsed = measure(task)
+            chars = len(result) if isinstance(result, str) else 0
+
+            print(
+                "depth {depth:6d} {name:24} {per_node:8.2f} us/node{per_char}".format(
+                    depth = depth,
+                    name = name,
+                    per_node = elapsed / nodes * 1e6,
+                    per_char = " {:8.4f} us/char".format(elapsed / chars * 1e6) \
+                        if chars else ""
+                    )
+                )
+
+    # ===END===
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,129 @@
+"""
+    Benchmark of the memory footprint of parsed trees.
+
+    Parses tests/sample_correct.psd repeated a number of times
+    and reports the bytes allocated per node, as traced by tracemalloc,
+    while the whole document is kept in memory.
+    This is done twice: once with the classes of kail.structures as they are
+    (with __slots__), and once with copies of them without __slots__,
+    i.e. in the baseline layout where every instance carries a __dict__.
+
+    Usage:
+        python benchmarks/bench_memory.py [REPEAT]
+"""
+
+import contextlib
+import io
+import sys
+import tracemalloc
+import types
+import typing
+
+import kail.structures as strs
+
+# The classes that declare __slots__
+SLOTTED_CLASSES: typing.Tuple[str, ...] = (
+    "Object_with_Row_Column",
+    "Label_Complex_with_Pos",
+    "Comment_with_Pos",
+    "TreeWithParent",
+)
+
+def without_slots(cls: type) -> type:
+    """
+        Make a copy of a class without its __slots__.
+        The `__class__` cells of the methods (used by the zero-argument super())
+        are rebound to the copy.
+    """
+    slots = cls.__dict__.get("__slots__", ())
+    namespace = {
+        name: value 
+        for name, value in cls.__dict__.items()
+        if name not in ("__slots__", "__dict__", "__weakref__")
+            and not isinstance(value, types.MemberDescriptorType)
+    }
+    copied = type(cls.__name__, cls.__bases__, namespace)
+
+    for name, value in namespace.items():
+        if isinstance(value, types.FunctionType) \
+                and "__class__" in value.__code__.co_freevars:
+            closure = tuple(
+                types.CellType(copied) if free == "__class__" else cell
+                for free, cell in zip(value.__code__.co_freevars, value.__closure__)
+            )
+            rebound = types.FunctionType(
+                value.__code__, value.__globals__, value.__name__,
+                value.__defaults__, closure
+            )
+            rebound.__kwdefaults__ = value.__kwdefaults__
+            setattr(copied, name, rebound)
+
+    return copied
+
+    # ===END===
+
+@contextlib.contextmanager
+def baseline_layout() -> typing.Iterator[None]:
+    """
+        Replace the slotted classes in kail.structures 
+        with their copies without __slots__ for the duration.
+    """
+    originals = {name: getattr(strs, name) for name in SLOTTED_CLASSES}
+    try:
+        for name, cls in originals.items():
+            setattr(strs, name, without_slots(cls))
+        yield
+    finally:
+        for name, cls in originals.items():
+            setattr(strs, name, cls)
+
+    # ===END===
+
+def measure(text: str) -> typing.Tuple[int, int]:
+    """
+        Parse the text and give the number of the nodes 
+        and the bytes allocated for them.
+    """
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+
+    document = strs.TreeWithParent.parse_kai_penn(io.StringIO(text))
+
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(
+        stat.size_diff 
+        for stat in snapshot_after.compare_to(snapshot_before, "filename")
+        )
+    nodes = sum(1 for _ in document.traverse_dfs_pre()) - 1
+
+    return nodes, allocated
+
+    # ===END===
+
+def main(repeat: int = 20) -> None:
+    with open("./tests/sample_correct.psd") as f:
+        text = f.read() * repeat
+
+    with baseline_layout():
+        baseline = measure(text)
+    slotted = measure(text)
+
+    for layout, (nodes, allocated) in (
+            ("baseline", baseline),
+            ("__slots__", slotted),
+            ):
+        print(
+            "{layout:10s} {nodes:10d} nodes {allocated:14d} bytes {per_node:8.1f} bytes/node".format(
+                layout = layout,
+                nodes = nodes,
+                allocated = allocated,
+                per_node = allocated / nodes
+                )
+            )
+
+    # ===END===
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,84 @@
+"""
+    Benchmark of the input paths of the NPCMJ format.
+
+    Compares the time to parse a file 
+    (tests/sample_correct.psd repeated a number of times)
+    through a decoded text stream (TreeWithParent.iter_kai_penn)
+    and through a memory map scanned as bytes (TreeWithParent.iter_kai_penn_bytes).
+    The two take about the same time,
+    since the latter still decodes each line and parses it as text.
+
+    Usage:
+        python benchmarks/bench_mmap.py [REPEAT]
+"""
+
+import sys
+import os
+import mmap
+import time
+import tempfile
+import typing
+
+import kail.structures as strs
+
+def parse_text(path: str) -> int:
+    with open(path, encoding = "utf-8") as f:
+        return sum(1 for _ in strs.TreeWithParent.iter_kai_penn(f))
+
+    # ===END===
+
+def parse_mapped(path: str) -> int:
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+            return sum(1 for _ in strs.TreeWithParent.iter_kai_penn_bytes(buffer))
+
+    # ===END===
+
+def measure(
+        parser: typing.Callable[[str], int],
+        path: str,
+        trials: int = 3
+        ) -> typing.Tuple[int, float]:
+    """
+        Count the trees and take the best elapsed time of the trials.
+    """
+    count = 0
+    elapsed = float("inf")
+
+    for _ in range(trials):
+        begin = time.perf_counter()
+        count = parser(path)
+        elapsed = min(elapsed, time.perf_counter() - begin)
+
+    return count, elapsed
+
+    # ===END===
+
+def main(repeat: int = 200) -> None:
+    with open("./tests/sample_correct.psd", "rb") as f:
+        sample = f.read()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "corpus.psd")
+
+        with open(path, "wb") as f:
+            for _ in range(repeat): f.write(sample + b"\n")
+
+        for name, parser in (
+            ("text stream", parse_text),
+            ("memory map", parse_mapped),
+            ):
+            count, elapsed = measure(parser, path)
+            print(
+                "{name:12} {count:8d} trees {elapsed:8.3f} s {rate:10.0f} trees/s".format(
+                    name = name,
+                    count = count,
+                    elapsed = elapsed,
+                    rate = count / elapsed
+                    )
+                )
+
+    # ===END===
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
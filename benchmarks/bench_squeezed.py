@@ -0,0 +1,77 @@
+"""
+    Benchmark of the one-line printer of the NPCMJ format.
+
+    Compares the throughput of TreeWithParent.print_kai_penn_squeezed
+    with the former way of printing the well-indented representation
+    and then squeezing its whitespaces with re.sub,
+    on the trees of tests/sample_correct.psd repeated a number of times.
+
+    Usage:
+        python benchmarks/bench_squeezed.py [REPEAT]
+"""
+
+import io
+import re
+import sys
+import time
+import typing
+
+import kail.structures as strs
+
+def print_kai_penn_squeezed_legacy(tree: strs.TreeWithParent) -> str:
+    """
+        The former one-line printer, kept for comparison.
+    """
+    return re.sub(
+        r"\s+",
+        repl = " ",
+        string = tree.print_kai_penn_indented()
+        )
+
+    # ===END===
+
+def measure(
+        printer: typing.Callable[[strs.TreeWithParent], str],
+        trees: typing.List[strs.TreeWithParent],
+        trials: int = 5
+        ) -> typing.Tuple[int, float]:
+    """
+        Count the printed characters and take the best elapsed time of the trials.
+    """
+    count = 0
+    elapsed = float("inf")
+
+    for _ in range(trials):
+        begin = time.perf_counter()
+        count = sum(len(printer(tree)) for tree in trees)
+        elapsed = min(elapsed, time.perf_counter() - begin)
+
+    return count, elapsed
+
+    # ===END===
+
+def main(repeat: int = 10) -> None:
+    with open("./tests/sample_correct.psd") as f:
+        trees = list(strs.TreeWithParent.iter_kai_penn(io.StringIO(f.read() * repeat)))
+
+    nodes = sum(sum(1 for _ in tree.traverse_dfs_pre()) for tree in trees)
+
+    for name, printer in (
+        ("indented + re.sub", print_kai_penn_squeezed_legacy),
+        ("native squeezed", strs.TreeWithParent.print_kai_penn_squeezed),
+        ):
+        count, elapsed = measure(printer, trees)
+        print(
+            "{name:20} {count:10d} chars {elapsed:8.3f} s {node_rate:10.0f} nodes/s {char_rate:12.0f} chars/s".format(
+                name = name,
+                count = count,
+                elapsed = elapsed,
+                node_rate = nodes / elapsed,
+                char_rate = count / elapsed
+                )
+            )
+
+    # ===END===
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
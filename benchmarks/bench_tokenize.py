@@ -0,0 +1,104 @@
+"""
+    Benchmark of the tokenizer of the NPCMJ format.
+
+    Compares the tokens per second of TreeWithParent.tokenize_kai_penn
+    with the former character-by-character tokenizer
+    on tests/sample_correct.psd repeated a number of times.
+
+    Usage:
+        python benchmarks/bench_tokenize.py [REPEAT]
+"""
+
+import sys
+import time
+import typing
+
+import kail.structures as strs
+
+def split_line_legacy(line: str) -> typing.List[typing.Tuple[str, int]]:
+    """
+        The former tokenizer, kept for comparison.
+    """
+    tokens = []
+    token_reading = ""
+    token_beginning_num = -1
+
+    def append_and_clear_cache():
+        nonlocal tokens
+        nonlocal token_reading
+        nonlocal token_beginning_num
+
+        tokens.append((token_reading, token_beginning_num))
+
+        token_reading = ""
+        token_beginning_num = -1
+
+        # ===END===
+
+    to_be_continued = False
+
+    for column, char in enumerate(line):
+        if char in " \t\n()":
+            if to_be_continued: append_and_clear_cache()
+
+            if char in "()":
+                token_reading += char
+                token_beginning_num = column
+
+                append_and_clear_cache()
+
+            to_be_continued = False
+        else:
+            token_reading += char
+            if not to_be_continued: token_beginning_num = column
+
+            to_be_continued = True
+
+    if token_beginning_num > 0: append_and_clear_cache()
+
+    return tokens
+
+    # ===END===
+
+def measure(
+        tokenizer: typing.Callable[[str], typing.List[typing.Tuple[str, int]]],
+        lines: typing.List[str],
+        trials: int = 5
+        ) -> typing.Tuple[int, float]:
+    """
+        Count the tokens and take the best elapsed time of the trials.
+    """
+    count = 0
+    elapsed = float("inf")
+
+    for _ in range(trials):
+        begin = time.perf_counter()
+        count = sum(len(tokenizer(line)) for line in lines)
+        elapsed = min(elapsed, time.perf_counter() - begin)
+
+    return count, elapsed
+
+    # ===END===
+
+def main(repeat: int = 50) -> None:
+    with open("./tests/sample_correct.psd") as f:
+        lines = [line.rstrip().split(";;", 1)[0] for line in f] * repeat
+
+    for name, tokenizer in (
+        ("legacy split_line", split_line_legacy),
+        ("tokenize_kai_penn", strs.TreeWithParent.tokenize_kai_penn),
+        ):
+        count, elapsed = measure(tokenizer, lines)
+        print(
+            "{name:20} {count:10d} tokens {elapsed:8.3f} s {rate:12.0f} tokens/s".format(
+                name = name,
+                count = count,
+                elapsed = elapsed,
+                rate = count / elapsed
+                )
+            )
+
+    # ===END===
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
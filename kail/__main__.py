@@ -1,26 +1,380 @@
+import sys
+import os
+import functools
+import itertools
+import contextlib
+
 import click
 
-import kail.structures as strs
+import kail.conversion as conv
+
+def format_options(command):
+    """
+        Attach the options of the input/output formats to the command.
+    """
+    for option in reversed((
+        click.option(
+            "--input_format", "-i",
+            type = click.Choice(["penn", "kail"]),
+            default = "penn"
+        ),
+        click.option(
+            "--output_format", "-o",
+            type = click.Choice(["penn", "kail"]),
+            default = "penn"
+        ),
+        click.option(
+            "--comments/--no_comments",
+            default = True
+        ),
+        click.option(
+            "--compact/--pretty",
+            default = False
+        ),
+        )):
+        command = option(command)
+
+    return command
+
+    # ===END===
 
-@click.command()
+@click.group(invoke_without_command = True)
+@format_options
 @click.option(
-    "--input_format", "-i",
-    type = click.Choice(["penn", "kail"]),
-    default = "penn"
+    "--input_file", "-r",
+    type = click.File(mode = 'r'),
+    default = "-"
+)
+@click.option(
+    "--output_file", "-w",
+    type = click.File(mode = 'w'),
+    default = "-"
+)
+@click.option(
+    "--jobs", "-j",
+    type = click.IntRange(min = 1),
+    default = None,
+    help = "Split the input file at tree boundaries and convert the chunks with this many worker processes."
+)
+@click.option(
+    "--cache/--no_cache",
+    default = False,
+    help = "Reuse the trees parsed from the same input file in a previous run (stored in $KAIL_CACHE_DIR or ~/.cache/kail)."
+)
+@click.option(
+    "--incremental/--no_incremental",
+    default = False,
+    help = "Parse and print again only the trees of the input file changed since the previous run with the same options."
+)
+@click.option(
+    "--output", "-O", "outputs",
+    multiple = True,
+    metavar = "FORMAT=PATH",
+    help = "Write the output in FORMAT (" + "|".join(conv.OUTPUT_VARIANTS) + ") to PATH instead; repeatable, the input being parsed only once for all of them."
+)
+@click.pass_context
+def routine(
+        ctx,
+        input_format,
+        output_format,
+        input_file, 
+        output_file, 
+        comments, 
+        compact,
+        jobs,
+        cache,
+        incremental,
+        outputs
+        ):
+    # leave it to the subcommand, if any
+    if ctx.invoked_subcommand is not None: return
+
+    # the ways of reading the input file, only one of which can be taken
+    modes = [
+        name for name, given in (
+            ("--jobs", jobs is not None),
+            ("--cache", cache),
+            ("--incremental", incremental),
+            ("--output", bool(outputs)),
+        )
+        if given
+    ]
+
+    if len(modes) > 1:
+        raise click.UsageError(
+            "{} cannot be used together".format(" and ".join(modes))
+            )
+
+    if modes and modes != ["--output"] and not os.path.isfile(input_file.name):
+        raise click.UsageError(
+            "{} needs an input file given by --input_file".format(modes[0])
+            )
+
+    if outputs:
+        convert_multi(input_file, outputs, input_format, comments)
+        return
+
+    options = dict(
+        input_format = input_format,
+        output_format = output_format,
+        comments = comments,
+        compact = compact
+    )
+
+    if jobs is not None:
+        # a named file can be split and converted in parallel
+        conv.convert_file_parallel(
+            input_file.name, 
+            output_file, 
+            processes = jobs,
+            **options
+        )
+    elif incremental:
+        conv.convert_file_incremental(input_file.name, output_file, **options)
+    elif cache:
+        conv.convert_cached_file(input_file.name, output_file, **options)
+    else:
+        conv.convert_stream(input_file, output_file, **options)
+    # ===END===
+
+def convert_multi(input_file, outputs, input_format, comments):
+    """
+        Convert the input into the outputs given as FORMAT=PATH at once.
+    """
+    variants = []
+    for output in outputs:
+        variant, sep, path = output.partition("=")
+
+        if not sep or not path or variant not in conv.OUTPUT_VARIANTS:
+            raise click.BadParameter(
+                "{output!r} is not in the form FORMAT=PATH with FORMAT in {variants}".format(
+                    output = output,
+                    variants = ", ".join(conv.OUTPUT_VARIANTS)
+                    ),
+                param_hint = "--output"
+            )
+
+        variants.append((variant, path))
+
+    with contextlib.ExitStack() as stack:
+        conv.convert_stream_multi(
+            input_file,
+            [
+                (variant, stack.enter_context(click.open_file(path, "w", encoding = "utf-8")))
+                for variant, path in variants
+            ],
+            input_format = input_format,
+            comments = comments
+        )
+    # ===END===
+
+@routine.command()
+@format_options
+@click.option(
+    "--output_dir", "-d",
+    type = click.Path(file_okay = False),
+    required = True
 )
 @click.option(
-    "--output_format", "-o",
+    "--jobs", "-j",
+    type = click.IntRange(min = 1),
+    default = None,
+    help = "The number of worker processes (default: the number of CPUs)."
+)
+@click.argument(
+    "inputs",
+    nargs = -1,
+    required = True
+)
+def batch(
+        input_format,
+        output_format,
+        comments, 
+        compact,
+        output_dir,
+        jobs,
+        inputs
+        ):
+    """
+        Convert many files (or directories, or glob patterns) into OUTPUT_DIR in parallel.
+    """
+    failures = 0
+
+    for input_path, output_path, error in conv.convert_files(
+            conv.iter_batch_jobs(
+                inputs,
+                output_dir,
+                input_format = input_format,
+                output_format = output_format
+            ),
+            processes = jobs,
+            input_format = input_format,
+            output_format = output_format,
+            comments = comments,
+            compact = compact
+        ):
+        if error is None:
+            click.echo("{input} -> {output}".format(input = input_path, output = output_path))
+        else:
+            failures += 1
+            click.echo(
+                "{input}: {error}".format(input = input_path, error = error),
+                err = True
+            )
+
+    if failures: sys.exit(1)
+    # ===END===
+
+@routine.command()
+@click.option(
+    "--input_format", "-i",
     type = click.Choice(["penn", "kail"]),
     default = "penn"
 )
+@click.argument(
+    "inputs",
+    nargs = -1,
+    required = True,
+    type = click.Path(exists = True, dir_okay = False)
+)
+def index(input_format, inputs):
+    """
+        Index the trees in the files by their IDs, writing FILE.index.json alongside each FILE.
+    """
+    import kail.index as ix
+
+    for input_path in inputs:
+        built = ix.write_index(input_path, input_format)
+
+        click.echo(
+            "{input}: {count} IDs".format(input = input_path, count = len(built["entries"]))
+        )
+    # ===END===
+
+@routine.command()
+@format_options
 @click.option(
-    "--comments/--no_comments",
-    default = True
+    "--output_file", "-w",
+    type = click.File(mode = 'w'),
+    default = "-"
+)
+@click.argument(
+    "input_path",
+    type = click.Path(exists = True, dir_okay = False)
 )
+@click.argument(
+    "IDs",
+    nargs = -1,
+    required = True
+)
+def fetch(
+        input_format,
+        output_format,
+        comments, 
+        compact,
+        output_file,
+        input_path,
+        ids
+        ):
+    """
+        Fetch the trees with the IDs from INPUT_PATH using its index,
+        which is (re)built if missing or out of date.
+    """
+    import kail.index as ix
+
+    try:
+        index = ix.load_index(input_path)
+    except (OSError, ValueError, ix.Stale_Index_Error):
+        index = ix.write_index(input_path, input_format)
+
+    if index["input_format"] != input_format:
+        raise click.UsageError(
+            "{path} is indexed in the format {indexed}, not {given}; "
+            "give -i {indexed}, or run kail index -i {given} on it".format(
+                path = input_path,
+                indexed = index["input_format"],
+                given = input_format
+                )
+            )
+
+    try:
+        ix.fetch(
+            input_path,
+            ids,
+            output_file,
+            output_format = output_format,
+            comments = comments,
+            compact = compact,
+            index = index
+        )
+    except KeyError as error:
+        click.echo("ID not found: {}".format(error.args[0]), err = True)
+        sys.exit(1)
+    except ix.Stale_Index_Error as error:
+        # the file has been changed while being fetched from
+        click.echo("{}; fetch again to rebuild the index".format(error), err = True)
+        sys.exit(1)
+    # ===END===
+
+@routine.command()
+@format_options
 @click.option(
-    "--compact/--pretty",
-    default = False
+    "--output_file", "-w",
+    type = click.File(mode = 'w'),
+    default = "-"
 )
+@click.option("--label", default = None)
+@click.option("--ICHed", "ICHed", type = int, default = None)
+@click.option("--has_ICHed", "has_ICHed", is_flag = True, default = False)
+@click.option("--sort_info", default = None)
+@click.option("--word", default = None)
+@click.argument(
+    "input_path",
+    type = click.Path(exists = True, dir_okay = False)
+)
+def search(
+        input_format,
+        output_format,
+        comments, 
+        compact,
+        output_file,
+        label,
+        ICHed,
+        has_ICHed,
+        sort_info,
+        word,
+        input_path
+        ):
+    """
+        Print the trees in INPUT_PATH that contain a node with the given label constituents or word,
+        using the label index kept in the cache, which is (re)built if missing or out of date.
+    """
+    import kail.search as search_index
+
+    try:
+        found = search_index.search(
+            input_path,
+            input_format,
+            label = label,
+            ICHed = ICHed,
+            has_ICHed = has_ICHed,
+            sort_info = sort_info,
+            word = word
+        )
+
+        conv.convert_trees(
+            (tree for tree, _ in found),
+            output_file,
+            output_format = output_format,
+            comments = comments,
+            compact = compact
+        )
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    # ===END===
+
+@routine.command()
+@format_options
 @click.option(
     "--input_file", "-r",
     type = click.File(mode = 'r'),
@@ -31,71 +385,162 @@ import kail.structures as strs
     type = click.File(mode = 'w'),
     default = "-"
 )
-def routine(
+@click.option(
+    "--trees/--nodes",
+    default = False,
+    help = "Print the whole trees containing the matches instead of the matched nodes."
+)
+@click.argument("pattern")
+def match(
         input_format,
         output_format,
-        input_file, 
-        output_file, 
         comments, 
-        compact
+        compact,
+        input_file,
+        output_file,
+        trees,
+        pattern
         ):
-    # read trees
-    trees = None
-    
-    if input_format == "penn":
-        trees = strs.TreeWithParent.parse_kai_penn(input_file)
-    elif input_format == "kail":
-        trees = strs.TreeWithParent.parse_kail(input_file)
-
-    # write trees
-    if output_format == "penn":
-        if compact:
-            # One-line mode
-
-            # Raise out comments
-            for tree in list(iter(trees)):
-                tree.raise_comments_out()
-            # copy needed?
-
-            # Print
-            output_file.write(
-                "\n".join(
-                    filter(
-                        None,
-                        (
-                            tree.print_kai_penn_squeezed(
-                                show_comments = comments
-                                ) for tree in trees
-                        )
+    """
+        Print the nodes (or the trees) that match the Tregex-style PATTERN (see kail.pattern).
+    """
+    import kail.pattern as pat
+
+    try:
+        compiled = pat.compile_pattern(pattern)
+    except SyntaxError as error:
+        raise click.BadParameter(str(error), param_hint = "PATTERN")
+
+    if os.path.isfile(input_file.name):
+        # prune the trees by the label index
+        matches = compiled.search_file(input_file.name, input_format)
+    else:
+        matches = compiled.search(conv.iter_trees(input_file, input_format))
+
+    if trees:
+        conv.convert_trees(
+            (
+                # each tree once, however many matches it has
+                next(same_trees) for _, same_trees in itertools.groupby(
+                    (found.tree for found in matches), key = id
                     )
+            ),
+            output_file,
+            output_format = output_format,
+            comments = comments,
+            compact = compact
+        )
+    else:
+        if output_format == "kail":
+            write = lambda node: node.write_kail
+        elif compact:
+            write = lambda node: functools.partial(
+                node.write_kai_penn_squeezed, show_comments = comments
                 )
-            )
         else:
-            # Pretty mode
-
-            # Raise out comments on rightmost-corners
-            for tree in list(iter(trees)):
-                tree.raise_comments_on_right_corner_one_level_above()
-            # copy needed?
-
-            # Print
-            output_file.write(
-                "\n\n".join(
-                    filter(None,
-                        (
-                            tree.print_kai_penn_indented(
-                                show_comments = comments
-                                ) for tree in trees
-                        )
-                    )
+            write = lambda node: functools.partial(
+                node.write_kai_penn_indented, show_comments = comments
                 )
-            )
-    elif output_format == "kail":
-        # Pretty mode only
-        output_file.write("\n".join(
-            tree.print_kail() for tree in trees
-            )
+
+        separator, skip_empty = conv.get_output_layout(output_format, compact)
+        conv.write_joined(
+            output_file,
+            (write(found.node) for found in matches),
+            separator = separator,
+            skip_empty = skip_empty
         )
     # ===END===
 
-routine()
\ No newline at end of file
+@routine.command()
+@format_options
+@click.option(
+    "--input_file", "-r",
+    type = click.File(mode = 'r'),
+    default = "-"
+)
+@click.option(
+    "--output_file", "-w",
+    type = click.File(mode = 'w'),
+    default = "-"
+)
+@click.argument(
+    "script",
+    type = click.Path(exists = True, dir_okay = False)
+)
+def transform(
+        input_format,
+        output_format,
+        comments, 
+        compact,
+        input_file,
+        output_file,
+        script
+        ):
+    """
+        Edit the trees by the Tsurgeon-style rules in SCRIPT (see kail.surgery)
+        and print them.
+    """
+    import kail.surgery as surgery
+
+    try:
+        rules = surgery.load_script(script)
+    except SyntaxError as error:
+        raise click.BadParameter(str(error), param_hint = "SCRIPT")
+
+    try:
+        conv.convert_trees(
+            surgery.transform_trees(conv.iter_trees(input_file, input_format), rules),
+            output_file,
+            output_format = output_format,
+            comments = comments,
+            compact = compact
+        )
+    except surgery.Surgery_Error as error:
+        click.echo(str(error), err = True)
+        sys.exit(1)
+    # ===END===
+
+@routine.command()
+@click.option("--host", default = "127.0.0.1")
+# the same as kail.aio.DEFAULT_PORT, which is imported only when served
+@click.option("--port", "-p", type = int, default = 8790)
+@click.option(
+    "--unix", "unix_path",
+    type = click.Path(dir_okay = False),
+    default = None,
+    help = "Listen on this Unix domain socket instead of the TCP port."
+)
+@click.option(
+    "--stdio",
+    is_flag = True,
+    default = False,
+    help = "Answer the requests from the standard input on the standard output instead, one by one."
+)
+@click.option(
+    "--jobs", "-j",
+    type = click.IntRange(min = 1),
+    default = None,
+    help = "Convert the documents in this many worker processes (default: in threads)."
+)
+def serve(host, port, unix_path, stdio, jobs):
+    """
+        Serve the conversion, speaking JSON lines (see kail.aio and kail.client).
+    """
+    import kail.aio as aio
+
+    if stdio:
+        aio.serve_stdio(sys.stdin.buffer, sys.stdout.buffer)
+        return
+
+    click.echo(
+        "Serving on {}".format(
+            unix_path if unix_path is not None
+            else "{host}:{port}".format(host = host, port = port)
+            ),
+        err = True
+    )
+    aio.serve(host, port, processes = jobs, unix_path = unix_path)
+    # ===END===
+
+if __name__ == "__main__":
+    routine()
@@ -0,0 +1,451 @@
+import typing
+import io
+import os
+import stat
+import signal
+import asyncio
+import concurrent.futures
+import functools
+import json
+
+import kail.structures as strs
+import kail.conversion as conv
+
+"""
+    This module provides the conversion for asyncio programs,
+    where the parsing and the printing are done in an executor
+    so that the event loop is not blocked by large documents,
+    and a local server of the conversion,
+    on a TCP port, on a Unix domain socket, or on the standard input and output,
+    which keeps the process warm so that each conversion costs no startup
+    (see kail.client for the client).
+
+    The server speaks JSON lines: each line of a request is an object
+        {"id": 1, "text": "(S (NP ...))", "input_format": "penn", "output_format": "kail"}
+    with the optional fields "comments" and "compact" (see conversion.convert_stream),
+    and each line of the response is
+        {"id": 1, "text": "S\n  NP\n ..."}
+    or
+        {"id": 1, "error": "..."}
+    The requests on a connection are processed concurrently,
+    and the responses are sent as soon as they are ready,
+    to be told apart by the "id" given in the request.
+"""
+
+# The size (in bytes) of the chunks handed over to the executor at once
+ASYNC_CHUNK_SIZE: int = 1 << 16
+
+# The default port of the server
+DEFAULT_PORT: int = 8790
+
+# The maximum size (in bytes) of a line of a request
+REQUEST_SIZE_LIMIT: int = 1 << 28
+
+# The options of the conversion that a request can give, with their types
+REQUEST_OPTIONS: typing.Dict[str, type] = {
+    "input_format": str,
+    "output_format": str,
+    "comments": bool,
+    "compact": bool,
+}
+
+# ======
+# Async conversion
+# ======
+
+async def aiter_lines(
+        stream: typing.Union[asyncio.StreamReader, typing.AsyncIterable[bytes]]
+    ) -> typing.AsyncIterator[bytes]:
+    """
+        Iterate the lines (as bytes) of an asyncio stream or an async iterable of lines.
+    """
+    if hasattr(stream, "readline"):
+        while True:
+            line = await stream.readline()
+            if not line: return
+
+            yield line
+    else:
+        async for line in stream:
+            yield line
+
+    # ===END===
+
+async def aiter_chunks(
+        stream: typing.Union[asyncio.StreamReader, typing.AsyncIterable[bytes]],
+        input_format: str = "penn",
+        chunk_size: int = ASYNC_CHUNK_SIZE
+    ) -> typing.AsyncIterator[typing.Tuple[bytes, int]]:
+    """
+        Read the UTF-8 encoded lines of a stream into chunks of whole top-level trees
+        (see conversion.scan_tree_spans) of at least the given size (except the last one).
+
+        Yields
+        ------
+        data: bytes
+        first_row: int
+            the row of the first line of the chunk (beginning with 0)
+    """
+    begins_span = conv.get_span_detector(input_format)
+
+    lines: typing.List[bytes] = []
+    size: int = 0
+    row: int = 0
+    first_row: int = 0
+
+    async for line in aiter_lines(stream):
+        if begins_span(line) and size >= chunk_size:
+            yield b"".join(lines), first_row
+
+            lines = []
+            size = 0
+            first_row = row
+
+        lines.append(line)
+        size += len(line)
+        row += 1
+
+    if lines: yield b"".join(lines), first_row
+
+    # ===END===
+
+async def aiter_trees(
+        stream: typing.Union[asyncio.StreamReader, typing.AsyncIterable[bytes]],
+        input_format: str = "penn",
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+        chunk_size: int = ASYNC_CHUNK_SIZE
+    ) -> typing.AsyncIterator[strs.TreeWithParent]:
+    """
+        Parse the UTF-8 encoded lines of a stream tree by tree,
+        each chunk of the stream (see aiter_chunks) being parsed in the executor
+        (the default one of the event loop when not specified).
+        The executor should be a thread pool, since the trees are not picklable.
+    """
+    loop = asyncio.get_running_loop()
+
+    async for data, first_row in aiter_chunks(stream, input_format, chunk_size):
+        trees = await loop.run_in_executor(
+            executor, _parse_chunk, data, input_format, first_row
+            )
+
+        for tree in trees:
+            yield tree
+
+    # ===END===
+
+async def aconvert_stream(
+        stream: typing.Union[asyncio.StreamReader, typing.AsyncIterable[bytes]],
+        writer: asyncio.StreamWriter,
+        input_format: str = "penn",
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+        chunk_size: int = ASYNC_CHUNK_SIZE
+    ) -> int:
+    """
+        Convert the UTF-8 encoded lines of a stream chunk by chunk in the executor,
+        writing the output (encoded in UTF-8) to the writer as soon as each chunk is done.
+        The output is the same as conversion.convert_stream.
+        A process pool can also be used as the executor.
+
+        Returns
+        -------
+        items: int
+            the number of the items (trees and comments) written
+    """
+    loop = asyncio.get_running_loop()
+    options = dict(
+        input_format = input_format,
+        output_format = output_format,
+        comments = comments,
+        compact = compact
+    )
+
+    separator, skip_empty = conv.get_output_layout(output_format, compact)
+    sink = conv.Separated_Writer(_Encoding_Writer(writer), separator, skip_empty)
+    items_total = 0
+
+    async for data, first_row in aiter_chunks(stream, input_format, chunk_size):
+        # the same as conversion.write_pieces, a piece at a time
+        text, items = await loop.run_in_executor(
+            executor, conv.convert_bytes, data, first_row, options
+            )
+
+        if items:
+            sink.begin_item()
+            sink.write(text)
+            items_total += items
+
+            await writer.drain()
+
+    return items_total
+
+    # ===END===
+
+async def aconvert_text(
+        text: str,
+        input_format: str = "penn",
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        executor: typing.Optional[concurrent.futures.Executor] = None
+    ) -> str:
+    """
+        Convert a document in the executor, giving the output.
+        A process pool can also be used as the executor.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        executor,
+        functools.partial(
+            convert_text,
+            text,
+            input_format = input_format,
+            output_format = output_format,
+            comments = comments,
+            compact = compact
+            )
+        )
+
+    # ===END===
+
+def convert_text(text: str, **options) -> str:
+    """
+        Convert a document given as a string, giving the output
+        (see conversion.convert_stream for the options).
+    """
+    output = io.StringIO()
+    conv.convert_stream(io.StringIO(text), output, **options)
+
+    return output.getvalue()
+
+    # ===END===
+
+def _parse_chunk(
+        data: bytes,
+        input_format: str,
+        first_row: int
+    ) -> typing.List[strs.TreeWithParent]:
+    return list(conv.iter_trees_bytes(data, input_format, first_row = first_row))
+
+    # ===END===
+
+class _Encoding_Writer:
+    """
+        A text file interface of an asyncio stream writer, encoding the texts in UTF-8.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter) -> "_Encoding_Writer":
+        self.writer = writer
+
+        # ===END===
+
+    def write(self, text: str) -> int:
+        self.writer.write(text.encode("utf-8"))
+        return len(text)
+
+        # ===END===
+
+    def writelines(self, texts: typing.Iterable[str]) -> None:
+        for text in texts: self.write(text)
+
+        # ===END===
+
+# ======
+# Server
+# ======
+
+def answer_request(request: typing.Dict[str, object]) -> typing.Dict[str, object]:
+    """
+        Answer a request of the conversion (see the protocol above).
+    """
+    response: typing.Dict[str, object] = {"id": request.get("id")}
+
+    try:
+        text = request.get("text")
+        if not isinstance(text, str):
+            raise TypeError("'text' must be a string")
+
+        options = {}
+        for name, option_type in REQUEST_OPTIONS.items():
+            if name in request:
+                if not isinstance(request[name], option_type):
+                    raise TypeError("{!r} must be a {}".format(name, option_type.__name__))
+
+                options[name] = request[name]
+
+        for name in ("input_format", "output_format"):
+            if options.get(name, "penn") not in conv.OUTPUT_SUFFIXES:
+                raise ValueError("Unknown {}: {}".format(name, options[name]))
+
+        response["text"] = convert_text(text, **options)
+    except Exception as error:
+        response["error"] = "{name}: {message}".format(
+            name = type(error).__name__,
+            message = error
+            )
+
+    return response
+
+    # ===END===
+
+def answer_line(line: bytes) -> bytes:
+    """
+        Answer a line of a request with a line of the response (see the protocol above).
+    """
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("A request must be an object")
+    except ValueError as error:
+        response = {"id": None, "error": "Bad request: {}".format(error)}
+    else:
+        response = answer_request(request)
+
+    return json.dumps(response, ensure_ascii = False).encode("utf-8") + b"\n"
+
+    # ===END===
+
+async def handle_connection(
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        executor: typing.Optional[concurrent.futures.Executor] = None
+    ) -> None:
+    """
+        Serve the requests on a connection until it is closed by the client,
+        answering each of them in the executor.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def answer(line: bytes) -> None:
+        response = await loop.run_in_executor(executor, answer_line, line)
+
+        # a line is written at once, so that the responses are not mixed up
+        writer.write(response)
+        await writer.drain()
+
+        # ===END===
+
+    pending: typing.Set[asyncio.Task] = set()
+
+    try:
+        async for line in aiter_lines(reader):
+            if not line.strip(): continue
+
+            task = asyncio.ensure_future(answer(line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending: await asyncio.wait(pending)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+    # ===END===
+
+async def start_server(
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        executor: typing.Optional[concurrent.futures.Executor] = None,
+        unix_path: typing.Optional[str] = None
+    ) -> asyncio.AbstractServer:
+    """
+        Start a server of the conversion (see the protocol above)
+        on the TCP port, or on the Unix domain socket if its path is given.
+    """
+    handler = functools.partial(handle_connection, executor = executor)
+
+    # a request can be as long as a whole document
+    if unix_path is not None:
+        return await asyncio.start_unix_server(
+            handler, unix_path, limit = REQUEST_SIZE_LIMIT
+            )
+    else:
+        return await asyncio.start_server(
+            handler, host, port, limit = REQUEST_SIZE_LIMIT
+            )
+
+    # ===END===
+
+def serve(
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        processes: typing.Optional[int] = None,
+        unix_path: typing.Optional[str] = None
+    ) -> None:
+    """
+        Run a server of the conversion (see start_server) until interrupted or terminated,
+        converting the documents in a pool of the given number of processes
+        (the default executor of the event loop, a thread pool, if not specified).
+    """
+    # whether the socket file at unix_path has been made by this process
+    bound = False
+
+    async def run() -> None:
+        nonlocal bound
+
+        if processes is None:
+            executor = None
+        else:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers = processes)
+
+        loop = asyncio.get_running_loop()
+        stopped = loop.create_future()
+
+        try:
+            # stop gracefully when terminated as a daemon
+            loop.add_signal_handler(signal.SIGTERM, stopped.set_result, None)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+        try:
+            server = await start_server(host, port, executor, unix_path = unix_path)
+            bound = unix_path is not None
+
+            async with server:
+                await stopped
+        finally:
+            if executor is not None: executor.shutdown()
+
+        # ===END===
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if bound: _remove_socket(unix_path)
+
+    # ===END===
+
+def _remove_socket(path: str) -> None:
+    """
+        Remove a Unix domain socket file, leaving anything else at the path,
+        and ignoring any failure.
+    """
+    try:
+        if stat.S_ISSOCK(os.lstat(path).st_mode): os.remove(path)
+    except OSError:
+        pass
+
+    # ===END===
+
+def serve_stdio(
+        input_file: typing.BinaryIO,
+        output_file: typing.BinaryIO
+    ) -> None:
+    """
+        Answer the requests (see the protocol above) read from the input
+        one by one in order, until it is closed,
+        flushing the output after each response.
+        This is meant to be run as a child process of an editor
+        which talks to it through pipes.
+    """
+    for line in input_file:
+        if not line.strip(): continue
+
+        output_file.write(answer_line(line))
+        output_file.flush()
+
+    # ===END===
@@ -0,0 +1,434 @@
+import typing
+import os
+import json
+import struct
+import hashlib
+import tempfile
+
+import kail.structures as strs
+import kail.columnar as col
+
+"""
+    This module provides an on-disk cache of parsed files,
+    each stored as a columnar forest in the binary format (see ColumnarForest.dump),
+    so that a file which has not changed since the last run need not be parsed again.
+    The total size of the cache files is limited (see prune_cache),
+    the least recently used ones being removed first.
+"""
+
+# The environment variable that specifies the cache directory
+CACHE_DIR_VARIABLE: str = "KAIL_CACHE_DIR"
+
+# The environment variable that specifies the limit of the total size of the cache files (in bytes)
+CACHE_SIZE_VARIABLE: str = "KAIL_CACHE_SIZE"
+
+# The default limit of the total size of the cache files (in bytes)
+CACHE_SIZE_LIMIT: int = 1 << 30
+
+# The suffixes of the cache files
+CACHE_SUFFIX: str = ".forest"
+LABELS_SUFFIX: str = ".labels"
+OUTPUTS_SUFFIX: str = ".outputs"
+
+# The suffixes of the files subject to the size limit
+CACHE_SUFFIXES: typing.Tuple[str, ...] = (CACHE_SUFFIX, LABELS_SUFFIX, OUTPUTS_SUFFIX)
+
+# The size (in bytes) of the blocks in which a file is read to be hashed
+DIGEST_BLOCK_SIZE: int = 1 << 20
+
+# The version of the files of the outputs of spans
+OUTPUTS_VERSION: int = 1
+
+# The record of the source file put before the forest: the size and the BLAKE2b digest
+_source_header: struct.Struct = struct.Struct("<q32s")
+
+def get_cache_dir() -> str:
+    """
+        Give the cache directory, 
+        which is $KAIL_CACHE_DIR if set, or ~/.cache/kail otherwise.
+    """
+    return os.environ.get(CACHE_DIR_VARIABLE) \
+        or os.path.join(os.path.expanduser("~"), ".cache", "kail")
+
+    # ===END===
+
+def get_cache_size_limit() -> int:
+    """
+        Give the limit of the total size of the cache files in bytes,
+        which is $KAIL_CACHE_SIZE if set to an integer, or CACHE_SIZE_LIMIT otherwise.
+    """
+    try:
+        return int(os.environ[CACHE_SIZE_VARIABLE])
+    except (KeyError, ValueError):
+        return CACHE_SIZE_LIMIT
+
+    # ===END===
+
+def get_cache_path(
+        input_path: str,
+        input_format: str = "penn",
+        cache_dir: typing.Optional[str] = None,
+        suffix: str = CACHE_SUFFIX
+        ) -> str:
+    """
+        Give the path of the cache file of the given file parsed in the given format:
+        the forest (CACHE_SUFFIX), or what is derived from it (e.g. LABELS_SUFFIX).
+    """
+    return _get_path(
+        (input_format, os.path.abspath(input_path)), 
+        suffix, 
+        cache_dir
+        )
+
+    # ===END===
+
+def get_outputs_path(
+        input_path: str,
+        options: typing.Dict[str, object],
+        cache_dir: typing.Optional[str] = None
+        ) -> str:
+    """
+        Give the path of the file of the outputs of the spans of the given file
+        converted with the given options (see load_outputs).
+    """
+    return _get_path(
+        (os.path.abspath(input_path), ) + tuple(sorted(options.items())),
+        OUTPUTS_SUFFIX,
+        cache_dir
+        )
+
+    # ===END===
+
+def _get_path(
+        key: typing.Tuple[object, ...],
+        suffix: str,
+        cache_dir: typing.Optional[str] = None
+        ) -> str:
+    return os.path.join(
+        cache_dir or get_cache_dir(),
+        hashlib.sha256(repr(key).encode("utf-8")).hexdigest() + suffix
+        )
+
+    # ===END===
+
+def get_file_digest(input_path: str) -> typing.Tuple[int, bytes]:
+    """
+        Give the size and the BLAKE2b digest of the content of a file,
+        which is read block by block.
+    """
+    digest = hashlib.blake2b(digest_size = 32)
+    size = 0
+
+    with open(input_path, "rb") as input_file:
+        for block in iter(lambda: input_file.read(DIGEST_BLOCK_SIZE), b""):
+            digest.update(block)
+            size += len(block)
+
+    return size, digest.digest()
+
+    # ===END===
+
+def get_span_digest(data: bytes) -> str:
+    """
+        Give the fingerprint of the source text of a span.
+    """
+    return hashlib.blake2b(data, digest_size = 16).hexdigest()
+
+    # ===END===
+
+def load_outputs(outputs_path: str) -> typing.Dict[str, typing.Tuple[str, int]]:
+    """
+        Read the outputs of the spans of a file converted previously,
+        giving an empty dictionary if the file is absent or broken.
+
+        Returns
+        -------
+        outputs: Dict[str, Tuple[str, int]]
+            The printed text and the number of the items of each span,
+            keyed by the fingerprint of the source text of the span (see get_span_digest).
+    """
+    try:
+        with open(outputs_path, "r", encoding = "utf-8") as outputs_file:
+            record = json.load(outputs_file)
+
+        if record["version"] != OUTPUTS_VERSION: return {}
+
+        _touch(outputs_path)
+
+        return {
+            digest: (text, items) 
+            for digest, text, items in record["outputs"]
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+    # ===END===
+
+def store_outputs(
+        outputs_path: str,
+        outputs: typing.Dict[str, typing.Tuple[str, int]]
+        ) -> None:
+    """
+        Write the outputs of the spans of a file (see load_outputs), ignoring any failure.
+    """
+    record = {
+        "version": OUTPUTS_VERSION,
+        "outputs": [
+            (digest, text, items) 
+            for digest, (text, items) in outputs.items()
+        ],
+    }
+
+    _write_atomically(
+        outputs_path, 
+        lambda outputs_file: outputs_file.write(
+            json.dumps(record, ensure_ascii = False).encode("utf-8")
+            )
+        )
+    prune_cache(os.path.dirname(outputs_path))
+
+    # ===END===
+
+def parse_file(
+        input_path: str,
+        input_format: str = "penn",
+        cache_dir: typing.Optional[str] = None,
+        source: typing.Optional[typing.Tuple[int, bytes]] = None
+        ) -> col.ColumnarForest:
+    """
+        Parse a file into a columnar forest, through the cache.
+        The cached forest is used if the size and the digest of the file
+        are the same as when it was cached
+        (the modification time is not trusted, since it can miss quick rewrites).
+        Otherwise the file is parsed and the result is cached.
+        Any failure of the cache itself is ignored.
+
+        Parameters
+        ----------
+        input_path: str
+        input_format: str, default "penn"
+            "penn" or "kail"
+        cache_dir: str, optional
+            the cache directory (get_cache_dir() when not specified)
+        source: Tuple[int, bytes], optional
+            the size and the digest of the file, if already known (see get_file_digest)
+
+        Returns
+        -------
+        forest: ColumnarForest
+    """
+    if source is None: source = get_file_digest(input_path)
+
+    forest = load_forest(input_path, input_format, cache_dir, source = source)
+    if forest is not None: return forest
+
+    if input_format == "penn":
+        trees = strs.TreeWithParent.iter_kai_penn
+    elif input_format == "kail":
+        trees = strs.TreeWithParent.iter_kail
+    else:
+        raise ValueError(input_format)
+
+    with open(input_path, "r", encoding = "utf-8") as input_file:
+        forest = col.ColumnarForest.from_trees(trees(input_file))
+
+    store_forest(input_path, forest, input_format, cache_dir, source = source)
+
+    return forest
+
+    # ===END===
+
+def load_forest(
+        input_path: str,
+        input_format: str = "penn",
+        cache_dir: typing.Optional[str] = None,
+        source: typing.Optional[typing.Tuple[int, bytes]] = None
+        ) -> typing.Optional[col.ColumnarForest]:
+    """
+        Read the cached forest of a file (see parse_file),
+        giving None if it is absent, broken, or cached from another content of the file.
+    """
+    if source is None: source = get_file_digest(input_path)
+
+    return load_entry(
+        get_cache_path(input_path, input_format, cache_dir), 
+        source, 
+        col.ColumnarForest.load
+        )
+
+    # ===END===
+
+def store_forest(
+        input_path: str,
+        forest: col.ColumnarForest,
+        input_format: str = "penn",
+        cache_dir: typing.Optional[str] = None,
+        source: typing.Optional[typing.Tuple[int, bytes]] = None
+        ) -> None:
+    """
+        Cache the forest parsed from a file (see store_entry).
+    """
+    store_entry(
+        input_path, 
+        get_cache_path(input_path, input_format, cache_dir), 
+        forest.dump,
+        source = source
+        )
+
+    # ===END===
+
+def load_entry(
+        cache_path: str,
+        source: typing.Tuple[int, bytes],
+        read: typing.Callable[[typing.BinaryIO], object]
+        ) -> typing.Optional[object]:
+    """
+        Read a cache file written by store_entry with the function,
+        giving None if it is absent or broken (the function raising ValueError), 
+        or if it was made from another content of the file than the source 
+        (the size and the digest, see get_file_digest).
+    """
+    try:
+        with open(cache_path, "rb") as cache_file:
+            if _source_header.unpack(cache_file.read(_source_header.size)) != source:
+                return None
+
+            content = read(cache_file)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    _touch(cache_path)
+
+    return content
+
+    # ===END===
+
+def store_entry(
+        input_path: str,
+        cache_path: str,
+        write: typing.Callable[[typing.BinaryIO], object],
+        source: typing.Optional[typing.Tuple[int, bytes]] = None
+        ) -> None:
+    """
+        Let the function write a cache file of what is made from a file,
+        preceded by the size and the digest of the file (see get_file_digest),
+        and keep the cache within the size limit (see prune_cache), ignoring any failure.
+        Nothing is written 
+        if the file is found changed since the source was taken,
+        since what is written might have been made from a content between the two.
+    """
+    try:
+        current = get_file_digest(input_path)
+    except OSError:
+        return
+
+    if source is None: 
+        source = current
+    elif source != current:
+        return
+
+    def write_entry(cache_file: typing.BinaryIO) -> None:
+        cache_file.write(_source_header.pack(*source))
+        write(cache_file)
+
+        # ===END===
+
+    _write_atomically(cache_path, write_entry)
+    prune_cache(os.path.dirname(cache_path))
+
+    # ===END===
+
+def prune_cache(
+        cache_dir: typing.Optional[str] = None,
+        size_limit: typing.Optional[int] = None
+        ) -> int:
+    """
+        Remove the least recently used cache files 
+        (those with CACHE_SUFFIXES, by the modification time, which is updated when used)
+        until their total size is within the limit, ignoring any failure.
+
+        Parameters
+        ----------
+        cache_dir: str, optional
+            the cache directory (get_cache_dir() when not specified)
+        size_limit: int, optional
+            the limit in bytes (get_cache_size_limit() when not specified)
+
+        Returns
+        -------
+        removed: int
+            the number of the removed files
+    """
+    if cache_dir is None: cache_dir = get_cache_dir()
+    if size_limit is None: size_limit = get_cache_size_limit()
+
+    files: typing.List[typing.Tuple[int, int, str]] = []
+
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(CACHE_SUFFIXES) and entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    except OSError:
+        return 0
+
+    # keep the most recently used ones
+    files.sort(reverse = True)
+    total = 0
+    removed = 0
+
+    for _, size, path in files:
+        total += size
+
+        if total > size_limit:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+
+    return removed
+
+    # ===END===
+
+def _touch(path: str) -> None:
+    """
+        Mark a cache file as used now, ignoring any failure.
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+    # ===END===
+
+def _write_atomically(
+        path: str,
+        write: typing.Callable[[typing.BinaryIO], object]
+        ) -> None:
+    """
+        Let the function write the content of a file in the binary mode
+        into a temporary file, which then replaces the file,
+        ignoring any failure.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        descriptor, temp_path = tempfile.mkstemp(
+            dir = os.path.dirname(path), 
+            suffix = ".tmp"
+            )
+
+        try:
+            with os.fdopen(descriptor, "wb") as temp_file:
+                write(temp_file)
+
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    except (OSError, TypeError, OverflowError, struct.error):
+        pass
+
+    # ===END===
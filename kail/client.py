@@ -0,0 +1,206 @@
+import typing
+import sys
+import os
+import json
+import socket
+import itertools
+import argparse
+
+"""
+    This module provides a small client of the conversion server (see kail.aio),
+    for editors and scripts which convert small documents so often
+    that the startup of the kail command would dominate.
+    It imports nothing but the standard library,
+    and falls back to the conversion in the process if no server is running.
+
+    Usage (the options are the same as the kail command):
+        python -m kail.client -o kail < input.psd > output.kail
+    The server is found at the Unix domain socket given by $KAIL_SOCKET if set,
+    and otherwise at 127.0.0.1:8790 ($KAIL_HOST and $KAIL_PORT).
+"""
+
+# The environment variables that tell where the server is
+SOCKET_VARIABLE: str = "KAIL_SOCKET"
+HOST_VARIABLE: str = "KAIL_HOST"
+PORT_VARIABLE: str = "KAIL_PORT"
+
+# The default address of the server, the same as kail.aio.DEFAULT_PORT
+# (which is not imported here so as not to load the conversion modules)
+DEFAULT_HOST: str = "127.0.0.1"
+DEFAULT_PORT: int = 8790
+
+class Conversion_Error(Exception):
+    """
+        An exception raised when the server fails to convert a document.
+    """
+    pass
+
+def get_default_address() -> typing.Union[str, typing.Tuple[str, int]]:
+    """
+        Give the address of the server told by the environment variables:
+        the path of the Unix domain socket, or the pair of the host and the port.
+    """
+    path = os.environ.get(SOCKET_VARIABLE)
+    if path: return path
+
+    return (
+        os.environ.get(HOST_VARIABLE) or DEFAULT_HOST,
+        int(os.environ.get(PORT_VARIABLE) or DEFAULT_PORT)
+    )
+
+    # ===END===
+
+class Client:
+    """
+        A connection to the conversion server, which can be used for many requests.
+
+        Parameters
+        ----------
+        address: str or Tuple[str, int], optional
+            The path of the Unix domain socket, or the pair of the host and the port
+            (get_default_address() when not specified).
+        timeout: float, optional
+            The timeout of connecting and of each response in seconds.
+    """
+
+    def __init__(
+            self,
+            address: typing.Union[str, typing.Tuple[str, int], None] = None,
+            timeout: typing.Optional[float] = None
+        ) -> "Client":
+        if address is None: address = get_default_address()
+
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        self.socket.settimeout(timeout)
+
+        try:
+            self.socket.connect(address)
+        except OSError:
+            self.socket.close()
+            raise
+
+        self.file = self.socket.makefile("rwb")
+        self.__IDs = itertools.count(1)
+
+        # ===END===
+
+    def __enter__(self) -> "Client":
+        return self
+
+        # ===END===
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+        # ===END===
+
+    def close(self) -> None:
+        self.file.close()
+        self.socket.close()
+
+        # ===END===
+
+    def convert(self, text: str, **options) -> str:
+        """
+            Convert a document on the server
+            (see kail.conversion.convert_stream for the options).
+
+            Raises
+            ------
+            Conversion_Error
+                If the server fails to convert it.
+            ConnectionError
+                If the server closes the connection.
+        """
+        ID = next(self.__IDs)
+        request = dict(options, id = ID, text = text)
+
+        self.file.write(json.dumps(request, ensure_ascii = False).encode("utf-8") + b"\n")
+        self.file.flush()
+
+        # the requests are sent one at a time, so the next response is for this one
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("The server closed the connection")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise Conversion_Error(response["error"])
+
+        return response["text"]
+
+        # ===END===
+
+def convert(
+        text: str,
+        address: typing.Union[str, typing.Tuple[str, int], None] = None,
+        fallback: bool = True,
+        **options
+    ) -> str:
+    """
+        Convert a document on the server,
+        or in this process if the server cannot be reached and fallback is True.
+    """
+    try:
+        client = Client(address)
+    except OSError:
+        if not fallback: raise
+
+        import kail.aio as aio
+        return aio.convert_text(text, **options)
+
+    with client:
+        return client.convert(text, **options)
+
+    # ===END===
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog = "python -m kail.client",
+        description = "Convert the standard input through the kail server."
+        )
+    parser.add_argument("--input_format", "-i", choices = ("penn", "kail"), default = "penn")
+    parser.add_argument("--output_format", "-o", choices = ("penn", "kail"), default = "penn")
+    parser.add_argument("--comments", dest = "comments", action = "store_true", default = True)
+    parser.add_argument("--no_comments", dest = "comments", action = "store_false")
+    parser.add_argument("--compact", dest = "compact", action = "store_true", default = False)
+    parser.add_argument("--pretty", dest = "compact", action = "store_false")
+    parser.add_argument(
+        "--socket", default = None,
+        help = "the path of the Unix domain socket of the server"
+        )
+    parser.add_argument(
+        "--no_fallback", dest = "fallback", action = "store_false", default = True,
+        help = "fail instead of converting in this process if no server is running"
+        )
+    arguments = parser.parse_args(argv)
+
+    text = sys.stdin.buffer.read().decode("utf-8")
+
+    try:
+        output = convert(
+            text,
+            address = arguments.socket,
+            fallback = arguments.fallback,
+            input_format = arguments.input_format,
+            output_format = arguments.output_format,
+            comments = arguments.comments,
+            compact = arguments.compact
+            )
+    except (Conversion_Error, OSError) as error:
+        print(error, file = sys.stderr)
+        return 1
+
+    sys.stdout.buffer.write(output.encode("utf-8"))
+    sys.stdout.flush()
+
+    return 0
+
+    # ===END===
+
+if __name__ == "__main__":
+    sys.exit(main())
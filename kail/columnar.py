@@ -0,0 +1,1189 @@
+import typing
+import io
+import sys
+import array
+import struct
+import functools
+import itertools
+
+import kail.structures as strs
+
+"""
+    This module provides a columnar (array-backed) representation of a forest of trees,
+    an alternative to TreeWithParent for whole-corpus processing.
+"""
+
+# The kinds of the node labels
+KIND_LABEL_COMPLEX: int = 0
+KIND_COMMENT: int = 1
+KIND_NONE: int = 2
+
+# The index that stands for "no node"
+NO_NODE: int = -1
+
+# The header of the binary format of a forest (see ColumnarForest.dump)
+BINARY_MAGIC: bytes = b"KAILFRST"
+BINARY_VERSION: int = 2
+_binary_header: struct.Struct = struct.Struct("<8sIIQQQ")
+
+# The type codes of the packed integer arrays in the binary format, from the narrowest
+_packed_typecodes: str = "bhi"
+
+class ColumnarForest:
+    """
+        A forest of trees stored in parallel arrays indexed by node IDs.
+        Node IDs are assigned in the pre-order of each tree and the trees are kept in order.
+
+        Attributes
+        ----------
+        parent: array[int]
+            The ID of the parent of each node (NO_NODE for a top-level node).
+        first_child: array[int]
+            The ID of the leftmost child of each node (NO_NODE for a terminal node).
+        last_child: array[int]
+            The ID of the rightmost child of each node (NO_NODE for a terminal node).
+        next_sibling: array[int]
+            The ID of the right sibling of each node (NO_NODE for the rightmost one).
+        label_id: array[int]
+            The index of the label of each node in self.labels.
+        row: array[int]
+            The row of each node in the source document (beginning with 0).
+        column, ICHed_column, sort_info_column: array[int]
+            The columns of the constituents of the label of each node
+            in the source document (beginning with 0).
+        roots: array[int]
+            The IDs of the top-level nodes.
+        labels: List[Tuple[int, object, int, str]]
+            The table of the distinct labels in the format (kind, label, ICHed, sort_info).
+            A comment is recorded as (KIND_COMMENT, comment, 0, "").
+    """
+
+    def __init__(self) -> "ColumnarForest":
+        """
+            The initializer, which gives an empty forest.
+        """
+        self.parent = array.array("l")
+        self.first_child = array.array("l")
+        self.last_child = array.array("l")
+        self.next_sibling = array.array("l")
+        self.label_id = array.array("l")
+        self.row = array.array("l")
+        self.column = array.array("l")
+        self.ICHed_column = array.array("l")
+        self.sort_info_column = array.array("l")
+        self.roots = array.array("l")
+
+        self.labels: typing.List[typing.Tuple[int, object, int, str]] = []
+        self.__label_ids: typing.Dict[typing.Tuple[int, object, int, str], int] = {}
+        self.__squeezed_kai_penn: typing.Dict[int, typing.Tuple[bool, str, str, str]] = {}
+
+        # ===END===
+
+    def __len__(self) -> int:
+        """
+            Give the number of the nodes.
+        """
+        return len(self.parent)
+
+        # ===END===
+
+    def __repr__(self) -> str:
+        return "<ColumnarForest: {trees} trees, {nodes} nodes, {labels} labels>".format(
+                    trees = len(self.roots),
+                    nodes = len(self.parent),
+                    labels = len(self.labels)
+                )
+
+        # ===END===
+
+    # ======
+    # Construction
+    # ======
+
+    def intern_label(self, label: typing.Tuple[int, object, int, str]) -> int:
+        """
+            Register a label in the label table if new and give its index.
+
+            Parameters
+            ----------
+            label: Tuple[int, object, int, str]
+                A label in the format (kind, label, ICHed, sort_info).
+
+            Returns
+            -------
+            label_id: int
+        """
+        label_id = self.__label_ids.get(label)
+
+        if label_id is None:
+            label_id = len(self.labels)
+            self.labels.append(label)
+            self.__label_ids[label] = label_id
+
+        return label_id
+
+        # ===END===
+
+    def add_node(
+            self,
+            parent: int,
+            label: typing.Tuple[int, object, int, str],
+            row: int = -1,
+            column: int = -1,
+            ICHed_column: int = -1,
+            sort_info_column: int = -1
+        ) -> int:
+        """
+            Add a node as the rightmost child of the given parent.
+
+            Parameters
+            ----------
+            parent: int
+                The ID of the parent, or NO_NODE to add a new top-level node.
+            label: Tuple[int, object, int, str]
+                The label in the format (kind, label, ICHed, sort_info).
+            row, column, ICHed_column, sort_info_column: int
+                The position of the label in the source document.
+
+            Returns
+            -------
+            node: int
+                The ID of the new node.
+        """
+        node = len(self.parent)
+
+        self.parent.append(parent)
+        self.first_child.append(NO_NODE)
+        self.last_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        self.label_id.append(self.intern_label(label))
+        self.row.append(row)
+        self.column.append(column)
+        self.ICHed_column.append(ICHed_column)
+        self.sort_info_column.append(sort_info_column)
+
+        if parent == NO_NODE:
+            self.roots.append(node)
+        else:
+            previous = self.last_child[parent]
+            if previous == NO_NODE:
+                self.first_child[parent] = node
+            else:
+                self.next_sibling[previous] = node
+            self.last_child[parent] = node
+
+        return node
+
+        # ===END===
+
+    def set_label(
+            self,
+            node: int,
+            label: typing.Tuple[int, object, int, str],
+            row: int = -1,
+            column: int = -1,
+            ICHed_column: int = -1,
+            sort_info_column: int = -1
+        ) -> None:
+        """
+            Replace the label of the given node together with its position.
+        """
+        self.label_id[node] = self.intern_label(label)
+        self.row[node] = row
+        self.column[node] = column
+        self.ICHed_column[node] = ICHed_column
+        self.sort_info_column[node] = sort_info_column
+
+        # ===END===
+
+    # ======
+    # Parsing
+    # ======
+
+    @staticmethod
+    def parse_kai_penn(stream: io.TextIOBase) -> "ColumnarForest":
+        """
+            Parse a text stream in the NPCMJ format directly into a columnar forest,
+            giving the same trees as TreeWithParent.parse_kai_penn.
+
+            Parameters
+            ----------
+            stream: io.TextIOBase
+
+            Returns
+            -------
+            forest: ColumnarForest
+        """
+        forest = ColumnarForest()
+        add_node = forest.add_node
+        label_id = forest.label_id
+
+        # the label of the nodes whose labels are not yet read
+        unlabelled = (KIND_NONE, None, 0, "")
+        unlabelled_id = forest.intern_label(unlabelled)
+
+        node_pointer: int = NO_NODE
+
+        for row, line_raw in enumerate(stream):
+            # ======
+            # Strip out comments
+            # ======
+            line_without_comment, *comment = line_raw.rstrip().split(";;", 1)
+
+            if comment:
+                add_node(
+                    node_pointer,
+                    (KIND_COMMENT, comment[0], 0, ""),
+                    row, len(line_without_comment)
+                    )
+
+            # ======
+            # go through each token
+            # ======
+            for token, column in strs.TreeWithParent.tokenize_kai_penn(line_without_comment):
+                if token == "(":
+                    # new node
+                    node_pointer = add_node(node_pointer, unlabelled)
+                elif token == ")":
+                    if node_pointer == NO_NODE:
+                        raise SyntaxError(
+                            "An unbalanced closing parenthesis is found " \
+                            "at Line {row_add}, Column {col_add}".format(
+                                row_add = row + 1,
+                                col_add = column + 1
+                                )
+                        )
+
+                    # if the current node has no label
+                    # create an empty one
+                    if label_id[node_pointer] == unlabelled_id:
+                        forest.set_label(
+                            node_pointer,
+                            (KIND_LABEL_COMPLEX, "", 0, ""),
+                            row, column, column, column
+                            )
+
+                    # move the pointer to the parent
+                    node_pointer = forest.parent[node_pointer]
+                elif node_pointer != NO_NODE and label_id[node_pointer] == unlabelled_id:
+                    # if the current node has no label
+                    # then this token must be that
+                    (
+                        (label, label_column),
+                        (ICHed, ICHed_column),
+                        (sort_info, sort_info_column)
+                    ) = strs._split_kai_penn_label_complex(token)
+
+                    forest.set_label(
+                        node_pointer,
+                        (KIND_LABEL_COMPLEX, label, ICHed, sort_info),
+                        row, label_column, ICHed_column, sort_info_column
+                        )
+                else:
+                    # we have found a terminal child node
+                    add_node(
+                        node_pointer,
+                        (KIND_LABEL_COMPLEX, token, 0, ""),
+                        row, column, column, column
+                        )
+
+        return forest
+
+        # ===END===
+
+    @staticmethod
+    def parse_kail(stream: io.TextIOBase) -> "ColumnarForest":
+        """
+            Parse a text stream in the Kail format directly into a columnar forest,
+            giving the same trees as TreeWithParent.parse_kail.
+
+            Parameters
+            ----------
+            stream: io.TextIOBase
+
+            Returns
+            -------
+            forest: ColumnarForest
+        """
+        forest = ColumnarForest()
+        add_node = forest.add_node
+        parent = forest.parent
+
+        indent: typing.List[int] = [-1]
+        node_pointer: int = NO_NODE
+
+        for row, line_raw in enumerate(stream):
+            # ======
+            # Strip out comments
+            # ======
+            line_without_comment, *comment = line_raw.rstrip().split("#", 1)
+
+            if comment:
+                add_node(
+                    node_pointer,
+                    (KIND_COMMENT, comment[0], 0, ""),
+                    row, len(line_without_comment)
+                    )
+
+            line = line_without_comment.rstrip()
+
+            if line == "": continue
+
+            # ======
+            # find the indent and the items for label complex
+            # ======
+            current_indent: int = len(line) - len(line.lstrip(" \t"))
+
+            current_label_complex: strs.Label_Complex_with_Pos = \
+                strs.Label_Complex_with_Pos.parse_from_kail(line, row)
+            current_label = (
+                KIND_LABEL_COMPLEX,
+                current_label_complex.label.content,
+                current_label_complex.ICHed.content,
+                current_label_complex.sort_info.content
+                )
+            current_position = (
+                row,
+                current_label_complex.label.column,
+                current_label_complex.ICHed.column,
+                current_label_complex.sort_info.column
+                )
+
+            # ======
+            # Position the label in a tree
+            # ======
+            previous_indent: int = indent[-1]
+
+            if current_indent > previous_indent:
+                node_pointer = add_node(node_pointer, current_label, *current_position)
+                indent.append(current_indent)
+            elif current_indent == previous_indent:
+                node_pointer = add_node(parent[node_pointer], current_label, *current_position)
+            else:
+                # go back to the parent
+                while True:
+                    indent.pop()
+                    node_pointer = parent[node_pointer]
+                    parent_indent = indent[-1]
+
+                    if current_indent > parent_indent:
+                        raise SyntaxError(
+                            "An unanchorable indent is found " \
+                            "at Line {row_add}, Column {col_add}".format(
+                                row_add = row + 1,
+                                col_add = current_label_complex.label.column + 1
+                                )
+                        )
+                    elif current_indent == parent_indent:
+                        node_pointer = add_node(
+                            parent[node_pointer], current_label, *current_position
+                            )
+                        break
+
+        return forest
+
+        # ===END===
+
+    # ======
+    # Conversion from/to TreeWithParent
+    # ======
+
+    @staticmethod
+    def from_trees(trees: typing.Iterable[strs.TreeWithParent]) -> "ColumnarForest":
+        """
+            Store the given trees in a new columnar forest.
+
+            Parameters
+            ----------
+            trees: Iterable[TreeWithParent]
+                The trees, each of which becomes a top-level tree in the forest.
+
+            Returns
+            -------
+            forest: ColumnarForest
+        """
+        forest = ColumnarForest()
+
+        for tree in trees:
+            forest.add_tree(tree)
+
+        return forest
+
+        # ===END===
+
+    def add_tree(self, tree: strs.TreeWithParent, parent: int = NO_NODE) -> int:
+        """
+            Copy the given tree into this forest as a rightmost child of the given parent.
+
+            Returns
+            -------
+            node: int
+                The ID of the root of the copied tree.
+        """
+        stack = [(tree, parent)]
+        root = NO_NODE
+
+        while stack:
+            current, current_parent = stack.pop()
+            label_object = current.get_label()
+
+            if isinstance(label_object, strs.Label_Complex_with_Pos):
+                node = self.add_node(
+                    current_parent,
+                    (
+                        KIND_LABEL_COMPLEX,
+                        label_object.label.content,
+                        label_object.ICHed.content,
+                        label_object.sort_info.content
+                    ),
+                    label_object.label.row,
+                    label_object.label.column,
+                    label_object.ICHed.column,
+                    label_object.sort_info.column
+                    )
+            elif isinstance(label_object, strs.Comment_with_Pos):
+                comment = label_object.comment
+                if isinstance(comment, strs.Object_with_Row_Column):
+                    node = self.add_node(
+                        current_parent,
+                        (KIND_COMMENT, comment.content, 0, ""),
+                        comment.row,
+                        comment.column
+                        )
+                else:
+                    node = self.add_node(
+                        current_parent,
+                        (KIND_COMMENT, comment, 0, "")
+                        )
+            else:
+                node = self.add_node(current_parent, (KIND_NONE, label_object, 0, ""))
+
+            if root == NO_NODE: root = node
+
+            stack.extend((child, node) for child in reversed(current))
+
+        return root
+
+        # ===END===
+
+    def get_label(self, node: int) -> object:
+        """
+            Build the label object of the given node
+            as it would be in a TreeWithParent.
+
+            Returns
+            -------
+            label: Label_Complex_with_Pos or Comment_with_Pos or None
+        """
+        kind, label, ICHed, sort_info = self.labels[self.label_id[node]]
+        row = self.row[node]
+
+        if kind == KIND_LABEL_COMPLEX:
+            return strs.Label_Complex_with_Pos(
+                label = strs.Object_with_Row_Column(label, row, self.column[node]),
+                ICHed = strs.Object_with_Row_Column(ICHed, row, self.ICHed_column[node]),
+                sort_info = strs.Object_with_Row_Column(
+                    sort_info, row, self.sort_info_column[node]
+                    )
+                )
+        elif kind == KIND_COMMENT:
+            return strs.Comment_with_Pos(
+                strs.Object_with_Row_Column(label, row, self.column[node])
+                )
+        else:
+            return label
+
+        # ===END===
+
+    def to_tree(self, node: int) -> strs.TreeWithParent:
+        """
+            Build a TreeWithParent of the subtree dominated by the given node.
+        """
+        tree = strs.TreeWithParent(self.get_label(node), children = [])
+        stack = [(node, tree)]
+
+        while stack:
+            current, current_tree = stack.pop()
+
+            for child in self.iter_children(current):
+                child_tree = strs.TreeWithParent(self.get_label(child), children = [])
+                current_tree.append(child_tree)
+
+                if self.first_child[child] != NO_NODE:
+                    stack.append((child, child_tree))
+
+        return tree
+
+        # ===END===
+
+    def iter_trees(self) -> typing.Iterator[strs.TreeWithParent]:
+        """
+            Build a TreeWithParent of each top-level tree in order.
+        """
+        return map(self.to_tree, self.roots)
+
+        # ===END===
+
+    # ======
+    # Tree traversing
+    # ======
+
+    def iter_children(self, node: int) -> typing.Iterator[int]:
+        """
+            Iterate the IDs of the children of the given node from the left.
+        """
+        next_sibling = self.next_sibling
+        child = self.first_child[node]
+
+        while child != NO_NODE:
+            yield child
+            child = next_sibling[child]
+
+        # ===END===
+
+    def traverse_dfs_pre(self, node: int) -> typing.Iterator[int]:
+        """
+            Iterate the IDs of the nodes dominated by the given node (including itself)
+            in the pre-order.
+            Since IDs are given in the pre-order when parsed,
+            this is mostly a scan over a contiguous range.
+        """
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        stack = [node]
+
+        while stack:
+            current = stack.pop()
+            yield current
+
+            # push the siblings from the right
+            children = []
+            child = first_child[current]
+            while child != NO_NODE:
+                children.append(child)
+                child = next_sibling[child]
+            stack.extend(reversed(children))
+
+        # ===END===
+
+    # ======
+    # Printing
+    # ======
+
+    def render_kai_penn_label(self, node: int) -> str:
+        """
+            Give the representation of the label of the given node in the NPCMJ style,
+            the same as given by Label_Complex_with_Pos.print_kai_penn and Comment_with_Pos.print_kai_penn.
+        """
+        return self.__render_kai_penn_label_id(self.label_id[node])
+
+        # ===END===
+
+    def __render_kai_penn_label_id(self, label_id: int) -> str:
+        kind, label, ICHed, sort_info = self.labels[label_id]
+
+        # rendered by the same (memoized) functions as the labels of TreeWithParent
+        if kind == KIND_LABEL_COMPLEX:
+            return strs._render_kai_penn_label_complex(label, ICHed, sort_info)
+        elif kind == KIND_COMMENT:
+            return strs.Comment_with_Pos(label).print_kai_penn()
+        else:
+            return str(label)
+
+        # ===END===
+
+    def render_kail_label(self, node: int) -> str:
+        """
+            Give the representation of the label of the given node in the Kail style,
+            the same as given by Label_Complex_with_Pos.print_kail and Comment_with_Pos.print_kail.
+        """
+        kind, label, ICHed, sort_info = self.labels[self.label_id[node]]
+
+        if kind == KIND_LABEL_COMPLEX:
+            return strs._render_kail_label_complex(label, ICHed, sort_info)
+        elif kind == KIND_COMMENT:
+            return strs.Comment_with_Pos(label).print_kail()
+        else:
+            return str(label)
+
+        # ===END===
+
+    def is_comment(self, node: int) -> bool:
+        return self.labels[self.label_id[node]][0] == KIND_COMMENT
+
+        # ===END===
+
+    def iter_kai_penn_indented_fragments(
+            self,
+            node: int,
+            show_comments: bool = True
+        ) -> typing.Iterator[str]:
+        """
+            Generate the fragments of the well-indented representation of the tree
+            dominated by the given node, in order.
+            The concatenation of them is the same as given by TreeWithParent.print_kai_penn_indented.
+            A node whose children are all hidden comments is printed as a terminal one.
+        """
+        if not show_comments and self.is_comment(node): return
+
+        def iter_visible_children(current: int) -> typing.Iterator[int]:
+            if show_comments:
+                return self.iter_children(current)
+            else:
+                return (
+                    child for child in self.iter_children(current)
+                    if not self.is_comment(child)
+                    )
+
+            # ===END===
+
+        # the stack of (iterator of the remaining children, their indent)
+        stack: typing.List[typing.Tuple[typing.Iterator[int], int]] = []
+
+        current: int = node
+        current_indent: int = 0
+        is_first: bool = False
+
+        while True:
+            label_raw = self.render_kai_penn_label(current)
+            children = iter_visible_children(current)
+            first_child = next(children, NO_NODE)
+
+            if first_child == NO_NODE:
+                # a terminal node
+                yield label_raw.strip() if is_first else " " * current_indent + label_raw
+
+                # find the next node to be printed, closing the finished nodes
+                while stack:
+                    remaining, current_indent = stack[-1]
+                    current = next(remaining, NO_NODE)
+
+                    if current == NO_NODE:
+                        stack.pop()
+                        yield ")"
+                    else:
+                        yield "\n"
+                        is_first = False
+                        break
+                else:
+                    return
+            else:
+                # a non-terminal node
+                if not is_first: yield " " * current_indent
+                yield "("
+                yield label_raw
+                yield " "
+
+                child_indent = current_indent + 1 + len(label_raw) + 1
+                stack.append((children, child_indent))
+
+                current = first_child
+                current_indent = child_indent
+                is_first = True
+
+        # ===END===
+
+    def print_kai_penn_indented(self, node: int, show_comments: bool = True) -> str:
+        """
+            Generate the well-indented representation of the tree dominated by the given node.
+        """
+        return "".join(
+            self.iter_kai_penn_indented_fragments(node, show_comments = show_comments)
+            )
+
+        # ===END===
+
+    def write_kai_penn_indented(
+            self, 
+            out: typing.TextIO, 
+            node: int, 
+            show_comments: bool = True
+        ) -> None:
+        """
+            Write the well-indented representation of the tree dominated by the given node
+            to the given file, fragment by fragment, without building the whole string.
+        """
+        out.writelines(
+            self.iter_kai_penn_indented_fragments(node, show_comments = show_comments)
+            )
+
+        # ===END===
+
+    def iter_kai_penn_squeezed_fragments(
+            self,
+            node: int,
+            show_comments: bool = True
+        ) -> typing.Iterator[str]:
+        """
+            Generate the fragments of the one-line representation of the tree
+            dominated by the given node, in order, walking the tree once.
+            The concatenation of them is the same as given by TreeWithParent.print_kai_penn_squeezed,
+            i.e. the well-indented representation with every run of whitespaces squeezed
+            into a single space, but no indents are generated in the first place.
+            The walk follows the sibling links instead of iterating the children,
+            and the squeezed forms of each distinct label are made only once.
+        """
+        labels = self.labels
+        label_id = self.label_id
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        squeeze_label = self.__squeeze_kai_penn_label
+
+        def is_hidden(current: int) -> bool:
+            return not show_comments and labels[label_id[current]][0] == KIND_COMMENT
+
+            # ===END===
+
+        if is_hidden(node): return
+
+        # the ancestors of the current node up to the given one
+        stack: typing.List[int] = []
+
+        current: int = node
+        is_first: bool = False
+        # whether the text generated so far ends with a space
+        is_after_space: bool = False
+
+        while True:
+            # find the first child which is not hidden
+            child = first_child[current]
+            while child != NO_NODE and is_hidden(child):
+                child = next_sibling[child]
+
+            has_whitespace, opening, text, first_text = squeeze_label(label_id[current])
+
+            if child == NO_NODE:
+                # a terminal node
+                if is_first: text = first_text
+                if has_whitespace and is_after_space and text[:1] == " ": text = text[1:]
+                if text: is_after_space = text[-1] == " "
+
+                yield text
+
+                # find the next subtree, closing the completed ones
+                while stack:
+                    current = next_sibling[current]
+                    while current != NO_NODE and is_hidden(current):
+                        current = next_sibling[current]
+
+                    if current == NO_NODE:
+                        current = stack.pop()
+                        yield ")"
+                        is_after_space = False
+                        continue
+
+                    is_first = False
+                    if not is_after_space: yield " "
+                    is_after_space = True
+                    break
+                else:
+                    return
+            else:
+                # a non-terminal node
+                yield opening
+                is_after_space = True
+
+                stack.append(current)
+
+                current = child
+                is_first = True
+
+        # ===END===
+
+    def __squeeze_kai_penn_label(self, label_id: int) -> typing.Tuple[bool, str, str, str]:
+        """
+            Give the forms of a label in the one-line representation:
+            whether it has whitespaces,
+            the opening of a non-terminal node (the parenthesis, the label and a space),
+            the text of a terminal node, and that of a first child (stripped).
+        """
+        squeezed = self.__squeezed_kai_penn.get(label_id)
+
+        if squeezed is None:
+            raw = self.__render_kai_penn_label_id(label_id)
+            squeeze = functools.partial(strs._re_whitespaces.sub, " ")
+
+            if strs._re_whitespace.search(raw):
+                text = squeeze(raw)
+                squeezed = (
+                    True,
+                    "(" + text if text[-1:] == " " else "(" + text + " ",
+                    text,
+                    squeeze(raw.strip())
+                    )
+            else:
+                squeezed = (False, "(" + raw + " ", raw, raw)
+
+            self.__squeezed_kai_penn[label_id] = squeezed
+
+        return squeezed
+
+        # ===END===
+
+    def print_kai_penn_squeezed(self, node: int, show_comments: bool = True) -> str:
+        """
+            Generate the one-line representation of the tree dominated by the given node.
+        """
+        return "".join(
+            self.iter_kai_penn_squeezed_fragments(node, show_comments = show_comments)
+            )
+
+        # ===END===
+
+    def write_kai_penn_squeezed(
+            self, 
+            out: typing.TextIO, 
+            node: int, 
+            show_comments: bool = True
+        ) -> None:
+        """
+            Write the one-line representation of the tree dominated by the given node
+            to the given file.
+        """
+        out.writelines(
+            self.iter_kai_penn_squeezed_fragments(node, show_comments = show_comments)
+            )
+
+        # ===END===
+
+    def iter_kail_lines(
+            self, 
+            node: int, 
+            indent_amount: int = 2
+        ) -> typing.Iterator[typing.Tuple[int, str]]:
+        """
+            Generate the lines of the representation of the tree dominated by the given node
+            in the Kail style, each as the pair of its indent and its label.
+        """
+        depth = {node: 0}
+
+        for current in self.traverse_dfs_pre(node):
+            current_depth = depth.pop(current)
+            yield current_depth * indent_amount, self.render_kail_label(current)
+
+            for child in self.iter_children(current):
+                depth[child] = current_depth + 1
+
+        # ===END===
+
+    def print_kail(self, node: int, indent_amount: int = 2) -> str:
+        """
+            Generate the representation of the tree dominated by the given node
+            in the Kail style.
+        """
+        return "\n".join(
+            " " * current_indent + current_label_raw
+            for current_indent, current_label_raw
+            in self.iter_kail_lines(node, indent_amount = indent_amount)
+            )
+
+        # ===END===
+
+    def write_kail(
+            self, 
+            out: typing.TextIO, 
+            node: int, 
+            indent_amount: int = 2
+        ) -> None:
+        """
+            Write the representation of the tree dominated by the given node
+            in the Kail style to the given file, line by line.
+        """
+        out.writelines(
+            ("\n" if number else "") + " " * current_indent + current_label_raw
+            for number, (current_indent, current_label_raw) in enumerate(
+                self.iter_kail_lines(node, indent_amount = indent_amount)
+                )
+            )
+
+        # ===END===
+
+    # ======
+    # Serialization
+    # ======
+
+    def dump(self, file: typing.BinaryIO) -> None:
+        """
+            Write this forest to a binary file in a compact format,
+            which consists of
+                the header (BINARY_MAGIC, BINARY_VERSION and the sizes),
+                the label table (the kinds, the ICH indices, 
+                    the lengths of the label and sort_info strings 
+                    and the strings themselves in UTF-8),
+                the node arrays and the roots.
+            The integers in the tables are 32-bit little-endian.
+            Each of the node arrays and the roots is packed (see write_packed_array)
+            after being turned into small numbers:
+                first_child and next_sibling as the distances from the node (0 for none),
+                and row and the roots as the differences from the previous ones.
+            The parent and last_child arrays are not written,
+            since they are rebuilt from first_child and next_sibling.
+            Only the labels that the parsers produce can be dumped,
+            that is, the label of a KIND_NONE node must be None.
+
+            Parameters
+            ----------
+            file: typing.BinaryIO
+        """
+        kinds = array.array("B")
+        ICHeds = array.array("i")
+        string_lengths = array.array("i")
+        strings: typing.List[str] = []
+
+        for kind, label, ICHed, sort_info in self.labels:
+            if kind == KIND_NONE:
+                if label is not None:
+                    raise TypeError(
+                        "Cannot dump a label of the type {}".format(type(label).__name__)
+                        )
+                label = ""
+
+            kinds.append(kind)
+            ICHeds.append(ICHed)
+            string_lengths.append(len(label))
+            string_lengths.append(len(sort_info))
+            strings.append(label)
+            strings.append(sort_info)
+
+        string_blob = "".join(strings).encode("utf-8")
+
+        file.write(
+            _binary_header.pack(
+                BINARY_MAGIC, 
+                BINARY_VERSION,
+                len(self.labels),
+                len(self),
+                len(self.roots),
+                len(string_blob)
+                )
+            )
+        file.write(kinds.tobytes())
+        _write_int_array(file, ICHeds)
+        _write_int_array(file, string_lengths)
+        file.write(string_blob)
+
+        for links in (self.first_child, self.next_sibling):
+            write_packed_array(
+                file, 
+                (0 if linked == NO_NODE else linked - node for node, linked in enumerate(links))
+                )
+        write_packed_array(file, self.label_id)
+        write_packed_array(file, iter_differences(self.row))
+        write_packed_array(file, self.column)
+        write_packed_array(file, self.ICHed_column)
+        write_packed_array(file, self.sort_info_column)
+        write_packed_array(file, iter_differences(self.roots))
+
+        # ===END===
+
+    @staticmethod
+    def load(file: typing.BinaryIO) -> "ColumnarForest":
+        """
+            Read a forest written by ColumnarForest.dump.
+
+            Parameters
+            ----------
+            file: typing.BinaryIO
+
+            Returns
+            -------
+            forest: ColumnarForest
+
+            Raises
+            ------
+            ValueError
+                If the file is not in the binary format of this version, 
+                or is truncated or broken.
+        """
+        (
+            magic, version, labels_size, nodes_size, roots_size, string_blob_size
+        ) = _binary_header.unpack(read_exactly(file, _binary_header.size))
+
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError("Not a forest in the binary format version {}".format(BINARY_VERSION))
+
+        kinds = array.array("B", read_exactly(file, labels_size))
+        ICHeds = _read_int_array(file, labels_size)
+        string_lengths = _read_int_array(file, labels_size * 2)
+        strings = read_exactly(file, string_blob_size).decode("utf-8")
+
+        if (kinds and max(kinds) > KIND_NONE) \
+                or (string_lengths and min(string_lengths) < 0) \
+                or sum(string_lengths) != len(strings):
+            raise ValueError("The binary forest is broken")
+
+        forest = ColumnarForest()
+        position = 0
+
+        for label_id, kind in enumerate(kinds):
+            label_end = position + string_lengths[label_id * 2]
+            sort_info_end = label_end + string_lengths[label_id * 2 + 1]
+
+            forest.intern_label(
+                (
+                    kind,
+                    None if kind == KIND_NONE else strings[position:label_end],
+                    ICHeds[label_id],
+                    strings[label_end:sort_info_end]
+                )
+            )
+
+            position = sort_info_end
+
+        first_child, next_sibling = (
+            _read_links(file, nodes_size) for _ in range(2)
+        )
+        forest.label_id = read_packed_array(file, nodes_size)
+        forest.row = array.array("l", itertools.accumulate(read_packed_array(file, nodes_size)))
+        forest.column = read_packed_array(file, nodes_size)
+        forest.ICHed_column = read_packed_array(file, nodes_size)
+        forest.sort_info_column = read_packed_array(file, nodes_size)
+        forest.roots = array.array(
+            "l", itertools.accumulate(read_packed_array(file, roots_size))
+            )
+
+        for values, size in ((forest.label_id, labels_size), (forest.roots, nodes_size)):
+            if values and not (0 <= min(values) and max(values) < size):
+                raise ValueError("The binary forest is broken")
+
+        # rebuild the links to the parents and the last children
+        parent = array.array("l", [NO_NODE]) * nodes_size
+        last_child = array.array("l", [NO_NODE]) * nodes_size
+
+        try:
+            for node, child in enumerate(first_child):
+                if child == NO_NODE: continue
+
+                while True:
+                    # a node cannot be a child twice (which also rules out cycles)
+                    if parent[child] != NO_NODE:
+                        raise ValueError("The binary forest is broken")
+
+                    parent[child] = node
+                    following = next_sibling[child]
+                    if following == NO_NODE: break
+                    child = following
+
+                last_child[node] = child
+        except IndexError:
+            raise ValueError("The binary forest is broken")
+
+        forest.parent = parent
+        forest.first_child = first_child
+        forest.last_child = last_child
+        forest.next_sibling = next_sibling
+
+        return forest
+
+        # ===END===
+
+def _read_links(file: typing.BinaryIO, size: int) -> array.array:
+    """
+        Read the links between the nodes written as the distances from the nodes
+        (see ColumnarForest.dump) into the node IDs, NO_NODE for none,
+        raising ValueError if any of them is out of the nodes.
+    """
+    distances = read_packed_array(file, size)
+    links = array.array(
+        "l",
+        (
+            node + distance if distance else NO_NODE 
+            for node, distance in enumerate(distances)
+        )
+        )
+
+    # NO_NODE is also counted to find a distance that leads to it
+    if len(links) != size \
+            or (links and not (NO_NODE <= min(links) and max(links) < size)) \
+            or links.count(NO_NODE) != distances.count(0):
+        raise ValueError("The binary forest is broken")
+
+    return links
+
+    # ===END===
+
+def iter_differences(values: typing.Iterable[int]) -> typing.Iterator[int]:
+    """
+        Give the differences of the integers from the previous ones (from 0 for the first).
+    """
+    previous = 0
+
+    for value in values:
+        yield value - previous
+        previous = value
+
+    # ===END===
+
+def _write_int_array(file: typing.BinaryIO, values: array.array) -> None:
+    """
+        Write integers as 32-bit little-endian ones.
+    """
+    values = array.array("i", values)
+    if sys.byteorder == "big": values.byteswap()
+
+    file.write(values.tobytes())
+
+    # ===END===
+
+def _read_int_array(file: typing.BinaryIO, size: int) -> array.array:
+    """
+        Read the given number of 32-bit little-endian integers 
+        into an array of the type of the node arrays.
+    """
+    values = array.array("i", read_exactly(file, size * 4))
+    if sys.byteorder == "big": values.byteswap()
+
+    return array.array("l", values)
+
+    # ===END===
+
+def write_packed_array(file: typing.BinaryIO, values: typing.Iterable[int]) -> None:
+    """
+        Write integers as little-endian ones of the narrowest width 
+        (8, 16 or 32 bits, see _packed_typecodes) that holds all of them,
+        preceded by the type code of the width.
+    """
+    values = array.array("i", values)
+    low, high = (min(values), max(values)) if values else (0, 0)
+
+    for typecode in _packed_typecodes:
+        limit = 1 << (array.array(typecode).itemsize * 8 - 1)
+        if -limit <= low and high < limit: break
+
+    packed = array.array(typecode, values)
+    if sys.byteorder == "big": packed.byteswap()
+
+    file.write(typecode.encode("ascii"))
+    file.write(packed.tobytes())
+
+    # ===END===
+
+def read_packed_array(file: typing.BinaryIO, size: int) -> array.array:
+    """
+        Read the given number of integers written by write_packed_array
+        into an array of the type of the node arrays.
+    """
+    typecode = read_exactly(file, 1).decode("ascii", errors = "replace")
+    if typecode not in _packed_typecodes:
+        raise ValueError("An unknown type code of a packed array: {!r}".format(typecode))
+
+    values = array.array(typecode)
+    values.frombytes(read_exactly(file, size * values.itemsize))
+    if sys.byteorder == "big": values.byteswap()
+
+    return array.array("l", values)
+
+    # ===END===
+
+def read_exactly(file: typing.BinaryIO, size: int) -> bytes:
+    """
+        Read the given number of bytes, raising ValueError if the file ends earlier.
+    """
+    data = file.read(size)
+
+    if len(data) != size:
+        raise ValueError("The binary data is truncated")
+
+    return data
+
+    # ===END===
@@ -0,0 +1,1126 @@
+import typing
+import io
+import os
+import glob
+import mmap
+import functools
+import concurrent.futures
+
+import kail.structures as strs
+import kail.columnar as col
+import kail.cache as cache
+
+"""
+    This module provides the conversion pipeline between the NPCMJ and the Kail formats,
+    from a single stream up to a batch of files converted in parallel.
+"""
+
+# The suffixes of the files to be collected from directories, by input formats
+INPUT_SUFFIXES: typing.Dict[str, typing.Tuple[str, ...]] = {
+    "penn": (".psd", ".kai"),
+    "kail": (".kail", ),
+}
+
+# The suffixes of the output files, by output formats
+OUTPUT_SUFFIXES: typing.Dict[str, str] = {
+    "penn": ".psd",
+    "kail": ".kail",
+}
+
+# The output variants of the multi-output conversion (see convert_trees_multi),
+# by their names: (the output format, whether to print each tree in one line)
+OUTPUT_VARIANTS: typing.Dict[str, typing.Tuple[str, bool]] = {
+    "penn": ("penn", False),
+    "penn_compact": ("penn", True),
+    "kail": ("kail", False),
+}
+
+# The least size (in bytes) of a chunk of a file converted in parallel
+CHUNK_SIZE: int = 1 << 20
+
+def convert_stream(
+        input_file: typing.TextIO,
+        output_file: typing.TextIO,
+        input_format: str = "penn",
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        first_row: int = 0
+        ) -> int:
+    """
+        Convert the trees in the input stream tree by tree,
+        writing each of them to the output stream as soon as it is parsed.
+
+        Parameters
+        ----------
+        input_file: typing.TextIO
+        output_file: typing.TextIO
+        input_format: str, default "penn"
+            "penn" or "kail"
+        output_format: str, default "penn"
+            "penn" or "kail"
+        comments: bool, default True
+            whether to show comments (only for the output format "penn")
+        compact: bool, default False
+            whether to print each tree in one line (only for the output format "penn")
+        first_row: int, default 0
+            the row number of the first line of the input stream (beginning with 0)
+
+        Returns
+        -------
+        items: int
+            the number of the items (trees and comments) given to the output
+    """
+    return convert_trees(
+        iter_trees(input_file, input_format, first_row = first_row),
+        output_file,
+        output_format = output_format,
+        comments = comments,
+        compact = compact
+    )
+
+    # ===END===
+
+def convert_buffer(
+        buffer: typing.Union[bytes, mmap.mmap],
+        output_file: typing.TextIO,
+        input_format: str = "penn",
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        first_row: int = 0
+        ) -> int:
+    """
+        The same as convert_stream,
+        except that the input is a UTF-8 encoded bytes-like object
+        (e.g. a memory-mapped file), which is scanned without being decoded as a whole.
+    """
+    return convert_trees(
+        iter_trees_bytes(buffer, input_format, first_row = first_row),
+        output_file,
+        output_format = output_format,
+        comments = comments,
+        compact = compact
+    )
+
+    # ===END===
+
+def convert_bytes(
+        data: bytes,
+        first_row: int,
+        options: typing.Dict[str, object]
+        ) -> typing.Tuple[str, int]:
+    """
+        Convert a part of a UTF-8 encoded input (see convert_buffer) into a string.
+        This is the unit of the work sent to the worker threads or processes.
+
+        Parameters
+        ----------
+        data: bytes
+            a whole number of the top-level items (e.g. a span given by scan_tree_spans)
+        first_row: int
+            the row of the first line of the part in the whole input (beginning with 0)
+        options: Dict[str, object]
+            the keyword arguments of convert_buffer 
+            (input_format, output_format, comments and compact)
+
+        Returns
+        -------
+        text: str
+            The output text.
+        items: int
+            The number of the items in the text.
+    """
+    output = io.StringIO()
+    items = convert_buffer(data, output, first_row = first_row, **options)
+
+    return output.getvalue(), items
+
+    # ===END===
+
+def convert_mapped_file(
+        input_path: str,
+        output_file: typing.TextIO,
+        **options
+        ) -> int:
+    """
+        Convert a file through a read-only memory map of it,
+        with the same options as convert_buffer.
+        The lines are still decoded one by one and parsed as text as in convert_stream,
+        so this is not faster than that.
+    """
+    with open(input_path, "rb") as input_file:
+        if os.fstat(input_file.fileno()).st_size == 0:
+            # an empty file cannot be mapped
+            return convert_buffer(b"", output_file, **options)
+
+        with mmap.mmap(input_file.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+            return convert_buffer(buffer, output_file, **options)
+
+    # ===END===
+
+def convert_cached_file(
+        input_path: str,
+        output_file: typing.TextIO,
+        input_format: str = "penn",
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        cache_dir: typing.Optional[str] = None
+        ) -> int:
+    """
+        Convert a file through the on-disk cache of parsed files (see kail.cache).
+        If the file is cached, the trees are printed directly from the cached columnar forest.
+        Otherwise each tree is written as soon as it is parsed, as in convert_stream,
+        and stored in a forest which is cached at the end.
+        The output is the same as convert_stream.
+    """
+    source = cache.get_file_digest(input_path)
+    forest = cache.load_forest(input_path, input_format, cache_dir, source = source)
+
+    if forest is not None:
+        return convert_forest(
+            forest,
+            output_file,
+            output_format = output_format,
+            comments = comments,
+            compact = compact
+        )
+
+    forest = col.ColumnarForest()
+
+    def iter_stored(
+            trees: typing.Iterable[strs.TreeWithParent]
+        ) -> typing.Iterator[strs.TreeWithParent]:
+        for tree in trees:
+            forest.add_tree(tree)
+            yield tree
+
+        # ===END===
+
+    with open(input_path, "r", encoding = "utf-8") as input_file:
+        items = convert_trees(
+            iter_stored(iter_trees(input_file, input_format)),
+            output_file,
+            output_format = output_format,
+            comments = comments,
+            compact = compact
+        )
+
+    cache.store_forest(input_path, forest, input_format, cache_dir, source = source)
+
+    return items
+
+    # ===END===
+
+def convert_forest(
+        forest: col.ColumnarForest,
+        output_file: typing.TextIO,
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        comment_placement: typing.Optional[str] = None
+        ) -> int:
+    """
+        Write the trees in a columnar forest to the output stream in the given format,
+        giving the number of the items (trees and comments) written.
+        The output is the same as convert_trees on the trees of the forest.
+    """
+    separator, skip_empty = get_output_layout(output_format, compact)
+
+    return write_joined(
+        output_file,
+        iter_forest_writers(
+            forest,
+            output_format = output_format,
+            comments = comments,
+            compact = compact,
+            comment_placement = comment_placement
+            ),
+        separator = separator,
+        skip_empty = skip_empty
+    )
+
+    # ===END===
+
+def iter_forest_writers(
+        forest: col.ColumnarForest,
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        comment_placement: typing.Optional[str] = None
+        ) -> typing.Iterator[typing.Callable[[typing.TextIO], None]]:
+    """
+        Give the functions each of which writes an item to be printed to a given file, in order,
+        in the same way as iter_tree_writers, but without building any TreeWithParent.
+    """
+    if output_format == "penn":
+        if comment_placement is None:
+            comment_placement = get_comment_placement(comments, compact)
+
+        if compact:
+            # One-line mode
+            write = forest.write_kai_penn_squeezed
+        else:
+            # Pretty mode
+            write = forest.write_kai_penn_indented
+
+        def writer(node: int, show_comments: bool) -> typing.Callable[[typing.TextIO], None]:
+            return functools.partial(write, node = node, show_comments = show_comments)
+
+            # ===END===
+
+        for root in forest.roots:
+            is_comment = forest.is_comment(root)
+
+            if comment_placement == strs.COMMENT_INLINE:
+                yield writer(root, True)
+            elif comment_placement == strs.COMMENT_RAISE_OUT:
+                yield writer(root, is_comment)
+                if not is_comment:
+                    # the comments are raised out and follow the tree
+                    yield from (
+                        writer(node, True)
+                        for node in forest.traverse_dfs_pre(root)
+                        if forest.is_comment(node)
+                    )
+            elif comment_placement == strs.COMMENT_HIDE:
+                if not is_comment: yield writer(root, False)
+            else:
+                raise ValueError(comment_placement)
+    elif output_format == "kail":
+        # Pretty mode only
+        for root in forest.roots:
+            yield functools.partial(forest.write_kail, node = root)
+    else:
+        raise ValueError(output_format)
+
+    # ===END===
+
+def convert_trees(
+        trees: typing.Iterable[strs.TreeWithParent],
+        output_file: typing.TextIO,
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        comment_placement: typing.Optional[str] = None
+        ) -> int:
+    """
+        Write the trees to the output stream in the given format,
+        giving the number of the items (trees and comments) written.
+        The trees are left unchanged (see iter_tree_writers).
+    """
+    separator, skip_empty = get_output_layout(output_format, compact)
+
+    return write_joined(
+        output_file,
+        iter_tree_writers(
+            trees,
+            output_format = output_format,
+            comments = comments,
+            compact = compact,
+            comment_placement = comment_placement
+            ),
+        separator = separator,
+        skip_empty = skip_empty
+    )
+
+    # ===END===
+
+def convert_stream_multi(
+        input_file: typing.TextIO,
+        outputs: typing.Sequence[typing.Tuple[str, typing.TextIO]],
+        input_format: str = "penn",
+        comments: bool = True,
+        first_row: int = 0
+        ) -> typing.List[int]:
+    """
+        Convert the trees in the input stream into several outputs at once,
+        parsing each tree only once (see convert_trees_multi).
+    """
+    return convert_trees_multi(
+        iter_trees(input_file, input_format, first_row = first_row),
+        outputs,
+        comments = comments
+    )
+
+    # ===END===
+
+def convert_trees_multi(
+        trees: typing.Iterable[strs.TreeWithParent],
+        outputs: typing.Sequence[typing.Tuple[str, typing.TextIO]],
+        comments: bool = True
+        ) -> typing.List[int]:
+    """
+        Write each of the trees to all the outputs in turn before taking the next one,
+        so that the outputs proceed in lockstep and each tree is parsed only once.
+        The trees are not changed by printing (see iter_tree_writers).
+
+        Parameters
+        ----------
+        trees: Iterable[TreeWithParent]
+        outputs: Sequence[Tuple[str, TextIO]]
+            the pairs of the name of an output variant (see OUTPUT_VARIANTS) and the output stream
+        comments: bool, default True
+            whether to show comments (only for the output format "penn")
+
+        Returns
+        -------
+        items: List[int]
+            the number of the items (trees and comments) written to each output
+    """
+    sinks: typing.List[typing.Tuple[Separated_Writer, str, bool]] = []
+
+    for variant, output_file in outputs:
+        if variant not in OUTPUT_VARIANTS:
+            raise ValueError(variant)
+
+        output_format, compact = OUTPUT_VARIANTS[variant]
+        separator, skip_empty = get_output_layout(output_format, compact)
+        sinks.append(
+            (Separated_Writer(output_file, separator, skip_empty), output_format, compact)
+            )
+
+    items = [0] * len(sinks)
+
+    for tree in trees:
+        for number, (sink, output_format, compact) in enumerate(sinks):
+            for writer in iter_tree_writers(
+                    (tree, ),
+                    output_format = output_format,
+                    comments = comments,
+                    compact = compact
+                    ):
+                sink.begin_item()
+                writer(sink)
+                items[number] += 1
+
+    return items
+
+    # ===END===
+
+def iter_trees(
+        input_file: typing.TextIO,
+        input_format: str = "penn",
+        first_row: int = 0
+        ) -> typing.Iterator[strs.TreeWithParent]:
+    """
+        Parse the input stream in the given format tree by tree.
+    """
+    if input_format == "penn":
+        return strs.TreeWithParent.iter_kai_penn(input_file, first_row = first_row)
+    elif input_format == "kail":
+        return strs.TreeWithParent.iter_kail(input_file, first_row = first_row)
+    else:
+        raise ValueError(input_format)
+
+    # ===END===
+
+def iter_trees_bytes(
+        buffer: typing.Union[bytes, mmap.mmap],
+        input_format: str = "penn",
+        first_row: int = 0
+        ) -> typing.Iterator[strs.TreeWithParent]:
+    """
+        Parse the UTF-8 encoded bytes in the given format tree by tree.
+    """
+    if input_format == "penn":
+        return strs.TreeWithParent.iter_kai_penn_bytes(buffer, first_row = first_row)
+    elif input_format == "kail":
+        return strs.TreeWithParent.iter_kail_bytes(buffer, first_row = first_row)
+    else:
+        raise ValueError(input_format)
+
+    # ===END===
+
+def get_output_layout(
+        output_format: str = "penn",
+        compact: bool = False
+        ) -> typing.Tuple[str, bool]:
+    """
+        Give the separator put between the printed trees in the given output format,
+        and whether empty ones are skipped.
+    """
+    if output_format == "penn":
+        if compact:
+            # One-line mode
+            return "\n", True
+        else:
+            # Pretty mode
+            return "\n\n", True
+    elif output_format == "kail":
+        # Pretty mode only
+        return "\n", False
+    else:
+        raise ValueError(output_format)
+
+    # ===END===
+
+def get_comment_placement(
+        comments: bool = True,
+        compact: bool = False
+        ) -> str:
+    """
+        Give the default placement of the comments in the Penn output 
+        (see strs.COMMENT_PLACEMENTS):
+        raised out of the trees in the one-line mode,
+        and left where they are in the pretty mode.
+    """
+    if not comments:
+        return strs.COMMENT_HIDE
+    elif compact:
+        return strs.COMMENT_RAISE_OUT
+    else:
+        return strs.COMMENT_INLINE
+
+    # ===END===
+
+def iter_tree_writers(
+        trees: typing.Iterable[strs.TreeWithParent],
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        comment_placement: typing.Optional[str] = None
+        ) -> typing.Iterator[typing.Callable[[typing.TextIO], None]]:
+    """
+        Give the functions each of which writes an item to be printed to a given file, in order.
+        The items are the given trees, 
+        together with the comments raised out of them if needed.
+        The trees are left unchanged, so that they can be printed again in another way.
+
+        Parameters
+        ----------
+        comment_placement: str, optional
+            the placement of the comments in the Penn output (see strs.COMMENT_PLACEMENTS),
+            which overrides comments (get_comment_placement(comments, compact) when not specified)
+    """
+    if output_format == "penn":
+        if comment_placement is None:
+            comment_placement = get_comment_placement(comments, compact)
+
+        if compact:
+            # One-line mode
+            write = strs.TreeWithParent.write_kai_penn_squeezed
+        else:
+            # Pretty mode
+            write = strs.TreeWithParent.write_kai_penn_indented
+
+        return (
+            functools.partial(write, item, show_comments = show_comments)
+            for tree in trees
+            for item, show_comments in tree.iter_placed_items(comment_placement)
+        )
+    elif output_format == "kail":
+        # Pretty mode only
+        return (tree.write_kail for tree in trees)
+    else:
+        raise ValueError(output_format)
+
+    # ===END===
+
+def write_joined(
+        output_file: typing.TextIO,
+        writers: typing.Iterable[typing.Callable[[typing.TextIO], None]],
+        separator: str,
+        skip_empty: bool = True
+        ) -> int:
+    """
+        Let each of the writers write its text to the file in turn,
+        putting the separator between them,
+        which amounts to output_file.write(separator.join(texts)).
+
+        Parameters
+        ----------
+        writers: Iterable[Callable[[TextIO], None]]
+            the functions each of which writes a text to the given file
+        skip_empty: bool, default True
+            whether to skip empty texts (together with their separators)
+
+        Returns
+        -------
+        items: int
+            the number of the writers
+    """
+    sink = Separated_Writer(output_file, separator, skip_empty)
+    items = 0
+
+    for writer in writers:
+        sink.begin_item()
+        writer(sink)
+        items += 1
+
+    return items
+
+    # ===END===
+
+class Separated_Writer:
+    """
+        A write-only wrapper of a text file which puts a separator between items.
+        When empty items are skipped, the separator is held back
+        until the next item turns out to be non-empty.
+    """
+
+    def __init__(
+            self,
+            output_file: typing.TextIO,
+            separator: str,
+            skip_empty: bool = True
+            ) -> "Separated_Writer":
+        self.output_file = output_file
+        self.separator = separator
+        self.skip_empty = skip_empty
+
+        self.__has_items = False
+        self.__separator_pending = False
+
+        # ===END===
+
+    def begin_item(self) -> None:
+        """
+            Declare that the following writes belong to a new item.
+        """
+        if self.__has_items: self.__separator_pending = True
+
+        if not self.skip_empty:
+            self.__flush_separator()
+            self.__has_items = True
+
+        # ===END===
+
+    def __flush_separator(self) -> None:
+        if self.__separator_pending:
+            self.output_file.write(self.separator)
+            self.__separator_pending = False
+
+        # ===END===
+
+    def write(self, text: str) -> int:
+        if text:
+            self.__flush_separator()
+            self.__has_items = True
+
+        return self.output_file.write(text)
+
+        # ===END===
+
+    def writelines(self, texts: typing.Iterable[str]) -> None:
+        texts = iter(texts)
+
+        # find the first non-empty text
+        for text in texts:
+            if text:
+                self.write(text)
+                break
+
+        # hand the rest over in one write,
+        # since every write to some files costs much 
+        # (e.g. the standard output wrapped by click checks that it is not closed)
+        self.output_file.write("".join(texts))
+
+        # ===END===
+
+def convert_file(
+        input_path: str,
+        output_path: str,
+        **options
+        ) -> None:
+    """
+        Convert the input file into the output file.
+        The options are the same as convert_stream.
+    """
+    with open(input_path, "r") as input_file, \
+            open(output_path, "w") as output_file:
+        convert_stream(input_file, output_file, **options)
+
+    # ===END===
+
+def iter_batch_jobs(
+        inputs: typing.Iterable[str],
+        output_dir: str,
+        input_format: str = "penn",
+        output_format: str = "penn"
+        ) -> typing.Iterator[typing.Tuple[str, str]]:
+    """
+        Find the input files and give the pairs of them and their output files.
+
+        Parameters
+        ----------
+        inputs: Iterable[str]
+            files, directories, or glob patterns.
+            A directory is searched recursively for files 
+            with the suffixes in INPUT_SUFFIXES[input_format],
+            and the directory structure is kept in the output directory.
+            A file given more than once is converted only once.
+        output_dir: str
+            the directory to put the output files in,
+            each named after its input file with the suffix in OUTPUT_SUFFIXES[output_format].
+
+        Yields
+        ------
+        job: Tuple[str, str]
+            the pair of an input path and an output path.
+    """
+    output_suffix = OUTPUT_SUFFIXES[output_format]
+    found: typing.Set[str] = set()
+
+    def output_path_of(relative_path: str) -> str:
+        return os.path.join(
+            output_dir,
+            os.path.splitext(relative_path)[0] + output_suffix
+            )
+
+        # ===END===
+
+    for pattern in inputs:
+        paths = [pattern] if os.path.exists(pattern) else sorted(glob.glob(pattern))
+
+        for path in paths:
+            if os.path.isdir(path):
+                for directory, subdirectories, files in os.walk(path):
+                    subdirectories.sort()
+
+                    for name in sorted(files):
+                        input_path = os.path.join(directory, name)
+
+                        if name.endswith(INPUT_SUFFIXES[input_format]) \
+                                and input_path not in found:
+                            found.add(input_path)
+                            yield (
+                                input_path, 
+                                output_path_of(os.path.relpath(input_path, path))
+                                )
+            elif path not in found:
+                found.add(path)
+                yield path, output_path_of(os.path.basename(path))
+
+    # ===END===
+
+def convert_files(
+        jobs: typing.Iterable[typing.Tuple[str, str]],
+        processes: typing.Optional[int] = None,
+        **options
+        ) -> typing.Iterator[typing.Tuple[str, str, typing.Optional[str]]]:
+    """
+        Convert the input files into the output files in parallel.
+        A failure in a file does not abort the others.
+        The jobs found to destroy data (see check_batch_jobs) are not run
+        but reported as failures.
+        The options are the same as convert_stream.
+
+        Parameters
+        ----------
+        jobs: Iterable[Tuple[str, str]]
+            the pairs of an input path and an output path.
+        processes: int, optional
+            the number of the worker processes (the number of CPUs when not specified).
+            With 1, the files are converted in this process.
+
+        Yields
+        ------
+        result: Tuple[str, str, Optional[str]]
+            the input path, the output path, and the error message (None if succeeded),
+            in the same order as the jobs.
+    """
+    jobs = list(jobs)
+    conflicts = check_batch_jobs(jobs)
+    convert = functools.partial(_convert_file_job, options = options)
+
+    # nothing is submitted for a conflicting job, whose output is never opened
+    valid_jobs = [job for job, conflict in zip(jobs, conflicts) if conflict is None]
+
+    def merge(
+            results: typing.Iterator[typing.Tuple[str, str, typing.Optional[str]]]
+            ) -> typing.Iterator[typing.Tuple[str, str, typing.Optional[str]]]:
+        for (input_path, output_path), conflict in zip(jobs, conflicts):
+            if conflict is None:
+                yield next(results)
+            else:
+                yield input_path, output_path, conflict
+
+        # ===END===
+
+    if processes == 1:
+        yield from merge(map(convert, valid_jobs))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = processes) as executor:
+            yield from merge(executor.map(convert, valid_jobs))
+
+    # ===END===
+
+def check_batch_jobs(
+        jobs: typing.Sequence[typing.Tuple[str, str]]
+        ) -> typing.List[typing.Optional[str]]:
+    """
+        Find the jobs that would destroy data if run:
+        those whose output is one of the input files (including the job's own),
+        and those whose output is the same as that of another job.
+        The paths are compared after being resolved (see os.path.realpath),
+        and the existing files also by their identities (see os.path.samefile).
+
+        Parameters
+        ----------
+        jobs: Sequence[Tuple[str, str]]
+            the pairs of an input path and an output path.
+
+        Returns
+        -------
+        conflicts: List[Optional[str]]
+            the error message of each job (None if it can be run), in the same order as the jobs.
+    """
+    conflicts: typing.List[typing.Optional[str]] = [None] * len(jobs)
+
+    def identify(path: str) -> typing.Optional[typing.Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        return stat.st_dev, stat.st_ino
+
+        # ===END===
+
+    input_paths = {os.path.realpath(input_path): input_path for input_path, _ in jobs}
+    input_files = {
+        identity: input_path
+        for input_path, _ in jobs
+        for identity in (identify(input_path), ) if identity is not None
+    }
+    output_jobs: typing.Dict[str, typing.List[int]] = {}
+
+    for number, (input_path, output_path) in enumerate(jobs):
+        resolved = os.path.realpath(output_path)
+        overwritten = input_paths.get(resolved)
+        if overwritten is None:
+            identity = identify(resolved)
+            if identity is not None: overwritten = input_files.get(identity)
+
+        if overwritten is not None:
+            conflicts[number] = "The output {output} would overwrite the input {input}".format(
+                output = output_path,
+                input = overwritten
+                )
+
+        output_jobs.setdefault(resolved, []).append(number)
+
+    for numbers in output_jobs.values():
+        if len(numbers) < 2: continue
+
+        for number in numbers:
+            if conflicts[number] is None:
+                conflicts[number] = "The output {output} is shared by {inputs}".format(
+                    output = jobs[number][1],
+                    inputs = ", ".join(jobs[other][0] for other in numbers)
+                    )
+
+    return conflicts
+
+    # ===END===
+
+def _convert_file_job(
+        job: typing.Tuple[str, str],
+        options: typing.Dict[str, object]
+        ) -> typing.Tuple[str, str, typing.Optional[str]]:
+    """
+        Convert a file, catching the errors to report.
+    """
+    input_path, output_path = job
+
+    try:
+        output_dir = os.path.dirname(output_path)
+        if output_dir: os.makedirs(output_dir, exist_ok = True)
+
+        convert_file(input_path, output_path, **options)
+    except Exception as error:
+        # do not leave a half-written output
+        if os.path.exists(output_path): os.remove(output_path)
+
+        return input_path, output_path, "{name}: {message}".format(
+                    name = type(error).__name__,
+                    message = error
+                    )
+
+    return input_path, output_path, None
+
+    # ===END===
+
+def scan_tree_spans(
+        input_file: typing.BinaryIO,
+        input_format: str = "penn"
+        ) -> typing.Iterator[typing.Tuple[int, int, int]]:
+    """
+        Find the spans of lines in the file that can be parsed independently of each other,
+        each of which consists of one or more whole top-level trees
+        (and the comments that belong to them).
+        The file is scanned as bytes without being decoded,
+        since the parentheses, the spaces and the comment marks are all ASCII.
+
+        A span begins at a line where
+            (penn) the parentheses have been balanced, or
+            (kail) a label without an indent and a comment is found,
+        since such a line is parsed in the same way whatever precedes it.
+
+        Parameters
+        ----------
+        input_file: typing.BinaryIO
+            the file opened in the binary mode, read from the current position
+        input_format: str, default "penn"
+            "penn" or "kail"
+
+        Yields
+        ------
+        span: Tuple[int, int, int]
+            the offset (relative to the starting position) and the length in bytes of the span,
+            and the row of its first line (beginning with 0).
+    """
+    begins_span = get_span_detector(input_format)
+
+    offset: int = 0
+    span_offset: int = 0
+    span_row: int = 0
+
+    for row, line in enumerate(input_file):
+        if begins_span(line) and offset > span_offset:
+            yield span_offset, offset - span_offset, span_row
+
+            span_offset = offset
+            span_row = row
+
+        offset += len(line)
+
+    if offset > span_offset:
+        yield span_offset, offset - span_offset, span_row
+
+    # ===END===
+
+def get_span_detector(input_format: str = "penn") -> typing.Callable[[bytes], bool]:
+    """
+        Give a function which, fed with the lines of a file in order (as bytes),
+        tells whether a span that can be parsed independently begins at each of them
+        (see scan_tree_spans).
+    """
+    depth: int = 0
+
+    def begins_span_kai_penn(line: bytes) -> bool:
+        nonlocal depth
+
+        is_balanced = depth == 0
+
+        line_without_comment = line.split(b";;", 1)[0]
+        depth += line_without_comment.count(b"(") - line_without_comment.count(b")")
+
+        return is_balanced
+
+        # ===END===
+
+    def begins_span_kail(line: bytes) -> bool:
+        if line[:1] in b" \t" or b"#" in line: return False
+
+        line_stripped = line.rstrip()
+        if not line_stripped: return False
+
+        # non-ASCII whitespaces at the end are also stripped when parsed
+        return line_stripped.isascii() or bool(line_stripped.decode("utf-8").rstrip())
+
+        # ===END===
+
+    if input_format == "penn":
+        return begins_span_kai_penn
+    elif input_format == "kail":
+        return begins_span_kail
+    else:
+        raise ValueError(input_format)
+
+    # ===END===
+
+def iter_chunks(
+        spans: typing.Iterable[typing.Tuple[int, int, int]],
+        chunk_size: int = CHUNK_SIZE
+        ) -> typing.Iterator[typing.Tuple[int, int, int]]:
+    """
+        Merge consecutive spans given by scan_tree_spans
+        into chunks of at least the given size (except the last one).
+    """
+    chunk: typing.Optional[typing.Tuple[int, int, int]] = None
+
+    for offset, length, first_row in spans:
+        if chunk is None:
+            chunk = (offset, length, first_row)
+        else:
+            chunk = (chunk[0], offset + length - chunk[0], chunk[2])
+
+        if chunk[1] >= chunk_size:
+            yield chunk
+            chunk = None
+
+    if chunk is not None: yield chunk
+
+    # ===END===
+
+def convert_file_parallel(
+        input_path: str,
+        output_file: typing.TextIO,
+        processes: typing.Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE,
+        **options
+        ) -> int:
+    """
+        Convert a (large) file into the output stream,
+        splitting it at the boundaries of top-level trees into chunks
+        which are converted in parallel and then written in order.
+        The result is the same as convert_stream,
+        and the rows in error messages are counted from the beginning of the file.
+        The other options are the same as convert_stream.
+
+        Parameters
+        ----------
+        input_path: str
+        output_file: typing.TextIO
+        processes: int, optional
+            the number of the worker processes (the number of CPUs when not specified).
+        chunk_size: int, default CHUNK_SIZE
+            the least size in bytes of the chunks handed to the workers.
+
+        Returns
+        -------
+        items: int
+            the number of the items (trees and comments) given to the output
+    """
+    with open(input_path, "rb") as input_file:
+        chunks = list(
+            iter_chunks(
+                scan_tree_spans(input_file, options.get("input_format", "penn")),
+                chunk_size = chunk_size
+                )
+            )
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers = processes) as executor:
+        return write_pieces(
+            output_file,
+            executor.map(
+                functools.partial(
+                    _convert_chunk_job, 
+                    input_path = input_path, 
+                    options = options
+                    ), 
+                chunks
+                ),
+            output_format = options.get("output_format", "penn"), 
+            compact = options.get("compact", False)
+            )
+
+    # ===END===
+
+def convert_file_incremental(
+        input_path: str,
+        output_file: typing.TextIO,
+        cache_dir: typing.Optional[str] = None,
+        **options
+        ) -> int:
+    """
+        Convert a file into the output stream,
+        re-using the outputs of the unchanged parts of the file from the previous run.
+        The file is split into spans at the boundaries of top-level trees 
+        (see scan_tree_spans), each of which is fingerprinted;
+        only the spans whose text has changed since the last run
+        with the same options are parsed and printed again,
+        and the outputs of the others are spliced in as they are.
+        The outputs are kept in the cache directory (see kail.cache).
+        The result is the same as convert_stream.
+        The other options are the same as convert_stream.
+
+        Parameters
+        ----------
+        input_path: str
+        output_file: typing.TextIO
+        cache_dir: str, optional
+            the cache directory (kail.cache.get_cache_dir() when not specified)
+
+        Returns
+        -------
+        items: int
+            the number of the items (trees and comments) given to the output
+    """
+    with open(input_path, "rb") as input_file:
+        data = input_file.read()
+
+    outputs_path = cache.get_outputs_path(input_path, options, cache_dir = cache_dir)
+    previous_outputs = cache.load_outputs(outputs_path)
+    outputs: typing.Dict[str, typing.Tuple[str, int]] = {}
+    pieces: typing.List[typing.Tuple[str, int]] = []
+
+    for offset, length, first_row in scan_tree_spans(
+            io.BytesIO(data), 
+            options.get("input_format", "penn")
+            ):
+        span = data[offset:offset + length]
+        digest = cache.get_span_digest(span)
+
+        piece = outputs.get(digest) or previous_outputs.get(digest)
+        if piece is None:
+            piece = convert_bytes(span, first_row, options)
+
+        outputs[digest] = piece
+        pieces.append(piece)
+
+    cache.store_outputs(outputs_path, outputs)
+
+    return write_pieces(
+        output_file,
+        pieces,
+        output_format = options.get("output_format", "penn"), 
+        compact = options.get("compact", False)
+        )
+
+    # ===END===
+
+def write_pieces(
+        output_file: typing.TextIO,
+        pieces: typing.Iterable[typing.Tuple[str, int]],
+        output_format: str = "penn",
+        compact: bool = False
+        ) -> int:
+    """
+        Stitch the outputs of consecutive parts of a file in order,
+        as if the items in them were written one by one.
+
+        Parameters
+        ----------
+        pieces: Iterable[Tuple[str, int]]
+            the printed text and the number of the items of each part
+
+        Returns
+        -------
+        items: int
+            the number of the items in total
+    """
+    separator, skip_empty = get_output_layout(output_format, compact)
+    sink = Separated_Writer(output_file, separator, skip_empty)
+    items_total = 0
+
+    for text, items in pieces:
+        if items:
+            sink.begin_item()
+            sink.write(text)
+            items_total += items
+
+    return items_total
+
+    # ===END===
+
+def _convert_chunk_job(
+        chunk: typing.Tuple[int, int, int],
+        input_path: str,
+        options: typing.Dict[str, object]
+        ) -> typing.Tuple[str, int]:
+    """
+        Convert a chunk of a file, giving the output text and the number of the items in it.
+    """
+    offset, length, first_row = chunk
+
+    with open(input_path, "rb") as input_file:
+        input_file.seek(offset)
+        data = input_file.read(length)
+
+    return convert_bytes(data, first_row, options)
+
+    # ===END===
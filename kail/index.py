@@ -0,0 +1,243 @@
+import typing
+import io
+import json
+import hashlib
+
+import kail.structures as strs
+import kail.conversion as conv
+import kail.cache as cache
+
+"""
+    This module provides the index of the top-level trees in a file by their IDs,
+    with which given trees can be fetched by seeking instead of parsing the whole file.
+"""
+
+# The label of the node that bears the ID of a tree,
+# as in (ID 1_aozora_Akutagawa-1922;JP)
+ID_LABEL: str = "ID"
+
+# The suffix of the index file put alongside the indexed file
+INDEX_SUFFIX: str = ".index.json"
+
+# The version of the index files
+INDEX_VERSION: int = 3
+
+class Stale_Index_Error(Exception):
+    """
+        An exception raised when the index does not agree with the indexed file.
+    """
+    pass
+
+def get_tree_ID(tree: strs.TreeWithParent) -> typing.Optional[str]:
+    """
+        Find the ID of a top-level tree,
+        which is the leaf of the ID node immediately under the top-level node.
+
+        Returns
+        -------
+        ID: str or None
+            None if the tree has no ID.
+    """
+    for child in tree:
+        label = child.get_label()
+
+        if isinstance(label, strs.Label_Complex_with_Pos) \
+                and label.label.content == ID_LABEL \
+                and len(child) == 1:
+            leaf_label = child[0].get_label()
+
+            if isinstance(leaf_label, strs.Label_Complex_with_Pos) and not len(child[0]):
+                return leaf_label.print_kai_penn()
+
+    return None
+
+    # ===END===
+
+def get_index_path(input_path: str) -> str:
+    """
+        Give the path of the index file of the given file.
+    """
+    return input_path + INDEX_SUFFIX
+
+    # ===END===
+
+def build_index(
+        input_path: str,
+        input_format: str = "penn"
+        ) -> typing.Dict[str, object]:
+    """
+        Build the index of the top-level trees in a file by their IDs.
+
+        Parameters
+        ----------
+        input_path: str
+        input_format: str, default "penn"
+            "penn" or "kail"
+
+        Returns
+        -------
+        index: Dict[str, object]
+            The record of the format, the size and the digest of the file
+            (as given by kail.cache.get_file_digest, in hexadecimal), and the entries, which map each ID to the list of the spans
+            (the offset and the length in bytes, the row of the first line,
+            and the fingerprint of the text given by kail.cache.get_span_digest)
+            which contain a tree with the ID.
+    """
+    entries: typing.Dict[str, typing.List[typing.Tuple[int, int, int, str]]] = {}
+
+    with open(input_path, "rb") as input_file:
+        data = input_file.read()
+
+    for offset, length, first_row in conv.scan_tree_spans(
+            io.BytesIO(data), input_format
+            ):
+        span = data[offset:offset + length]
+        span_digest = None
+
+        for tree in conv.iter_trees_bytes(span, input_format, first_row = first_row):
+            ID = get_tree_ID(tree)
+            if ID is None: continue
+
+            if span_digest is None: span_digest = cache.get_span_digest(span)
+
+            spans = entries.setdefault(ID, [])
+            if not spans or spans[-1][0] != offset:
+                spans.append((offset, length, first_row, span_digest))
+
+    return {
+        "version": INDEX_VERSION,
+        "input_format": input_format,
+        "size": len(data),
+        "digest": hashlib.blake2b(data, digest_size = 32).hexdigest(),
+        "entries": entries,
+    }
+
+    # ===END===
+
+def write_index(
+        input_path: str,
+        input_format: str = "penn"
+        ) -> typing.Dict[str, object]:
+    """
+        Build the index of a file and write it alongside the file.
+    """
+    index = build_index(input_path, input_format)
+
+    with open(get_index_path(input_path), "w", encoding = "utf-8") as index_file:
+        json.dump(index, index_file, ensure_ascii = False)
+
+    return index
+
+    # ===END===
+
+def load_index(input_path: str) -> typing.Dict[str, object]:
+    """
+        Read the index of a file written by write_index.
+
+        Raises
+        ------
+        Stale_Index_Error
+            If the file has been changed since it was indexed
+            (the content is compared by its digest, 
+            since the modification time can miss quick rewrites).
+    """
+    with open(get_index_path(input_path), "r", encoding = "utf-8") as index_file:
+        index = json.load(index_file)
+
+    size, digest = cache.get_file_digest(input_path)
+
+    if index.get("version") != INDEX_VERSION \
+            or (index["size"], index["digest"]) != (size, digest.hex()):
+        raise Stale_Index_Error(
+            "The index of {} is out of date".format(input_path)
+            )
+
+    return index
+
+    # ===END===
+
+def iter_fetched_trees(
+        input_path: str,
+        IDs: typing.Iterable[str],
+        index: typing.Optional[typing.Dict[str, object]] = None
+        ) -> typing.Iterator[strs.TreeWithParent]:
+    """
+        Fetch the trees with the given IDs from a file in the order of the IDs,
+        parsing only the spans that contain them.
+
+        Parameters
+        ----------
+        input_path: str
+        IDs: Iterable[str]
+        index: Dict[str, object], optional
+            the index of the file (load_index(input_path) when not specified)
+
+        Yields
+        ------
+        tree: TreeWithParent
+            Each tree with one of the IDs (all of them, if the ID is shared).
+
+        Raises
+        ------
+        KeyError
+            If an ID is not found in the index.
+        Stale_Index_Error
+            If the file has been changed since it was indexed.
+    """
+    if index is None: index = load_index(input_path)
+
+    input_format = index["input_format"]
+    entries = index["entries"]
+
+    with open(input_path, "rb") as input_file:
+        for ID in IDs:
+            found = False
+
+            for offset, length, first_row, span_digest in entries[ID]:
+                input_file.seek(offset)
+                span = input_file.read(length)
+
+                # the file might have been changed after the index was checked
+                if cache.get_span_digest(span) != span_digest:
+                    raise Stale_Index_Error(
+                        "The index of {} is out of date".format(input_path)
+                        )
+
+                for tree in conv.iter_trees_bytes(span, input_format, first_row = first_row):
+                    if get_tree_ID(tree) == ID:
+                        found = True
+                        yield tree
+
+            if not found:
+                raise Stale_Index_Error(
+                    "The tree {ID} is not found where indexed in {path}".format(
+                        ID = ID,
+                        path = input_path
+                        )
+                    )
+
+    # ===END===
+
+def fetch(
+        input_path: str,
+        IDs: typing.Iterable[str],
+        output_file: typing.TextIO,
+        output_format: str = "penn",
+        comments: bool = True,
+        compact: bool = False,
+        index: typing.Optional[typing.Dict[str, object]] = None
+        ) -> int:
+    """
+        Fetch the trees with the given IDs from a file (see iter_fetched_trees)
+        and write them to the output stream in the given format,
+        giving the number of the items written.
+    """
+    return conv.convert_trees(
+        iter_fetched_trees(input_path, IDs, index = index),
+        output_file,
+        output_format = output_format,
+        comments = comments,
+        compact = compact
+    )
+
+    # ===END===
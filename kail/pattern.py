@@ -0,0 +1,910 @@
+import typing
+import re
+import functools
+
+import kail.structures as strs
+import kail.cache as cache
+import kail.search as search
+
+"""
+    This module provides a structural pattern matcher over trees,
+    in the manner of Tregex.
+
+    A pattern consists of a node description followed by relations to other nodes:
+        NP-SBJ < (PP < /^P-/) !$+ VB
+
+    Node descriptions:
+        NP            a node whose label (without the ICH index and the sort information)
+                      is NP; a terminal node is matched by its word
+        NP|PP         a node labelled either NP or PP
+        /^NP/         a node whose label matches the regular expression (re.search)
+        __            any node
+        !NP           a node not described by NP
+        NP=subj       a node described by NP, named "subj"
+        =subj         the node named "subj"
+
+    Relations (A rel B):
+        A < B         A is the parent of B
+        A > B         A is a child of B
+        A << B        A dominates B
+        A >> B        A is dominated by B
+        A <, B        B is the first child of A
+        A <- B        B is the last child of A
+        A <: B        B is the only child of A
+        A >, B        A is the first child of B
+        A >- B        A is the last child of B
+        A >: B        A is the only child of B
+        A <<, B       B is a leftmost descendant of A
+        A <<- B       B is a rightmost descendant of A
+        A >>, B       A is a leftmost descendant of B
+        A >>- B       A is a rightmost descendant of B
+        A $ B         A and B are sisters
+        A $++ B       A is a left sister of B (also A $.. B)
+        A $-- B       A is a right sister of B (also A $,, B)
+        A $+ B        A is the immediate left sister of B (also A $. B)
+        A $- B        A is the immediate right sister of B (also A $, B)
+        A . B         A immediately precedes B (in the terminal yield)
+        A .. B        A precedes B
+        A , B         A immediately follows B
+        A ,, B        A follows B
+        A == B        A and B are the same node
+
+    Relations are conjoined by juxtaposition (or &),
+    disjoined by | (which binds looser), and grouped by [ ].
+    A relation is negated by a preceding ! and made optional by a preceding ?.
+    The target of a relation with relations of its own is put in parentheses.
+    Comments are ignored in matching.
+"""
+
+# ======
+# Pattern syntax
+# ======
+
+class Description:
+    """
+        A node description.
+
+        Attributes
+        ----------
+        kind: str
+            "literal", "regex", "any" or "backreference"
+        values: frozenset of str, or compiled regex, or None
+        negated: bool
+        name: str or None
+            The name given to (or, for a backreference, referred by) the node.
+    """
+    __slots__ = ("kind", "values", "negated", "name")
+
+    def __init__(
+            self,
+            kind: str,
+            values: object = None,
+            negated: bool = False,
+            name: typing.Optional[str] = None
+        ) -> "Description":
+        self.kind = kind
+        self.values = values
+        self.negated = negated
+        self.name = name
+
+        # ===END===
+
+    def __repr__(self) -> str:
+        return "<Description: {negated}{kind} {values!r}{name}>".format(
+            negated = "!" if self.negated else "",
+            kind = self.kind,
+            values = self.values,
+            name = "=" + self.name if self.name else ""
+            )
+
+        # ===END===
+
+    def matches_label(self, label: str) -> bool:
+        """
+            Tell whether the label meets this description (regardless of the name).
+        """
+        if self.kind == "literal":
+            result = label in self.values
+        elif self.kind == "regex":
+            result = self.values.search(label) is not None
+        else:
+            result = True
+
+        return result != self.negated
+
+        # ===END===
+
+class Node_Pattern:
+    """
+        A node description with the relations that the node must meet.
+    """
+    __slots__ = ("description", "relations")
+
+    def __init__(
+            self,
+            description: Description,
+            relations: typing.Optional["Relation_Expression"] = None
+        ) -> "Node_Pattern":
+        self.description = description
+        self.relations = relations
+
+        # ===END===
+
+    def __repr__(self) -> str:
+        return "<Node_Pattern: {!r} {!r}>".format(self.description, self.relations)
+
+        # ===END===
+
+class Relation_Expression:
+    """
+        A conjunction ("and") or a disjunction ("or") of relations,
+        or a single relation ("relation") of an operator to a node pattern,
+        which might be negated or optional.
+    """
+    __slots__ = ("kind", "items", "operator", "target", "negated", "optional")
+
+    def __init__(
+            self,
+            kind: str,
+            items: typing.Sequence["Relation_Expression"] = (),
+            operator: typing.Optional[str] = None,
+            target: typing.Optional[Node_Pattern] = None,
+            negated: bool = False,
+            optional: bool = False
+        ) -> "Relation_Expression":
+        self.kind = kind
+        self.items = tuple(items)
+        self.operator = operator
+        self.target = target
+        self.negated = negated
+        self.optional = optional
+
+        # ===END===
+
+    def __repr__(self) -> str:
+        if self.kind == "relation":
+            return "<{negated}{optional}{operator} {target!r}>".format(
+                negated = "!" if self.negated else "",
+                optional = "?" if self.optional else "",
+                operator = self.operator,
+                target = self.target
+                )
+        else:
+            return "<{kind} {items!r}>".format(kind = self.kind, items = list(self.items))
+
+        # ===END===
+
+# The relation operators, the longer ones first
+RELATION_OPERATORS: typing.Tuple[str, ...] = (
+    "<<,", "<<-", ">>,", ">>-", "$++", "$--", "$..", "$,,",
+    "<<", ">>", "<,", "<-", "<:", ">,", ">-", ">:",
+    "$+", "$-", "$.", "$,", "..", ",,", "==",
+    "<", ">", "$", ".", ",",
+)
+
+# The synonyms of the relation operators
+_operator_synonyms: typing.Dict[str, str] = {
+    "$..": "$++",
+    "$,,": "$--",
+    "$.": "$+",
+    "$,": "$-",
+}
+
+_re_pattern_token: "_sre.SRE_Pattern" = re.compile(
+    r"""
+        (?P<space>\s+)
+        | (?P<regex>/(?:[^/\\]|\\.)*/)
+        | (?P<operator>{operators})
+        | (?P<punctuation>[()\[\]!?&|=])
+        | (?P<literal>[^\s()\[\]!?&|=/<>$.,]+)
+    """.format(
+        operators = "|".join(re.escape(operator) for operator in RELATION_OPERATORS)
+        ),
+    re.VERBOSE
+    )
+
+def tokenize_pattern(text: str) -> typing.List[typing.Tuple[str, str, int]]:
+    """
+        Split a pattern into tokens.
+
+        Returns
+        -------
+        tokens: List[Tuple[str, str, int]]
+            The kind, the text and the column of each token,
+            where the kind is "regex", "operator", "punctuation" or "literal".
+            Alternative labels (NP|PP) written without spaces are put together into a literal.
+    """
+    tokens: typing.List[typing.Tuple[str, str, int]] = []
+    position = 0
+
+    while position < len(text):
+        match = _re_pattern_token.match(text, position)
+
+        if match is None:
+            raise SyntaxError(
+                "Unexpected character {char!r} at Column {column} of the pattern".format(
+                    char = text[position],
+                    column = position + 1
+                    )
+                )
+
+        kind = match.lastgroup
+        token = match.group()
+
+        if kind != "space":
+            if kind == "literal" and len(tokens) >= 2 \
+                    and tokens[-1][:2] == ("punctuation", "|") \
+                    and tokens[-2][0] == "literal" \
+                    and tokens[-2][2] + len(tokens[-2][1]) + 1 == position:
+                # NP|PP
+                tokens.pop()
+                _, previous, column = tokens.pop()
+                tokens.append(("literal", previous + "|" + token, column))
+            else:
+                tokens.append((kind, token, position))
+
+        position = match.end()
+
+    return tokens
+
+    # ===END===
+
+class _Pattern_Parser:
+    """
+        A recursive-descent parser of patterns.
+    """
+
+    def __init__(self, text: str) -> "_Pattern_Parser":
+        self.tokens = tokenize_pattern(text)
+        self.position = 0
+
+        # ===END===
+
+    def peek(self) -> typing.Optional[typing.Tuple[str, str, int]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+        # ===END===
+
+    def is_next(self, *texts: str) -> bool:
+        token = self.peek()
+        return token is not None and token[0] in ("punctuation", "operator") \
+            and token[1] in texts
+
+        # ===END===
+
+    def take(self) -> typing.Tuple[str, str, int]:
+        token = self.peek()
+        if token is None:
+            raise SyntaxError("Unexpected end of the pattern")
+
+        self.position += 1
+        return token
+
+        # ===END===
+
+    def expect(self, text: str) -> None:
+        kind, token, column = self.take()
+        if token != text:
+            self.fail("{!r} expected".format(text), token, column)
+
+        # ===END===
+
+    def fail(self, message: str, token: str, column: int) -> None:
+        raise SyntaxError(
+            "{message}, but {token!r} found at Column {column} of the pattern".format(
+                message = message,
+                token = token,
+                column = column + 1
+                )
+            )
+
+        # ===END===
+
+    def parse(self) -> Node_Pattern:
+        pattern = self.parse_node()
+
+        token = self.peek()
+        if token is not None:
+            self.fail("The end of the pattern expected", token[1], token[2])
+
+        return pattern
+
+        # ===END===
+
+    def parse_node(self) -> Node_Pattern:
+        """
+            node := "(" node ")" | description relations?
+        """
+        if self.is_next("("):
+            self.take()
+            pattern = self.parse_node()
+            self.expect(")")
+            return pattern
+
+        description = self.parse_description()
+        relations = self.parse_relations() if self.is_relation_next() else None
+
+        return Node_Pattern(description, relations)
+
+        # ===END===
+
+    def parse_operand(self) -> Node_Pattern:
+        """
+            operand := "(" node ")" | description
+        """
+        if self.is_next("("):
+            self.take()
+            pattern = self.parse_node()
+            self.expect(")")
+            return pattern
+
+        return Node_Pattern(self.parse_description())
+
+        # ===END===
+
+    def parse_description(self) -> Description:
+        """
+            description := "!"? (literal | regex | "__") ("=" name)? | "=" name
+        """
+        negated = False
+        if self.is_next("!"):
+            self.take()
+            negated = True
+
+        kind, token, column = self.take()
+
+        if (kind, token) == ("punctuation", "=") and not negated:
+            return Description("backreference", name = self.parse_name())
+        elif kind == "regex":
+            try:
+                description = Description(
+                    "regex", re.compile(token[1:-1].replace("\\/", "/")), negated
+                    )
+            except re.error as error:
+                self.fail("A valid regular expression expected ({})".format(error), token, column)
+        elif kind == "literal":
+            if token == "__":
+                description = Description("any", negated = negated)
+            else:
+                description = Description("literal", frozenset(token.split("|")), negated)
+        else:
+            self.fail("A node description expected", token, column)
+
+        if self.is_next("="):
+            self.take()
+            description.name = self.parse_name()
+
+        return description
+
+        # ===END===
+
+    def parse_name(self) -> str:
+        kind, token, column = self.take()
+        if kind != "literal": self.fail("A name expected", token, column)
+
+        return token
+
+        # ===END===
+
+    def is_relation_next(self) -> bool:
+        token = self.peek()
+        return token is not None and (
+            token[0] == "operator" or token[1] in ("!", "?", "[")
+            )
+
+        # ===END===
+
+    def parse_relations(self) -> Relation_Expression:
+        """
+            relations := conjunction ("|" conjunction)*
+        """
+        items = [self.parse_conjunction()]
+
+        while self.is_next("|"):
+            self.take()
+            items.append(self.parse_conjunction())
+
+        return items[0] if len(items) == 1 else Relation_Expression("or", items)
+
+        # ===END===
+
+    def parse_conjunction(self) -> Relation_Expression:
+        """
+            conjunction := relation ("&"? relation)*
+        """
+        items = [self.parse_relation()]
+
+        while True:
+            if self.is_next("&"):
+                self.take()
+                items.append(self.parse_relation())
+            elif self.is_relation_next():
+                items.append(self.parse_relation())
+            else:
+                break
+
+        return items[0] if len(items) == 1 else Relation_Expression("and", items)
+
+        # ===END===
+
+    def parse_relation(self) -> Relation_Expression:
+        """
+            relation := "!" relation | "?" relation | "[" relations "]" | operator operand
+        """
+        kind, token, column = self.take()
+
+        if (kind, token) == ("punctuation", "!"):
+            relation = self.parse_relation()
+            relation.negated = not relation.negated
+            return relation
+        elif (kind, token) == ("punctuation", "?"):
+            relation = self.parse_relation()
+            relation.optional = True
+            return relation
+        elif (kind, token) == ("punctuation", "["):
+            relations = self.parse_relations()
+            self.expect("]")
+            # wrap it so that it can be negated or made optional as a whole
+            return Relation_Expression("and", [relations])
+        elif kind == "operator":
+            return Relation_Expression(
+                "relation",
+                operator = _operator_synonyms.get(token, token),
+                target = self.parse_operand()
+                )
+        else:
+            self.fail("A relation expected", token, column)
+
+        # ===END===
+
+# ======
+# Matching
+# ======
+
+class _Tree_View:
+    """
+        The nodes of a tree (except comments) numbered in the pre-order,
+        with the arrays needed for evaluating relations.
+    """
+    __slots__ = (
+        "nodes", "labels", "parent", "children", "sibling_index",
+        "subtree_end", "leaf_start", "leaf_end", "by_label"
+    )
+
+    def __init__(self, tree: strs.TreeWithParent) -> "_Tree_View":
+        self.nodes: typing.List[strs.TreeWithParent] = []
+        self.labels: typing.List[str] = []
+        self.parent: typing.List[int] = []
+        self.children: typing.List[typing.List[int]] = []
+        self.sibling_index: typing.List[int] = []
+        self.by_label: typing.Dict[str, typing.List[int]] = {}
+
+        if not isinstance(tree.get_label(), strs.Comment_with_Pos):
+            stack: typing.List[typing.Tuple[strs.TreeWithParent, int]] = [(tree, -1)]
+        else:
+            stack = []
+
+        while stack:
+            current, parent = stack.pop()
+            node = len(self.nodes)
+
+            self.nodes.append(current)
+            self.parent.append(parent)
+            self.children.append([])
+
+            if parent < 0:
+                self.sibling_index.append(0)
+            else:
+                self.sibling_index.append(len(self.children[parent]))
+                self.children[parent].append(node)
+
+            stack.extend(
+                (child, node) for child in reversed(current)
+                if not isinstance(child.get_label(), strs.Comment_with_Pos)
+                )
+
+        size = len(self.nodes)
+        self.subtree_end = [0] * size
+        self.leaf_start = [0] * size
+        self.leaf_end = [0] * size
+
+        leaf_count = 0
+        for node in range(size):
+            if not self.children[node]:
+                self.leaf_start[node] = leaf_count
+                self.leaf_end[node] = leaf_count = leaf_count + 1
+
+        for node in reversed(range(size)):
+            children = self.children[node]
+
+            if children:
+                self.subtree_end[node] = self.subtree_end[children[-1]]
+                self.leaf_start[node] = self.leaf_start[children[0]]
+                self.leaf_end[node] = self.leaf_end[children[-1]]
+            else:
+                self.subtree_end[node] = node + 1
+
+        for node, current in enumerate(self.nodes):
+            label = get_node_label(current, is_terminal = not self.children[node])
+            self.labels.append(label)
+            self.by_label.setdefault(label, []).append(node)
+
+        # ===END===
+
+    def iter_ancestors(self, node: int) -> typing.Iterator[int]:
+        node = self.parent[node]
+        while node >= 0:
+            yield node
+            node = self.parent[node]
+
+        # ===END===
+
+    def iter_related(self, operator: str, node: int) -> typing.Iterable[int]:
+        """
+            Give the nodes B such that (node operator B) holds.
+        """
+        parent = self.parent[node]
+        children = self.children[node]
+
+        if operator == "<":
+            return children
+        elif operator == ">":
+            return (parent, ) if parent >= 0 else ()
+        elif operator == "<<":
+            return range(node + 1, self.subtree_end[node])
+        elif operator == ">>":
+            return self.iter_ancestors(node)
+        elif operator == "<,":
+            return children[:1]
+        elif operator == "<-":
+            return children[-1:]
+        elif operator == "<:":
+            return children if len(children) == 1 else ()
+        elif operator == ">,":
+            return (parent, ) if parent >= 0 and self.sibling_index[node] == 0 else ()
+        elif operator == ">-":
+            return (parent, ) if parent >= 0 \
+                and self.sibling_index[node] == len(self.children[parent]) - 1 else ()
+        elif operator == ">:":
+            return (parent, ) if parent >= 0 and len(self.children[parent]) == 1 else ()
+        elif operator == "<<,":
+            return self.iter_corner_descendants(node, 0)
+        elif operator == "<<-":
+            return self.iter_corner_descendants(node, -1)
+        elif operator == ">>,":
+            return self.iter_corner_ancestors(node, lambda current, siblings: siblings[0] == current)
+        elif operator == ">>-":
+            return self.iter_corner_ancestors(node, lambda current, siblings: siblings[-1] == current)
+        elif operator in ("$", "$++", "$--", "$+", "$-"):
+            if parent < 0: return ()
+
+            siblings = self.children[parent]
+            index = self.sibling_index[node]
+
+            if operator == "$":
+                return siblings[:index] + siblings[index + 1:]
+            elif operator == "$++":
+                return siblings[index + 1:]
+            elif operator == "$--":
+                return siblings[:index]
+            elif operator == "$+":
+                return siblings[index + 1:index + 2]
+            else:
+                return siblings[max(index - 1, 0):index]
+        elif operator == ".":
+            end = self.leaf_end[node]
+            return (other for other in range(len(self.nodes)) if self.leaf_start[other] == end)
+        elif operator == "..":
+            end = self.leaf_end[node]
+            return (other for other in range(len(self.nodes)) if self.leaf_start[other] >= end)
+        elif operator == ",":
+            start = self.leaf_start[node]
+            return (other for other in range(len(self.nodes)) if self.leaf_end[other] == start)
+        elif operator == ",,":
+            start = self.leaf_start[node]
+            return (other for other in range(len(self.nodes)) if self.leaf_end[other] <= start)
+        elif operator == "==":
+            return (node, )
+        else:
+            raise ValueError(operator)
+
+        # ===END===
+
+    def iter_corner_descendants(self, node: int, side: int) -> typing.Iterator[int]:
+        children = self.children[node]
+        while children:
+            node = children[side]
+            yield node
+            children = self.children[node]
+
+        # ===END===
+
+    def iter_corner_ancestors(
+            self,
+            node: int,
+            is_corner: typing.Callable[[int, typing.List[int]], bool]
+        ) -> typing.Iterator[int]:
+        parent = self.parent[node]
+        while parent >= 0 and is_corner(node, self.children[parent]):
+            yield parent
+            node, parent = parent, self.parent[parent]
+
+        # ===END===
+
+def get_node_label(tree: strs.TreeWithParent, is_terminal: bool = False) -> str:
+    """
+        Give the text of the label of a node to be matched against node descriptions:
+        the label without the ICH index and the sort information for a non-terminal node,
+        and the word for a terminal node.
+    """
+    label = tree.get_label()
+
+    if isinstance(label, strs.Label_Complex_with_Pos):
+        return label.print_kai_penn() if is_terminal else str(label.label.content)
+    elif label is None:
+        return ""
+    else:
+        return str(label)
+
+    # ===END===
+
+class Match(typing.NamedTuple):
+    """
+        A match of a pattern.
+
+        Attributes
+        ----------
+        tree: TreeWithParent
+            The top-level tree in which the match is found.
+        node: TreeWithParent
+            The node matched by the root of the pattern.
+        named: Dict[str, TreeWithParent]
+            The nodes matched by the named node descriptions.
+    """
+    tree: strs.TreeWithParent
+    node: strs.TreeWithParent
+    named: typing.Dict[str, strs.TreeWithParent]
+
+class Pattern:
+    """
+        A compiled pattern.
+
+        Attributes
+        ----------
+        text: str
+            The source of the pattern.
+        root: Node_Pattern
+            The syntax tree of the pattern.
+        required_labels: List[FrozenSet[str]]
+            The alternative labels of the node descriptions which any match needs,
+            by which the trees can be pruned without being matched.
+    """
+
+    def __init__(self, text: str) -> "Pattern":
+        self.text = text
+        self.root = _Pattern_Parser(text).parse()
+        self.required_labels: typing.List[typing.FrozenSet[str]] = []
+
+        self.__collect_required_labels(self.root)
+
+        # ===END===
+
+    def __repr__(self) -> str:
+        return "<Pattern: {}>".format(self.text)
+
+        # ===END===
+
+    def __collect_required_labels(self, pattern: Node_Pattern) -> None:
+        description = pattern.description
+        if description.kind == "literal" and not description.negated:
+            self.required_labels.append(description.values)
+
+        stack = [pattern.relations] if pattern.relations is not None else []
+        while stack:
+            relations = stack.pop()
+
+            if relations.negated or relations.optional:
+                continue
+            elif relations.kind == "and":
+                stack.extend(relations.items)
+            elif relations.kind == "relation":
+                self.__collect_required_labels(relations.target)
+            # a disjunction requires none of its branches in particular
+
+        # ===END===
+
+    # ======
+    # Matching
+    # ======
+
+    def could_match(self, labels: typing.Container[str]) -> bool:
+        """
+            Tell whether a tree with the given labels can contain a match.
+        """
+        return all(
+            any(label in labels for label in alternatives)
+            for alternatives in self.required_labels
+        )
+
+        # ===END===
+
+    def iter_matches(self, tree: strs.TreeWithParent) -> typing.Iterator[Match]:
+        """
+            Find the matches in a top-level tree,
+            one for each node matched by the root of the pattern, in the pre-order.
+        """
+        view = _Tree_View(tree)
+        if not self.could_match(view.by_label): return
+
+        description = self.root.description
+        if description.kind == "literal" and not description.negated:
+            candidates = sorted(
+                node for label in description.values
+                for node in view.by_label.get(label, ())
+                )
+        else:
+            candidates = range(len(view.nodes))
+
+        for node in candidates:
+            bindings = next(_match_node(view, self.root, node, {}), None)
+
+            if bindings is not None:
+                yield Match(
+                    tree,
+                    view.nodes[node],
+                    {name: view.nodes[bound] for name, bound in bindings.items()}
+                    )
+
+        # ===END===
+
+    def matches(self, tree: strs.TreeWithParent) -> bool:
+        """
+            Tell whether a top-level tree contains a match.
+        """
+        return next(self.iter_matches(tree), None) is not None
+
+        # ===END===
+
+    def search(self, trees: typing.Iterable[strs.TreeWithParent]) -> typing.Iterator[Match]:
+        """
+            Find the matches in a stream of top-level trees in order.
+        """
+        for tree in trees:
+            yield from self.iter_matches(tree)
+
+        # ===END===
+
+    def search_file(
+            self,
+            input_path: str,
+            input_format: str = "penn"
+        ) -> typing.Iterator[Match]:
+        """
+            Find the matches in a file in order,
+            building only the trees that have all the labels required by the pattern,
+            which are looked up in the label index of the file (see kail.search).
+        """
+        # the file is hashed only once for both the index and the forest
+        source = cache.get_file_digest(input_path)
+        index = search.load_label_index(input_path, input_format, source = source)
+
+        tree_numbers: typing.Optional[typing.Set[int]] = None
+        for alternatives in self.required_labels:
+            found = {
+                index.get_tree_number(node)
+                for label in alternatives
+                for postings in (index.labels, index.words)
+                for node in postings.get(label, ())
+            }
+            tree_numbers = found if tree_numbers is None else tree_numbers & found
+
+        forest = cache.parse_file(input_path, input_format, source = source)
+        roots = forest.roots if tree_numbers is None \
+            else [index.roots[number] for number in sorted(tree_numbers)]
+
+        for root in roots:
+            yield from self.iter_matches(forest.to_tree(root))
+
+        # ===END===
+
+@functools.lru_cache(maxsize = 256)
+def compile_pattern(text: str) -> Pattern:
+    """
+        Compile a pattern (memoized).
+
+        Raises
+        ------
+        SyntaxError
+            If the pattern is ill-formed.
+    """
+    return Pattern(text)
+
+    # ===END===
+
+def _match_node(
+        view: _Tree_View,
+        pattern: Node_Pattern,
+        node: int,
+        bindings: typing.Dict[str, int]
+    ) -> typing.Iterator[typing.Dict[str, int]]:
+    """
+        Give each assignment of the named nodes with which the node matches the pattern.
+    """
+    description = pattern.description
+
+    if description.kind == "backreference":
+        if bindings.get(description.name) != node: return
+    else:
+        if not description.matches_label(view.labels[node]): return
+
+        if description.name is not None:
+            bound = bindings.get(description.name)
+
+            if bound is None:
+                bindings = dict(bindings)
+                bindings[description.name] = node
+            elif bound != node:
+                return
+
+    if pattern.relations is None:
+        yield bindings
+    else:
+        yield from _match_relations(view, pattern.relations, node, bindings)
+
+    # ===END===
+
+def _match_relations(
+        view: _Tree_View,
+        relations: Relation_Expression,
+        node: int,
+        bindings: typing.Dict[str, int]
+    ) -> typing.Iterator[typing.Dict[str, int]]:
+    """
+        Give each assignment of the named nodes with which the node meets the relations.
+    """
+    if relations.negated:
+        # the names inside are not exported
+        if next(_match_relations_positive(view, relations, node, bindings), None) is None:
+            yield bindings
+    elif relations.optional:
+        found = False
+        for result in _match_relations_positive(view, relations, node, bindings):
+            found = True
+            yield result
+        if not found:
+            yield bindings
+    else:
+        yield from _match_relations_positive(view, relations, node, bindings)
+
+    # ===END===
+
+def _match_relations_positive(
+        view: _Tree_View,
+        relations: Relation_Expression,
+        node: int,
+        bindings: typing.Dict[str, int]
+    ) -> typing.Iterator[typing.Dict[str, int]]:
+    if relations.kind == "relation":
+        for other in view.iter_related(relations.operator, node):
+            yield from _match_node(view, relations.target, other, bindings)
+    elif relations.kind == "or":
+        for item in relations.items:
+            yield from _match_relations(view, item, node, bindings)
+    else:
+        results: typing.Iterable[typing.Dict[str, int]] = (bindings, )
+        for item in relations.items:
+            results = _chain_relation(view, item, node, results)
+        yield from results
+
+    # ===END===
+
+def _chain_relation(
+        view: _Tree_View,
+        relations: Relation_Expression,
+        node: int,
+        results: typing.Iterable[typing.Dict[str, int]]
+    ) -> typing.Iterator[typing.Dict[str, int]]:
+    for bindings in results:
+        yield from _match_relations(view, relations, node, bindings)
+
+    # ===END===
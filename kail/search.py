@@ -0,0 +1,374 @@
+import typing
+import array
+import bisect
+import struct
+import itertools
+
+import kail.structures as strs
+import kail.columnar as col
+import kail.cache as cache
+
+"""
+    This module provides the inverted index of the labels and the words in a file,
+    with which the nodes with given labels are found by dictionary lookups
+    and only the trees containing them are built.
+    The index is kept in the cache directory next to the cached forest of the file
+    (see kail.cache), to which the node IDs in it point,
+    and is checked against the content of the file in the same way.
+"""
+
+# The header of the binary format of a label index (see Label_Index.dump)
+LABEL_INDEX_MAGIC: bytes = b"KAILLBLS"
+LABEL_INDEX_VERSION: int = 3
+_label_index_header: struct.Struct = struct.Struct("<8sIQ")
+
+# The header of each posting table: the number of the keys and the size of their strings
+_posting_table_header: struct.Struct = struct.Struct("<QQ")
+
+# The posting tables in the order of the binary format, with the types of their keys
+_posting_tables: typing.Tuple[typing.Tuple[str, type], ...] = (
+    ("labels", str), ("ICHeds", int), ("sort_infos", str), ("words", str),
+)
+
+class Label_Index:
+    """
+        An inverted index from the constituents of the labels of the non-terminal nodes
+        (the label, the ICH index and the sort information)
+        and from the words (the terminal nodes, 
+        including the ones with only comments under them) to the IDs of the nodes
+        in a columnar forest (see ColumnarForest), which are in the pre-order of each tree.
+        Comments are not indexed.
+
+        Attributes
+        ----------
+        roots: array[int]
+            The IDs of the top-level nodes in the forest.
+        labels, ICHeds, sort_infos, words: Dict[object, array[int]]
+            The posting lists (the IDs of the nodes in the ascending order) of each key.
+    """
+
+    def __init__(self, roots: typing.Iterable[int] = ()) -> "Label_Index":
+        self.roots = array.array("l", roots)
+        self.labels: typing.Dict[str, array.array] = {}
+        self.ICHeds: typing.Dict[int, array.array] = {}
+        self.sort_infos: typing.Dict[str, array.array] = {}
+        self.words: typing.Dict[str, array.array] = {}
+
+        # ===END===
+
+    def __repr__(self) -> str:
+        return "<Label_Index: {trees} trees, {labels} labels, {words} words>".format(
+                    trees = len(self.roots),
+                    labels = len(self.labels),
+                    words = len(self.words)
+                )
+
+        # ===END===
+
+    @staticmethod
+    def from_forest(forest: col.ColumnarForest) -> "Label_Index":
+        """
+            Build the index of the nodes in a columnar forest.
+        """
+        index = Label_Index(forest.roots)
+
+        def post(postings: typing.Dict[object, array.array], key: object, node: int) -> None:
+            node_list = postings.get(key)
+            if node_list is None:
+                node_list = postings[key] = array.array("l")
+            node_list.append(node)
+
+            # ===END===
+
+        for node in range(len(forest)):
+            kind, label, ICHed, sort_info = forest.labels[forest.label_id[node]]
+
+            if kind != col.KIND_LABEL_COMPLEX: continue
+
+            # a node with comments only is printed as a terminal one
+            if all(map(forest.is_comment, forest.iter_children(node))):
+                post(index.words, forest.render_kai_penn_label(node), node)
+            else:
+                post(index.labels, label, node)
+                if ICHed > 0: post(index.ICHeds, ICHed, node)
+                if sort_info: post(index.sort_infos, sort_info, node)
+
+        return index
+
+        # ===END===
+
+    # ======
+    # Lookup
+    # ======
+
+    def find(
+            self,
+            label: typing.Optional[str] = None,
+            ICHed: typing.Optional[int] = None,
+            sort_info: typing.Optional[str] = None,
+            word: typing.Optional[str] = None,
+            has_ICHed: bool = False
+        ) -> typing.List[int]:
+        """
+            Find the nodes that meet all the given conditions.
+
+            Parameters
+            ----------
+            label, ICHed, sort_info: optional
+                the constituents of the label of a non-terminal node
+            word: str, optional
+                the label of a terminal node
+            has_ICHed: bool, default False
+                whether to find only the nodes with an (arbitrary) ICH index
+
+            Returns
+            -------
+            nodes: List[int]
+                The IDs of the nodes in the ascending order.
+        """
+        postings: typing.List[typing.Iterable[int]] = []
+
+        if label is not None: postings.append(self.labels.get(label, ()))
+        if ICHed is not None: postings.append(self.ICHeds.get(ICHed, ()))
+        if sort_info is not None: postings.append(self.sort_infos.get(sort_info, ()))
+        if word is not None: postings.append(self.words.get(word, ()))
+        if has_ICHed:
+            postings.append(
+                sorted(node for node_list in self.ICHeds.values() for node in node_list)
+                )
+
+        if not postings:
+            raise ValueError("No condition is given")
+
+        # intersect from the shortest list
+        postings.sort(key = len)
+        nodes = set(postings[0])
+        for node_list in postings[1:]:
+            nodes.intersection_update(node_list)
+
+        return sorted(nodes)
+
+        # ===END===
+
+    def get_tree_number(self, node: int) -> int:
+        """
+            Give the position of the top-level tree containing the given node.
+        """
+        return bisect.bisect_right(self.roots, node) - 1
+
+        # ===END===
+
+    # ======
+    # Serialization
+    # ======
+
+    def dump(self, file: typing.BinaryIO) -> None:
+        """
+            Write this index to a binary file in a compact format,
+            which consists of
+                the header (LABEL_INDEX_MAGIC, LABEL_INDEX_VERSION and the number of the roots),
+                the roots, as the differences from the previous ones,
+                and the posting tables (see _posting_tables), each of which consists of
+                    the number of the keys and the size of their strings,
+                    the lengths of the keys and the keys themselves in UTF-8,
+                    the lengths and the first IDs of the posting lists,
+                    and each posting list but its first ID, 
+                        as the differences from the previous ones.
+            The integers are packed (see kail.columnar.write_packed_array),
+            each posting list in its own width.
+        """
+        file.write(
+            _label_index_header.pack(LABEL_INDEX_MAGIC, LABEL_INDEX_VERSION, len(self.roots))
+            )
+        col.write_packed_array(file, col.iter_differences(self.roots))
+
+        for name, _ in _posting_tables:
+            postings: typing.Dict[object, array.array] = getattr(self, name)
+            keys = [str(key) for key in postings]
+            key_blob = "".join(keys).encode("utf-8")
+
+            file.write(_posting_table_header.pack(len(keys), len(key_blob)))
+            col.write_packed_array(file, map(len, keys))
+            file.write(key_blob)
+            col.write_packed_array(file, map(len, postings.values()))
+            col.write_packed_array(file, (nodes[0] for nodes in postings.values()))
+
+            for nodes in postings.values():
+                col.write_packed_array(
+                    file, itertools.islice(col.iter_differences(nodes), 1, None)
+                    )
+
+        # ===END===
+
+    @staticmethod
+    def load(file: typing.BinaryIO) -> "Label_Index":
+        """
+            Read an index written by Label_Index.dump.
+
+            Raises
+            ------
+            ValueError
+                If the file is not in the binary format of this version, 
+                or is truncated or broken.
+        """
+        magic, version, roots_size = _label_index_header.unpack(
+            col.read_exactly(file, _label_index_header.size)
+            )
+
+        if magic != LABEL_INDEX_MAGIC or version != LABEL_INDEX_VERSION:
+            raise ValueError(
+                "Not a label index in the binary format version {}".format(LABEL_INDEX_VERSION)
+                )
+
+        index = Label_Index(
+            itertools.accumulate(col.read_packed_array(file, roots_size))
+            )
+
+        for name, key_type in _posting_tables:
+            keys_size, key_blob_size = _posting_table_header.unpack(
+                col.read_exactly(file, _posting_table_header.size)
+                )
+            key_lengths = col.read_packed_array(file, keys_size)
+            key_blob = col.read_exactly(file, key_blob_size).decode("utf-8")
+            lengths = col.read_packed_array(file, keys_size)
+            firsts = col.read_packed_array(file, keys_size)
+
+            postings: typing.Dict[object, array.array] = {}
+            position = 0
+
+            for key_length, length, first in zip(key_lengths, lengths, firsts):
+                key = key_type(key_blob[position:position + key_length])
+                position += key_length
+
+                postings[key] = array.array(
+                    "l",
+                    itertools.accumulate(
+                        itertools.chain((first, ), col.read_packed_array(file, length - 1))
+                        )
+                    )
+
+            setattr(index, name, postings)
+
+        return index
+
+        # ===END===
+
+def get_label_index_path(
+        input_path: str,
+        input_format: str = "penn",
+        cache_dir: typing.Optional[str] = None
+        ) -> str:
+    """
+        Give the path of the label index of the given file in the cache directory.
+    """
+    return cache.get_cache_path(
+        input_path, input_format, cache_dir, suffix = cache.LABELS_SUFFIX
+        )
+
+    # ===END===
+
+def write_label_index(
+        input_path: str,
+        input_format: str = "penn",
+        forest: typing.Optional[col.ColumnarForest] = None,
+        cache_dir: typing.Optional[str] = None,
+        source: typing.Optional[typing.Tuple[int, bytes]] = None
+        ) -> Label_Index:
+    """
+        Build the label index of a file from its forest (parsed through the cache if not given)
+        and store it in the cache directory (see kail.cache.store_entry).
+
+        Parameters
+        ----------
+        source: Tuple[int, bytes], optional
+            the size and the digest of the file, if already known (see kail.cache.get_file_digest)
+    """
+    if source is None: source = cache.get_file_digest(input_path)
+    if forest is None: 
+        forest = cache.parse_file(input_path, input_format, cache_dir, source = source)
+
+    index = Label_Index.from_forest(forest)
+
+    cache.store_entry(
+        input_path,
+        get_label_index_path(input_path, input_format, cache_dir),
+        index.dump,
+        source = source
+        )
+
+    return index
+
+    # ===END===
+
+def load_label_index(
+        input_path: str,
+        input_format: str = "penn",
+        cache_dir: typing.Optional[str] = None,
+        source: typing.Optional[typing.Tuple[int, bytes]] = None
+        ) -> Label_Index:
+    """
+        Read the label index of a file,
+        building (and storing) it again if it is missing, broken,
+        or made from another content of the file.
+    """
+    if source is None: source = cache.get_file_digest(input_path)
+
+    index = cache.load_entry(
+        get_label_index_path(input_path, input_format, cache_dir), 
+        source, 
+        Label_Index.load
+        )
+    if index is not None: return index
+
+    return write_label_index(input_path, input_format, cache_dir = cache_dir, source = source)
+
+    # ===END===
+
+def search(
+        input_path: str,
+        input_format: str = "penn",
+        cache_dir: typing.Optional[str] = None,
+        **conditions
+        ) -> typing.Iterator[typing.Tuple[strs.TreeWithParent, typing.List[strs.TreeWithParent]]]:
+    """
+        Find the nodes that meet the given conditions (see Label_Index.find) in a file,
+        building only the top-level trees that contain them.
+        The file is read once to be hashed,
+        and the index and the forest are then taken from the cache (see kail.cache)
+        unless the file has changed.
+
+        Yields
+        ------
+        tree: TreeWithParent
+            A top-level tree that contains the found nodes.
+        nodes: List[TreeWithParent]
+            The found nodes in the tree, in the pre-order.
+    """
+    source = cache.get_file_digest(input_path)
+
+    index = load_label_index(input_path, input_format, cache_dir, source = source)
+    nodes = index.find(**conditions)
+    if not nodes: return
+
+    forest = cache.parse_file(input_path, input_format, cache_dir, source = source)
+
+    position = 0
+    while position < len(nodes):
+        tree_number = index.get_tree_number(nodes[position])
+        root = index.roots[tree_number]
+
+        # the nodes of a tree are numbered consecutively in the pre-order
+        tree_end = index.roots[tree_number + 1] \
+            if tree_number + 1 < len(index.roots) else len(forest)
+        found_offsets = set()
+        while position < len(nodes) and nodes[position] < tree_end:
+            found_offsets.add(nodes[position] - root)
+            position += 1
+
+        tree = forest.to_tree(root)
+        yield tree, [
+            node for offset, node in enumerate(tree.traverse_dfs_pre())
+            if offset in found_offsets
+        ]
+
+    # ===END===
@@ -3,16 +3,129 @@ import io
 import re
 import collections as coll
 import itertools
+import functools
 import copy
 
 """
     This module provides classes that represent various linguistic structures.
 """
 
+# A token in the NPCMJ format: a parenthesis, or a run of the other non-space characters
+_re_kai_penn_token: "_sre.SRE_Pattern" = re.compile(r"[()]|[^ \t\n()]+")
+
+# Whitespaces to be squeezed in the one-line NPCMJ format
+_re_whitespace: "_sre.SRE_Pattern" = re.compile(r"\s")
+_re_whitespaces: "_sre.SRE_Pattern" = re.compile(r"\s+")
+
+# An NPCMJ label complex: {label}-{ICHed};{sort_info}
+_re_kai_penn_label_complex: "_sre.SRE_Pattern" = re.compile(
+    r"^([_\d\w\-・＋+=?]*?)(?:-([0-9]+))?(?:;({[^\s{}]+}|\*.*\*|\*))?$"
+    )
+
+# A constituent of a Kail label complex: {label} {ICHed} {sort_info}
+_re_kail_label_constituent: "_sre.SRE_Pattern" = re.compile(r"[^ \t]+")
+
+# The placements of the comments in printing:
+#   inline      the comments are printed where they are
+#   raise_out   the tree is printed without its comments, 
+#               which follow it one by one in the pre-order (cf. TreeWithParent.raise_comments_out)
+#   hide        the comments are not printed
+COMMENT_INLINE: str = "inline"
+COMMENT_RAISE_OUT: str = "raise_out"
+COMMENT_HIDE: str = "hide"
+COMMENT_PLACEMENTS: typing.Tuple[str, ...] = (COMMENT_INLINE, COMMENT_RAISE_OUT, COMMENT_HIDE)
+
+# The maximum number of distinct label texts whose parses are kept
+LABEL_CACHE_SIZE: int = 1 << 16
+
+@functools.lru_cache(maxsize = LABEL_CACHE_SIZE)
+def _split_kai_penn_label_complex(
+        text: str
+        ) -> typing.Tuple[typing.Tuple[object, int], ...]:
+    """
+        Split an NPCMJ label complex into the triple of 
+        the label, the ICH index and the sort information,
+        each paired with its column in the text (-1 if absent).
+        The results are memoized and shared among the same label texts.
+    """
+    current_items: "_sre.SRE_Match" = _re_kai_penn_label_complex.match(text)
+
+    return (
+        (current_items.group(1) or "", current_items.span(1)[0]),
+        (int(current_items.group(2) or 0), current_items.span(2)[0]),
+        (current_items.group(3) or "", current_items.span(3)[0]),
+        )
+
+    # ===END===
+
+@functools.lru_cache(maxsize = LABEL_CACHE_SIZE)
+def _split_kail_label_complex(
+        text: str
+        ) -> typing.Tuple[typing.Union[typing.Tuple[object, int], int], ...]:
+    """
+        Split a Kail label complex into the triple of 
+        the label, the ICH index and the sort information,
+        each paired with its column in the text (-1 if absent),
+        followed by the column of the first redundant constituent (-1 if none).
+        The results are memoized and shared among the same label texts.
+    """
+    current_items: typing.Iterator["_sre.SRE_Match"] = _re_kail_label_constituent.finditer(text)
+
+    # The label
+    current_label = next(current_items, None)
+    # ICHed number
+    current_ICHed = next(current_items, None)
+    # Sort info
+    current_sort_info = next(current_items, None)
+    # If there are remaining items, then they are redundant
+    redundant = next(current_items, None)
+
+    return (
+        (current_label.group(), current_label.start()) \
+            if current_label else ("", -1),
+        (int(current_ICHed.group()), current_ICHed.start()) \
+            if current_ICHed else (0, -1),
+        (current_sort_info.group(), current_sort_info.start()) \
+            if current_sort_info else ("", -1),
+        redundant.start() if redundant else -1
+        )
+
+    # ===END===
+
+@functools.lru_cache(maxsize = LABEL_CACHE_SIZE)
+def _render_kai_penn_label_complex(label: object, ICHed: int, sort_info: object) -> str:
+    """
+        Give the NPCMJ representation of the constituents of a label complex.
+        The results are memoized and shared among the same label complexes,
+        so that each distinct label is formatted only once in printing.
+    """
+    return "{label}{ICHed}{sort_info}".format(
+        label = str(label),
+        ICHed = ("-" + str(ICHed)) if ICHed > 0 else "",
+        sort_info = (";" + str(sort_info)) if sort_info else ""
+        )
+
+    # ===END===
+
+@functools.lru_cache(maxsize = LABEL_CACHE_SIZE)
+def _render_kail_label_complex(label: object, ICHed: int, sort_info: object) -> str:
+    """
+        Give the Kail representation of the constituents of a label complex
+        (memoized as _render_kai_penn_label_complex).
+    """
+    return "{label}{ICHed}{sort_info}".format(
+        label = str(label),
+        ICHed = " " + str(ICHed) if ICHed > 0 or sort_info else "",
+        sort_info = " " + str(sort_info) if sort_info else ""
+        )
+
+    # ===END===
+
 class Object_with_Row_Column:
     """
         An arbitrary object with the row-column position in the due source document. 
     """
+    __slots__ = ("content", "row", "column")
 
     def __init__(
             self,
@@ -78,6 +191,8 @@ class Label_Complex_with_Pos:
     """
         A representation of an NPCMJ tree label complex (a triple of label name, ICH index, and sort information) with annotations of row-column information from the source document.
     """
+    __slots__ = ("label", "ICHed", "sort_info")
+
     def __init__(
             self,
             label: Object_with_Row_Column,
@@ -160,38 +275,23 @@ class Label_Complex_with_Pos:
         instance: self
             The instance created from the label text.
         """
-        re_str: "_sre.SRE_Match" = re.compile(
-            r"^([_\d\w\-・＋+=?]*?)(?:-([0-9]+))?(?:;({[^\s{}]+}|\*.*\*|\*))?$"
-            )
-
-        current_items: "_sre.SRE_Match" = re_str.match(text)
-
-        # Label
-        current_label = Object_with_Row_Column(
-                    content = current_items.group(1) or "",
-                    row = current_row,
-                    column = current_items.span(1)[0]
-                )
-
-        # ICHed
-        current_ICHed = Object_with_Row_Column(
-                    content = int(current_items.group(2) or 0),
-                    row = current_row,
-                    column = current_items.span(2)[0]
-                )
-
-        # sort info
-        current_sort_info = Object_with_Row_Column(
-                    content = current_items.group(3) or "",
-                    row = current_row,
-                    column = current_items.span(3)[0]
-                )
+        (
+            (label, label_column),
+            (ICHed, ICHed_column),
+            (sort_info, sort_info_column)
+        ) = _split_kai_penn_label_complex(text)
 
         # Constitute a label compex
         return Label_Complex_with_Pos(
-                                label = current_label, 
-                                ICHed = current_ICHed,
-                                sort_info = current_sort_info
+                                label = Object_with_Row_Column(
+                                    label, current_row, label_column
+                                    ), 
+                                ICHed = Object_with_Row_Column(
+                                    ICHed, current_row, ICHed_column
+                                    ),
+                                sort_info = Object_with_Row_Column(
+                                    sort_info, current_row, sort_info_column
+                                    )
                                 )
         # ===END===
     
@@ -212,74 +312,45 @@ class Label_Complex_with_Pos:
         instance: self
             The instance created from the label text.
         """
-        re_word: "_sre.SRE_Match" = re.compile(r"[^ \t]+")
-
-        current_items: typing.Iterable["_sre.SRE_Match"] = re_word.finditer(text)
-
-        # The label
-        current_label: Object_with_Row_Column = None
-        try:
-            current_label_raw = next(current_items)
-            current_label = Object_with_Row_Column(
-                                content = current_label_raw.group(),
-                                row = current_row,
-                                column = current_label_raw.span()[0]
-                            )
-        except StopIteration:
-            current_label = Object_with_Row_Column(
-                                content = "",
-                                row = current_row,
-                                column = -1
-                            )
-        
-        # ICHed number
-        current_ICHed: int = 0
-
-        try:
-            current_ICHed_raw = next(current_items)
-            current_ICHed = Object_with_Row_Column(
-                                content = int(current_ICHed_raw.group()),
-                                row = current_row,
-                                column = current_ICHed_raw.span()[0]
-                            )
-        except StopIteration:
-            current_ICHed = Object_with_Row_Column(
-                                content = 0,
-                                row = current_row,
-                                column = -1
-                            )
-
-        # Sort info
-        current_sort_info: Object_with_Row_Column = None
-        try:
-            current_sort_info_raw = next(current_items)
-            current_sort_info = Object_with_Row_Column(
-                                content = current_sort_info_raw.group(),
-                                row = current_row,
-                                column = current_sort_info_raw.span()[0]
-                            )
-        except StopIteration:
-            current_sort_info = Object_with_Row_Column(
-                                content = "",
-                                row = current_row,
-                                column = -1
-                            )
+        # The indent is cut off so that the same label at different depths
+        # shares the same cache entry
+        text_unindented = text.lstrip(" \t")
+        offset = len(text) - len(text_unindented)
+
+        (
+            (label, label_column),
+            (ICHed, ICHed_column),
+            (sort_info, sort_info_column),
+            redundant_column
+        ) = _split_kail_label_complex(text_unindented)
 
         # If there are remaining items, then they are redundant
-        for redundant in current_items:
+        if redundant_column >= 0:
             raise SyntaxError(
                 "A redundant label constituent is found " \
                 "at Line {row_add}, Column {col_add}".format(
                         row_add = current_row + 1,
-                        col_add = redundant.span()[0] + 1
+                        col_add = offset + redundant_column + 1
                         )
                     )
 
         # Constitute a label compex
         return Label_Complex_with_Pos(
-                                label = current_label, 
-                                ICHed = current_ICHed,
-                                sort_info = current_sort_info
+                                label = Object_with_Row_Column(
+                                    label, 
+                                    current_row, 
+                                    offset + label_column if label_column >= 0 else -1
+                                    ), 
+                                ICHed = Object_with_Row_Column(
+                                    ICHed, 
+                                    current_row, 
+                                    offset + ICHed_column if ICHed_column >= 0 else -1
+                                    ),
+                                sort_info = Object_with_Row_Column(
+                                    sort_info, 
+                                    current_row, 
+                                    offset + sort_info_column if sort_info_column >= 0 else -1
+                                    )
                                 )
         # ===END===
 
@@ -295,11 +366,10 @@ class Label_Complex_with_Pos:
                 Example:
                     NP-SBJ-3;{ABC}
         """
-        return "{label}{ICHed}{sort_info}".format(
-            label = str(self.label),
-            ICHed = ("-" + str(self.ICHed)) if self.ICHed.content > 0 else "",
-            sort_info = (";" + str(self.sort_info)) \
-                                if self.sort_info.content else ""
+        # the constituents are looked up every time
+        # so that the label can be changed in place
+        return _render_kai_penn_label_complex(
+            self.label.content, self.ICHed.content, self.sort_info.content
             )
 
         # ===END===
@@ -319,11 +389,8 @@ class Label_Complex_with_Pos:
                     NP-SBJ 0 ABC ("NP-SBJ;{ABC}")
                     NP-SBJ ("NP-SBJ")
         """
-        return "{label}{ICHed}{sort_info}".format(
-            label = str(self.label),
-            ICHed = " " + str(self.ICHed) if self.ICHed.content > 0 or self.sort_info.content else "",
-            sort_info = " " + str(self.sort_info) \
-                                if self.sort_info.content else ""
+        return _render_kail_label_complex(
+            self.label.content, self.ICHed.content, self.sort_info.content
             )
         # ===END===
 
@@ -331,6 +398,8 @@ class Comment_with_Pos:
     """
         A representation of an NPCMJ/Kail comment with annotations of row-column information from the source document.
     """
+    __slots__ = ("comment", )
+
     def __init__(
             self,
             comment: Object_with_Row_Column
@@ -375,6 +444,10 @@ class Comment_with_Pos:
         # ===END===
 
 class TreeWithParent(coll.deque):
+    # __parent_index caches the position of this tree among its siblings,
+    # which is valid only when __children_indexed of the parent is True
+    __slots__ = ("__label", "__parent", "__parent_index", "__children_indexed")
+
     def __init__(
             self, 
             node: object = None, 
@@ -383,6 +456,9 @@ class TreeWithParent(coll.deque):
         ):
         super().__init__(self)
 
+        self.__parent_index = -1
+        self.__children_indexed = True
+
         self.set_label(node)
         self.extend(children)
         self.set_parent(parent)
@@ -433,6 +509,7 @@ class TreeWithParent(coll.deque):
         self.__check_type_TreeWithParent_parented(x)
 
         x.set_parent(self)
+        x.__parent_index = len(self)
         super().append(x)
 
         # ===END===
@@ -442,6 +519,7 @@ class TreeWithParent(coll.deque):
 
         x.set_parent(self)
         super().appendleft(x)
+        self.__children_indexed = False
 
         # ===END===
 
@@ -462,6 +540,7 @@ class TreeWithParent(coll.deque):
 
         x.set_parent(self)
         super().insert(i, x)
+        self.__children_indexed = False
         # ===END===
 
     # ======
@@ -478,21 +557,78 @@ class TreeWithParent(coll.deque):
     def popleft(self):
         popped: "TreeWithParent" = super().popleft()
         popped.set_parent(None)
+        self.__children_indexed = False
         return popped
         
         # ===END===
     
     def remove(self, value: "TreeWithParent"):
-        super().remove(value)
-        value.set_parent(None)
+        """
+            Remove the given child (compared by identity, not by equality).
+        """
+        if value.get_parent() is not self:
+            raise ValueError(
+                "The item {repr} is not a child of {par}!".format(
+                    repr = repr(value),
+                    par = repr(self)
+                    )
+                )
+
+        del self[value.get_parent_index()]
         return value
 
         # ===END===
 
+    def __delitem__(self, i: int):
+        deleted: "TreeWithParent" = self[i]
+        super().__delitem__(i)
+        deleted.set_parent(None)
+        self.__children_indexed = False
+
+        # ===END===
+
+    def clear(self):
+        for child in self: child.set_parent(None)
+        super().clear()
+
+        # ===END===
+
+    # ======
+    # Reordering
+    # ======
+
+    def reverse(self):
+        super().reverse()
+        self.__children_indexed = False
+
+        # ===END===
+
+    def rotate(self, n: int = 1):
+        super().rotate(n)
+        self.__children_indexed = False
+
+        # ===END===
+
     # ======
     # Tree traversing
     # ======
-    def get_parent_index(self): return self.get_parent().index(self)
+    def get_parent_index(self) -> int:
+        """
+            Give the position of this tree among the children of its parent.
+            The positions of all the siblings are renumbered at once
+            only after the children of the parent have been shifted,
+            so that this is O(1) amortized.
+        """
+        parent = self.get_parent()
+
+        if not parent.__children_indexed:
+            for index, child in enumerate(parent):
+                child.__parent_index = index
+            parent.__children_indexed = True
+
+        return self.__parent_index
+
+        # ===END===
 
     def iter_left_siblings(self):
         parent = self.get_parent()
@@ -500,7 +636,7 @@ class TreeWithParent(coll.deque):
 
         index = self.get_parent_index()
         return itertools.islice(
-            iter(self),
+            iter(parent),
             index
         )
         
@@ -513,7 +649,7 @@ class TreeWithParent(coll.deque):
         index = self.get_parent_index()
 
         return itertools.islice(
-            iter(self),
+            iter(parent),
             index + 1,
             None
         )
@@ -521,8 +657,8 @@ class TreeWithParent(coll.deque):
         # ===END===
 
     def iter_all_siblings(self):
-        left = self.get_left_siblings()
-        right = self.get_right_siblings()
+        left = self.iter_left_siblings()
+        right = self.iter_right_siblings()
 
         if left is None:
             if right is None:
@@ -538,13 +674,31 @@ class TreeWithParent(coll.deque):
         # ===END===
 
     def traverse_dfs_pre(self):
-        yield self
-        for child in iter(self): yield from child.traverse_dfs_pre()
+        stack: typing.List["TreeWithParent"] = [self]
+
+        while stack:
+            current = stack.pop()
+            yield current
+
+            # push the children from the right
+            stack.extend(reversed(current))
         # ===END===
 
     def traverse_dfs_post(self):
-        for child in iter(self): yield from child.traverse_dfs_pre()
-        yield self
+        stack: typing.List[typing.Tuple["TreeWithParent", typing.Iterator]] = [
+            (self, iter(self))
+        ]
+
+        while stack:
+            current, children = stack[-1]
+            child = next(children, None)
+
+            if child is None:
+                # all the children have been visited
+                stack.pop()
+                yield current
+            else:
+                stack.append((child, iter(child)))
         # ===END===
 
     def iter_comments(self):
@@ -557,56 +711,69 @@ class TreeWithParent(coll.deque):
     # ======
     # Comment Manupilation
     # ======
-    def raise_comments_on_right_corner_one_level_above(self) -> None:
+    def raise_comments_out(self) -> None:
         """
-            A helper method to raise comment nodes in this tree.
+            Move the comments in this tree out of it,
+            putting them right after this tree among the children of its parent
+            in the pre-order.
+            Nothing is done to a parentless tree.
+            The tree is walked only once, 
+            and the children of each node that had comments are rebuilt at once,
+            so that this is linear in the size of the tree.
         """
-        def is_right_corner_and_raisable(tree: "TreeWithParent") -> bool:
-            return (not tree.iter_right_siblings()) \
-                and (not tree.get_parent().get_parent())
-
-            # ===END===
-
-        for comment_bottom in filter(
-            is_right_corner_and_raisable,
-            self.iter_comments()
-        ):
-            parent = comment_bottom.get_parent()
-            grandparent = parent.get_parent()
+        self_parent = self.get_parent()
+        if self_parent is None: return
 
-            parent.remove(comment_bottom)
-            grandparent.insert(parent.parent_index() + 1, comment_bottom)
+        comments = [comment for comment in self.iter_comments() if comment is not self]
+        if not comments: return
 
-        # ===END===
+        # the nodes that have comments, each once
+        parents = {id(comment.get_parent()): comment.get_parent() for comment in comments}
 
-    def raise_comments_out(self) -> None:
-        self_parent = self.get_parent()
-        index_right_of_self_parent = self.get_parent_index() + 1
-        
-        if self_parent is not None:
-            comments = list(self.iter_comments())
+        for parent in parents.values():
+            remaining = [
+                child for child in parent
+                if not isinstance(child.get_label(), Comment_with_Pos)
+            ]
+            parent.clear()
+            parent.extend(remaining)
 
-            for comment in comments:
-                comment_grandparent = comment.get_parent().get_parent()
-                if comment_grandparent:
-                    # it got a grandparent
+        index_right_of_self = self.get_parent_index() + 1
+        for offset, comment in enumerate(comments):
+            self_parent.insert(index_right_of_self + offset, comment)
 
-                    # cut off the comment
-                    comment.get_parent().remove(comment)
+        # ===END===
 
-                    # insert it again
-                    self_parent.insert(index_right_of_self_parent, comment)
+    def iter_placed_items(
+            self,
+            comment_placement: str = COMMENT_INLINE
+        ) -> typing.Iterator[typing.Tuple["TreeWithParent", bool]]:
+        """
+            Give the items to be printed for this tree
+            under the given placement of the comments (see COMMENT_PLACEMENTS),
+            without changing the tree.
+
+            Yields
+            ------
+            item: TreeWithParent
+                This tree, or a comment in it.
+            show_comments: bool
+                Whether to show the comments in the item.
+        """
+        is_comment = isinstance(self.get_label(), Comment_with_Pos)
 
-                    # move the right boundary of this tree
-                    index_right_of_self_parent += 1
-                else:
-                    # it got no grandparent
-                    # (i.e. It is immediately hung on the root of the document)
-                    # do nothing since you don't need to do anything
-                    pass
+        if comment_placement == COMMENT_INLINE:
+            yield self, True
+        elif comment_placement == COMMENT_RAISE_OUT:
+            if is_comment:
+                yield self, True
+            else:
+                yield self, False
+                yield from ((comment, True) for comment in self.iter_comments())
+        elif comment_placement == COMMENT_HIDE:
+            if not is_comment: yield self, False
         else:
-            # do nothing
-            pass
+            raise ValueError(comment_placement)
 
         # ===END===
 
@@ -640,6 +807,21 @@ class TreeWithParent(coll.deque):
 
         # ===END===
 
+    @staticmethod
+    def __detach_children(
+            tree: "TreeWithParent",
+            keep: int = 0
+        ) -> typing.Iterator["TreeWithParent"]:
+        """
+            Pop out the children of the given tree from the left
+            until only the given number of children are left,
+            yielding each of them as a parentless tree.
+        """
+        while len(tree) > keep:
+            yield tree.popleft()
+
+        # ===END===
+
     @staticmethod
     def parse_kail(stream: io.TextIOBase) -> typing.List["TreeWithParent"]:
         """
@@ -653,6 +835,36 @@ class TreeWithParent(coll.deque):
             -------
             trees: List[nltk.tree.ParentedTree]
         """
+        return TreeWithParent(
+            None,
+            children = TreeWithParent.iter_kail(stream)
+            )
+
+        # ===END===
+
+    @staticmethod
+    def iter_kail(
+            stream: io.TextIOBase,
+            first_row: int = 0
+        ) -> typing.Iterator["TreeWithParent"]:
+        """
+            Parse a text stream in the Kail format tree by tree.
+            Each top-level tree is yielded as soon as 
+            a new line with no indent begins (or the stream ends),
+            so that only one tree is kept in memory at a time.
+
+            Parameters
+            ----------
+            stream: io.TextIOBase
+            first_row: int, default 0
+                The row number of the first line of the stream (beginning with 0),
+                for a stream cut out from the middle of a document.
+
+            Yields
+            ------
+            tree: TreeWithParent
+                A top-level tree, detached from any parent.
+        """
         indent: typing.List[int] = [-1]
 
         res_tree: "TreeWithParent" = TreeWithParent(None, children = [])
@@ -660,7 +872,7 @@ class TreeWithParent(coll.deque):
 
         re_indent: "_sre.SRE_Match" = re.compile(r"[ \t]*")
 
-        for row, line_raw in enumerate(stream):
+        for row, line_raw in enumerate(stream, first_row):
             # ======
             # Strip out comments
             # ======
@@ -748,7 +960,7 @@ class TreeWithParent(coll.deque):
                         # anchor the current node NEXT TO the ancestor
                         # make a sibling
                         current_node = TreeWithParent(current_label_complex, children = [])
-                        node_pointer.parent().append(current_node)
+                        node_pointer.get_parent().append(current_node)
 
                         # stop searching
                         break
@@ -759,93 +971,139 @@ class TreeWithParent(coll.deque):
             # Set the pointer to the newly created node
             node_pointer = current_node
 
+            # A new top-level tree has begun, 
+            # which means that the preceding ones are completed
+            if current_node.get_parent() is res_tree:
+                yield from TreeWithParent.__detach_children(res_tree, keep = 1)
+
             # ===END FOR===
         
-        return res_tree
+        yield from TreeWithParent.__detach_children(res_tree)
 
         # ===END===
 
     @staticmethod
-    def parse_kai_penn(stream: io.TextIOBase) -> typing.List["TreeWithParent"]:
+    def iter_kail_bytes(
+            buffer: typing.Union[bytes, "mmap.mmap"],
+            first_row: int = 0
+        ) -> typing.Iterator["TreeWithParent"]:
         """
-            Parse a text stream in the NPCMJ format.
+            Parse a UTF-8 encoded document in the Kail format tree by tree,
+            given as a bytes-like object such as a memory-mapped file.
+            The result is the same as iter_kail on the decoded text,
+            except that only "\\n" is taken as a line break.
 
             Parameters
             ----------
-            stream: io.TextIOBase
-
-            Returns
-            -------
-            trees: List[nltk.tree.ParentedTree]
+            buffer: bytes or mmap.mmap
+                A memory map is read from its current position, like a stream.
+            first_row: int, default 0
+                The row number of the first line of the buffer (beginning with 0).
+
+            Yields
+            ------
+            tree: TreeWithParent
+                A top-level tree, detached from any parent.
         """
+        return TreeWithParent.iter_kail(
+            TreeWithParent.__iter_decoded_lines(buffer),
+            first_row = first_row
+        )
 
-        def split_line(line: str) -> typing.List[
-                                        typing.Tuple[
-                                            str,
-                                            int
-                                            ]
-                                        ]:
-            # ======
-            # go through every character
-            # ======
-            tokens = []
-            token_reading = ""
-            token_beginning_num = -1
+        # ===END===
 
-            def append_and_clear_cache():
-                # global token_reading
-                # global token_beginning_num
-                nonlocal tokens
-                nonlocal token_reading
-                nonlocal token_beginning_num
+    @staticmethod
+    def __iter_decoded_lines(
+            buffer: typing.Union[bytes, "mmap.mmap"]
+        ) -> typing.Iterator[str]:
+        """
+            Cut out the lines of a bytes-like object one by one 
+            and decode each of them as UTF-8,
+            so that no decoded copy of the whole document is made.
+        """
+        if not hasattr(buffer, "readline"):
+            # no copy is made of immutable bytes
+            buffer = io.BytesIO(buffer)
 
-                # you got a new token
-                tokens.append((token_reading, token_beginning_num))
+        for line in iter(buffer.readline, b""):
+            yield line.decode("utf-8")
 
-                token_reading = ""
-                token_beginning_num = -1
+        # ===END===
 
-                # ===END===
+    @staticmethod
+    def tokenize_kai_penn(line: str) -> typing.List[typing.Tuple[str, int]]:
+        """
+            Split a line (with its comment stripped off) in the NPCMJ format into tokens.
+            A token is either a parenthesis or a run of characters 
+            other than spaces, tabs, newlines and parentheses.
 
-            to_be_continued = False
+            Parameters
+            ----------
+            line: str
 
-            for column, char in enumerate(line_without_comment):
-                if char in " \t\n()":
-                    if to_be_continued: append_and_clear_cache()
+            Returns
+            -------
+            tokens: List[Tuple[str, int]]
+                The pairs of each token and its column in the line (beginning with 0).
+                Example:
+                    [("(", 0), ("NP", 1), ("(", 4), ("N", 5), ("太郎", 7), (")", 9), (")", 10)]
+                    (for "(NP (N 太郎))")
+        """
+        return [
+            (match.group(), match.start()) 
+            for match in _re_kai_penn_token.finditer(line)
+            ]
 
-                    if char in "()":
-                        token_reading += char
-                        token_beginning_num = column
+        # ===END===
 
-                        # immediate tokenization
-                        append_and_clear_cache()
-                    else:
-                        # space
-                        # do nothing
-                        pass
+    @staticmethod
+    def parse_kai_penn(stream: io.TextIOBase) -> typing.List["TreeWithParent"]:
+        """
+            Parse a text stream in the NPCMJ format.
 
-                    # ===END IF===
-                    
-                    to_be_continued = False
-                else:
-                    # ordinary character
-                    # record the position of the new token
-                    token_reading += char
-                    if not to_be_continued: token_beginning_num = column
+            Parameters
+            ----------
+            stream: io.TextIOBase
+
+            Returns
+            -------
+            trees: List[nltk.tree.ParentedTree]
+        """
+        return TreeWithParent(
+            None,
+            children = TreeWithParent.iter_kai_penn(stream)
+            )
 
-                    to_be_continued = True
+        # ===END===
 
-                # ===END IF===
-            
-            # final appending
-            if token_beginning_num > 0: append_and_clear_cache()
+    @staticmethod
+    def iter_kai_penn(
+            stream: io.TextIOBase,
+            first_row: int = 0
+        ) -> typing.Iterator["TreeWithParent"]:
+        """
+            Parse a text stream in the NPCMJ format tree by tree.
+            Each top-level tree (or top-level comment) is yielded
+            as soon as its parentheses are balanced,
+            so that only one tree is kept in memory at a time.
 
-            return tokens
+            Parameters
+            ----------
+            stream: io.TextIOBase
+            first_row: int, default 0
+                The row number of the first line of the stream (beginning with 0),
+                for a stream cut out from the middle of a document.
+
+            Yields
+            ------
+            tree: TreeWithParent
+                A top-level tree, detached from any parent.
+        """
 
         res_tree: "TreeWithParent" = TreeWithParent(None, children = [])
         node_pointer: "TreeWithParent" = res_tree
 
-        for row, line_raw in enumerate(stream):
+        for row, line_raw in enumerate(stream, first_row):
             # ======
             # Strip out comments
             # ======
@@ -856,10 +1114,14 @@ class TreeWithParent(coll.deque):
                                                     comment_char = ";;"
                                                 )
 
+            # a comment hung on the document root is a top-level item by itself
+            if node_pointer is res_tree:
+                yield from TreeWithParent.__detach_children(res_tree)
+
             # ======
             # split the line into tokens
             # ======
-            tokens = split_line(line_without_comment)
+            tokens = TreeWithParent.tokenize_kai_penn(line_without_comment)
 
             # ======
             # go through each item
@@ -889,6 +1151,10 @@ class TreeWithParent(coll.deque):
                     
                     # move the pointer to the parent
                     node_pointer = node_pointer.get_parent()
+
+                    # a top-level tree is completed
+                    if node_pointer is res_tree:
+                        yield from TreeWithParent.__detach_children(res_tree)
                 else:
                     if node_pointer.get_label() is None:
                         # if the current node has no label
@@ -915,7 +1181,38 @@ class TreeWithParent(coll.deque):
         
         # TODO: check errors here
 
-        return res_tree
+        # flush the unbalanced remainder, if any
+        yield from TreeWithParent.__detach_children(res_tree)
+
+        # ===END===
+
+    @staticmethod
+    def iter_kai_penn_bytes(
+            buffer: typing.Union[bytes, "mmap.mmap"],
+            first_row: int = 0
+        ) -> typing.Iterator["TreeWithParent"]:
+        """
+            Parse a UTF-8 encoded document in the NPCMJ format tree by tree,
+            given as a bytes-like object such as a memory-mapped file.
+            The result is the same as iter_kai_penn on the decoded text,
+            except that only "\\n" is taken as a line break.
+
+            Parameters
+            ----------
+            buffer: bytes or mmap.mmap
+                A memory map is read from its current position, like a stream.
+            first_row: int, default 0
+                The row number of the first line of the buffer (beginning with 0).
+
+            Yields
+            ------
+            tree: TreeWithParent
+                A top-level tree, detached from any parent.
+        """
+        return TreeWithParent.iter_kai_penn(
+            TreeWithParent.__iter_decoded_lines(buffer),
+            first_row = first_row
+        )
 
         # ===END===
 
@@ -925,7 +1222,8 @@ class TreeWithParent(coll.deque):
     def print_kai_penn_indented(
             self, 
             indent: int = 0, 
-            show_comments = True
+            show_comments = True,
+            comment_placement: typing.Optional[str] = None
         ) -> str:
         """
             Generate the well-indented representation of this tree, given the overall indent
@@ -936,90 +1234,355 @@ class TreeWithParent(coll.deque):
                 the overall indent.
             show_comments: bool, default True
                 whether to show comments
+            comment_placement: str, optional
+                the placement of the comments (see COMMENT_PLACEMENTS), 
+                which overrides show_comments;
+                the items (see iter_placed_items) are put on separate lines
 
             Returns
             -------
             indented_tree: str
                 the indented tree representation
         """
+        if comment_placement is not None:
+            return "\n".join(
+                item.print_kai_penn_indented(indent = indent, show_comments = shown)
+                for item, shown in self.iter_placed_items(comment_placement)
+                )
 
-        label_object: str = self.get_label()
-        self_label_raw: str = None
+        return "".join(
+            self.__iter_kai_penn_indented_fragments(
+                indent = indent,
+                show_comments = show_comments
+                )
+            )
 
-        if isinstance(label_object, Label_Complex_with_Pos):
-            self_label_raw = label_object.print_kai_penn()
-        elif isinstance(label_object, Comment_with_Pos):
-            if show_comments:
-                self_label_raw = str(label_object)
+        # ===END===
+
+    def __iter_kai_penn_indented_fragments(
+            self, 
+            indent: int = 0, 
+            show_comments = True
+        ) -> typing.Iterator[str]:
+        """
+            Generate the fragments of the well-indented representation of this tree in order,
+            walking the tree with an explicit stack instead of recursion.
+            A node whose children are all hidden comments is printed as a terminal one.
+
+            The layout:
+            ................. (labellabellabel..........label (..... 
+            ^===[indent]=====^_^====[len(self.label)]=======^_^----------
+            The first subtree follows its parent label on the same line,
+            and the others begin on new lines with the indent 
+            calculated as above.
+        """
+        iter_visible_children = TreeWithParent.__iter_visible_children_kai_penn
+
+        current_label_raw = TreeWithParent.__render_label_kai_penn(self, show_comments)
+        if current_label_raw is None: return
+
+        # the stack of (iterator of the remaining children, their indent)
+        stack: typing.List[typing.Tuple[typing.Iterator, int]] = []
+
+        current: "TreeWithParent" = self
+        current_indent: int = indent
+        is_first: bool = False
+
+        while True:
+            children = iter_visible_children(current, show_comments)
+            first_child = next(children, None)
+
+            if first_child is None:
+                # a terminal node
+                # cut out the spaces at the beginning and the end of the first subtree
+                yield current_label_raw.strip() \
+                    if is_first else " " * current_indent + current_label_raw
+
+                # find the next subtree, closing the completed ones
+                while stack:
+                    remaining, current_indent = stack[-1]
+                    next_child = next(remaining, None)
+
+                    if next_child is None:
+                        stack.pop()
+                        yield ")"
+                    else:
+                        current, current_label_raw = next_child
+                        is_first = False
+                        yield "\n"
+                        break
+                else:
+                    return
             else:
-                return ""
-        else:
-            self_label_raw = str(label_object)
+                # a non-terminal node
+                if not is_first: yield " " * current_indent
+                yield "("
+                yield current_label_raw
+                yield " "
+
+                child_indent = current_indent + 1 + len(current_label_raw) + 1
+                stack.append((children, child_indent))
+
+                current, current_label_raw = first_child
+                current_indent = child_indent
+                is_first = True
 
             # ===END IF===
 
-        if len(self) == 0:
-            # if this is a terminal node
-            return " " * indent + self_label_raw
+        # ===END===
+
+    @staticmethod
+    def __render_label_kai_penn(
+            tree: "TreeWithParent",
+            show_comments = True
+        ) -> typing.Optional[str]:
+        """
+            Give the label of the tree in the NPCMJ style, or None if it is hidden.
+        """
+        label_object = tree.get_label()
+
+        if isinstance(label_object, Label_Complex_with_Pos):
+            return label_object.print_kai_penn()
+        elif isinstance(label_object, Comment_with_Pos):
+            return str(label_object) if show_comments else None
         else:
-            # if this is a non-terminal node
-
-            # get the representation of the subtrees
-            ## note: calculation of the indent for the second and latter subtrees
-            ## ................. (labellabellabel..........label (..... 
-            ## ^===[indent]=====^_^====[len(self.label)]=======^_^----------
-            str_subtrees: typing.List[str] = [
-                res for res in (
-                        st.print_kai_penn_indented(
-                            indent = indent \
-                                    + 1 \
-                                    + len(self_label_raw) \
-                                    + 1,
-                            show_comments = show_comments
-                            )
-                        for st in iter(self)
-                    ) if res
-                ]
-
-            # cut out the spaces at the beginning and the end of the first subtree
-            str_subtrees[0] = str_subtrees[0].strip()
-
-            # generate
-            return "{indent}({label} {subtrees})".format(
-                        indent = " " * indent,
-                        label = self_label_raw,
-                        subtrees = "\n".join(str_subtrees)
-                        )
+            return str(label_object)
 
-            # ===END IF===
+        # ===END===
+
+    @staticmethod
+    def __iter_visible_children_kai_penn(
+            tree: "TreeWithParent",
+            show_comments = True
+        ) -> typing.Iterator[typing.Tuple["TreeWithParent", str]]:
+        """
+            Iterate the pairs of the children which are not hidden and their labels in the NPCMJ style.
+        """
+        for child in tree:
+            child_label_raw = TreeWithParent.__render_label_kai_penn(child, show_comments)
+            if child_label_raw is not None: yield child, child_label_raw
 
         # ===END===
 
     def print_kai_penn_squeezed(
             self, 
-            show_comments = True
+            show_comments = True,
+            comment_placement: typing.Optional[str] = None
             ) -> str:
         """
-            Generate the one-line representation of this tree, given the overall indent.
+            Generate the one-line representation of this tree.
 
             Parameters
             ----------
-            indent: int, default 0
-                the overall indent.
+            show_comments: bool, default True
+                whether to show comments
+            comment_placement: str, optional
+                the placement of the comments (see COMMENT_PLACEMENTS), 
+                which overrides show_comments;
+                the items (see iter_placed_items) are put on separate lines
 
             Returns
             -------
             indented_tree: str
                 the one-line tree representation
         """
-        return re.sub(
-            r"\s+",
-            repl = " ",
-            string = self.print_kai_penn_indented(show_comments = show_comments)
+        if comment_placement is not None:
+            return "\n".join(
+                item.print_kai_penn_squeezed(show_comments = shown)
+                for item, shown in self.iter_placed_items(comment_placement)
+                )
+
+        return "".join(
+            self.__iter_kai_penn_squeezed_fragments(show_comments = show_comments)
+            )
+
+        # ===END===
+
+    def __iter_kai_penn_squeezed_fragments(
+            self, 
+            show_comments = True
+        ) -> typing.Iterator[str]:
+        """
+            Generate the fragments of the one-line representation of this tree in order,
+            walking the tree once.
+            The result is the same as squeezing every run of whitespaces
+            in the well-indented representation into a single space,
+            but no indents are generated in the first place.
+        """
+        render_label = TreeWithParent.__render_label_kai_penn
+        re_whitespace_search = _re_whitespace.search
+
+        current_label_raw = render_label(self, show_comments)
+        if current_label_raw is None: return
+
+        # the stack of iterators of the remaining children
+        stack: typing.List[typing.Iterator] = []
+
+        current: "TreeWithParent" = self
+        is_first: bool = False
+        # whether the text generated so far ends with a space
+        is_after_space: bool = False
+
+        while True:
+            # find the first child which is not hidden
+            children = iter(current)
+            for child in children:
+                child_label_raw = render_label(child, show_comments)
+                if child_label_raw is not None: break
+            else:
+                child_label_raw = None
+
+            if child_label_raw is None:
+                # a terminal node
+                text = current_label_raw.strip() if is_first else current_label_raw
+                if re_whitespace_search(text): 
+                    text = _re_whitespaces.sub(" ", text)
+                    if is_after_space and text[:1] == " ": text = text[1:]
+                if text: is_after_space = text[-1] == " "
+
+                yield text
+
+                # find the next subtree, closing the completed ones
+                while stack:
+                    for current in stack[-1]:
+                        current_label_raw = render_label(current, show_comments)
+                        if current_label_raw is not None: break
+                    else:
+                        stack.pop()
+                        yield ")"
+                        is_after_space = False
+                        continue
+
+                    is_first = False
+                    if not is_after_space: yield " "
+                    is_after_space = True
+                    break
+                else:
+                    return
+            else:
+                # a non-terminal node
+                text = current_label_raw
+                if re_whitespace_search(text):
+                    text = _re_whitespaces.sub(" ", text)
+                    yield "(" + text if text[-1:] == " " else "(" + text + " "
+                else:
+                    yield "(" + text + " "
+                is_after_space = True
+
+                stack.append(children)
+
+                current = child
+                current_label_raw = child_label_raw
+                is_first = True
+
+            # ===END IF===
+
+        # ===END===
+
+    def write_kai_penn_indented(
+            self, 
+            out: typing.TextIO,
+            indent: int = 0, 
+            show_comments = True,
+            comment_placement: typing.Optional[str] = None
+        ) -> None:
+        """
+            Write the well-indented representation of this tree to the given file,
+            fragment by fragment, without building the whole string.
+
+            Parameters
+            ----------
+            out: typing.TextIO
+                the file to write to, which should better be buffered.
+            indent: int, default 0
+                the overall indent.
+            show_comments: bool, default True
+                whether to show comments
+            comment_placement: str, optional
+                the placement of the comments (see COMMENT_PLACEMENTS), 
+                which overrides show_comments;
+                the items (see iter_placed_items) are put on separate lines
+        """
+        if comment_placement is not None:
+            for number, (item, shown) in enumerate(self.iter_placed_items(comment_placement)):
+                if number: out.write("\n")
+                item.write_kai_penn_indented(out, indent = indent, show_comments = shown)
+            return
+
+        out.writelines(
+            self.__iter_kai_penn_indented_fragments(
+                indent = indent,
+                show_comments = show_comments
+                )
+            )
+
+        # ===END===
+
+    def write_kai_penn_squeezed(
+            self, 
+            out: typing.TextIO,
+            show_comments = True,
+            comment_placement: typing.Optional[str] = None
+        ) -> None:
+        """
+            Write the one-line representation of this tree to the given file.
+
+            Parameters
+            ----------
+            out: typing.TextIO
+                the file to write to.
+            show_comments: bool, default True
+                whether to show comments
+            comment_placement: str, optional
+                the placement of the comments (see COMMENT_PLACEMENTS), 
+                which overrides show_comments;
+                the items (see iter_placed_items) are put on separate lines
+        """
+        if comment_placement is not None:
+            for number, (item, shown) in enumerate(self.iter_placed_items(comment_placement)):
+                if number: out.write("\n")
+                item.write_kai_penn_squeezed(out, show_comments = shown)
+            return
+
+        out.writelines(
+            self.__iter_kai_penn_squeezed_fragments(show_comments = show_comments)
             )
 
         # ===END===
 
+    def write_kail(
+            self, 
+            out: typing.TextIO,
+            indent_amount: int = 2, 
+            indent: int = 0
+        ) -> None:
+        """
+            Write the representation of this tree in the Kail style to the given file,
+            line by line, without building the whole string.
+
+            Parameters
+            ----------
+            out: typing.TextIO
+                the file to write to, which should better be buffered.
+            indent_amount: int, default 2
+                the indent of each level.
+            indent: int, default 0
+                the overall indent.
+        """
+        is_first: bool = True
+
+        for current_indent, current_label_raw in self.__iter_kail_lines(
+                indent_amount = indent_amount, 
+                indent = indent
+                ):
+            if not is_first: out.write("\n")
+            out.write(" " * current_indent)
+            out.write(current_label_raw)
+
+            is_first = False
+
+        # ===END===
+
     def print_kail(self, indent_amount: int = 2, indent: int = 0) -> str:
         """
             Generate the representation of this tree
@@ -1035,25 +1598,40 @@ class TreeWithParent(coll.deque):
             indented_tree: str
                 the one-line tree representation
         """
-        label_object: str = self.get_label()
-        self_label_raw: str = None
+        return "\n".join(
+            " " * current_indent + current_label_raw
+            for current_indent, current_label_raw 
+            in self.__iter_kail_lines(indent_amount = indent_amount, indent = indent)
+            )
 
-        if isinstance(label_object, Label_Complex_with_Pos):
-            self_label_raw = label_object.print_kail()
-        elif isinstance(label_object, Comment_with_Pos):
-            self_label_raw = label_object.print_kail()
-        else:
-            self_label_raw = str(label_object)
-
-        return (" " * indent) + "\n".join(
-                        itertools.chain(
-                            (self_label_raw, ),
-                            map(
-                                lambda subtree: subtree.print_kail(
-                                    indent_amount = indent_amount,
-                                    indent = indent + indent_amount
-                                    ),
-                                iter(self)
-                            )
-                        )
-        )
+        # ===END===
+
+    def __iter_kail_lines(
+            self, 
+            indent_amount: int = 2, 
+            indent: int = 0
+        ) -> typing.Iterator[typing.Tuple[int, str]]:
+        """
+            Generate the pairs of the indent and the label of the nodes
+            in the Kail style in the pre-order,
+            walking the tree with an explicit stack instead of recursion.
+        """
+        stack: typing.List[typing.Tuple["TreeWithParent", int]] = [(self, indent)]
+
+        while stack:
+            current, current_indent = stack.pop()
+            label_object = current.get_label()
+
+            if isinstance(label_object, Label_Complex_with_Pos):
+                yield current_indent, label_object.print_kail()
+            elif isinstance(label_object, Comment_with_Pos):
+                yield current_indent, label_object.print_kail()
+            else:
+                yield current_indent, str(label_object)
+
+            # push the children from the right
+            stack.extend(
+                (child, current_indent + indent_amount) for child in reversed(current)
+                )
+
+        # ===END===
@@ -0,0 +1,519 @@
+import typing
+import io
+
+import kail.structures as strs
+import kail.pattern as pat
+
+"""
+    This module provides the batch transformation of trees in the manner of Tsurgeon:
+    rules, each of which pairs a pattern (see kail.pattern)
+    with the edits of the named nodes in its matches,
+    are applied to the trees in a stream one by one.
+
+    A script consists of rules separated by blank lines.
+    The first line of a rule is the pattern, and each of the following lines is an operation.
+    Lines beginning with % are ignored.
+
+        PP-SBJ=pp < (NP=np < NPR)
+        relabel pp PP-TOP
+        excise np
+
+    Operations:
+        relabel NAME LABEL      replace the label of the node
+                                with a label in the Penn format (e.g. NP-SBJ-3;{ABC})
+        delete NAME ...         remove the nodes together with the subtrees under them
+        prune NAME ...          remove the nodes, and the ancestors left without children
+        excise NAME ...         remove the nodes, putting their children in their places
+        move NAME POSITION      move the node (with the subtree) to the position
+        insert TREE POSITION    insert a tree in the Penn format (e.g. (PRO *pro*)) at the position
+
+    Positions:
+        $+ NAME                 as the immediate left sister of the node
+        $- NAME                 as the immediate right sister of the node
+        >i NAME                 as the i-th child of the node (from 0)
+        >-i NAME                as the i-th child of the node from the right (from 1)
+
+    Children are counted without comments, as in matching.
+    An operation on a node that is no longer in the tree
+    (e.g. under a node deleted by an earlier edit) or that is left unnamed
+    (by an optional relation) is skipped.
+"""
+
+class Surgery_Error(Exception):
+    """
+        An exception raised when an edit cannot be made on a tree.
+    """
+    pass
+
+# The operations
+OPERATIONS: typing.Tuple[str, ...] = (
+    "relabel", "delete", "prune", "excise", "move", "insert",
+)
+
+class Position(typing.NamedTuple):
+    """
+        A position in a tree relative to a named node.
+
+        Attributes
+        ----------
+        relation: str
+            "$+" (the left sister), "$-" (the right sister) or ">" (a child)
+        index: int
+            The position among the children:
+            from the left if non-negative, and from the right (-1 for the last) otherwise.
+        anchor: str
+            The name of the node.
+    """
+    relation: str
+    index: int
+    anchor: str
+
+class Operation(typing.NamedTuple):
+    """
+        An edit of the named nodes in a match.
+
+        Attributes
+        ----------
+        kind: str
+            One of OPERATIONS.
+        names: Tuple[str, ...]
+            The names of the nodes to be edited.
+        argument: str or None
+            The new label (relabel) or the tree to be inserted (insert) in the Penn format.
+        position: Position or None
+            The destination (move, insert).
+    """
+    kind: str
+    names: typing.Tuple[str, ...]
+    argument: typing.Optional[str] = None
+    position: typing.Optional[Position] = None
+
+class Rule:
+    """
+        A pattern with the operations applied to each of its matches.
+    """
+    __slots__ = ("pattern", "operations")
+
+    def __init__(
+            self,
+            pattern: pat.Pattern,
+            operations: typing.Sequence[Operation]
+        ) -> "Rule":
+        self.pattern = pattern
+        self.operations = tuple(operations)
+
+        # ===END===
+
+    def __repr__(self) -> str:
+        return "<Rule: {pattern} ({count} operations)>".format(
+            pattern = self.pattern.text,
+            count = len(self.operations)
+            )
+
+        # ===END===
+
+    def apply(self, document: strs.TreeWithParent) -> int:
+        """
+            Apply the rule to the items hung on a document root,
+            finding all the matches before making any edit.
+
+            Returns
+            -------
+            count: int
+                The number of the matches.
+        """
+        matches = [
+            found
+            for item in list(document)
+            for found in self.pattern.iter_matches(item)
+        ]
+
+        for found in matches:
+            for operation in self.operations:
+                _apply_operation(document, operation, found.named)
+
+        return len(matches)
+
+        # ===END===
+
+# ======
+# Script parsing
+# ======
+
+def parse_script(text: str) -> typing.List[Rule]:
+    """
+        Parse a script of rules.
+
+        Raises
+        ------
+        SyntaxError
+            If the script is ill-formed.
+    """
+    rules: typing.List[Rule] = []
+    lines: typing.List[typing.Tuple[int, str]] = []
+
+    for row, line in enumerate(text.splitlines() + [""]):
+        line = line.strip()
+
+        if line.startswith("%"):
+            continue
+        elif line:
+            lines.append((row, line))
+        elif lines:
+            rules.append(_parse_rule(lines))
+            lines = []
+
+    return rules
+
+    # ===END===
+
+def load_script(path: str) -> typing.List[Rule]:
+    """
+        Read and parse a script file.
+    """
+    with open(path, "r", encoding = "utf-8") as script_file:
+        return parse_script(script_file.read())
+
+    # ===END===
+
+def _parse_rule(lines: typing.List[typing.Tuple[int, str]]) -> Rule:
+    (pattern_row, pattern_text), *operation_lines = lines
+
+    try:
+        pattern = pat.compile_pattern(pattern_text)
+    except SyntaxError as error:
+        raise SyntaxError("{error} at Line {row}".format(error = error, row = pattern_row + 1))
+
+    if not operation_lines:
+        raise SyntaxError("No operation is given at Line {}".format(pattern_row + 2))
+
+    names = _collect_names(pattern.root)
+    operations: typing.List[Operation] = []
+
+    for row, line in operation_lines:
+        operation = _parse_operation(line, row)
+
+        used = operation.names \
+            + ((operation.position.anchor, ) if operation.position else ())
+        for name in used:
+            if name not in names:
+                raise SyntaxError(
+                    "The name {name!r} is not given in the pattern at Line {row}".format(
+                        name = name,
+                        row = row + 1
+                        )
+                    )
+
+        operations.append(operation)
+
+    return Rule(pattern, operations)
+
+    # ===END===
+
+def _parse_operation(line: str, row: int) -> Operation:
+    def fail(message: str) -> None:
+        raise SyntaxError("{message} at Line {row}".format(message = message, row = row + 1))
+
+        # ===END===
+
+    kind, _, rest = line.partition(" ")
+    rest = rest.strip()
+
+    if kind not in OPERATIONS:
+        fail("Unknown operation {!r}".format(kind))
+
+    if kind == "relabel":
+        fields = rest.split()
+        if len(fields) != 2: fail("relabel takes a name and a label")
+        if not _is_kai_penn_label(fields[1]):
+            fail("An ill-formed label {!r}".format(fields[1]))
+
+        return Operation(kind, (fields[0], ), argument = fields[1])
+    elif kind in ("delete", "prune", "excise"):
+        fields = tuple(rest.split())
+        if not fields: fail("{} takes one or more names".format(kind))
+
+        return Operation(kind, fields)
+    elif kind == "move":
+        name, _, position_text = rest.partition(" ")
+        if not name: fail("move takes a name and a position")
+
+        return Operation(kind, (name, ), position = _parse_position(position_text, fail))
+    else:
+        # insert: the tree is up to the last closing parenthesis
+        end = rest.rfind(")") + 1
+        tree_text, position_text = rest[:end], rest[end:]
+
+        _check_tree_text(tree_text, fail)
+
+        return Operation(
+            kind, (), argument = tree_text, position = _parse_position(position_text, fail)
+            )
+
+    # ===END===
+
+def _is_kai_penn_label(text: str) -> bool:
+    """
+        Check if a text is a label complex in the Penn format.
+    """
+    return strs._re_kai_penn_label_complex.match(text) is not None
+
+    # ===END===
+
+def _check_tree_text(
+        text: str,
+        fail: typing.Callable[[str], None]
+    ) -> None:
+    """
+        Check if a text is exactly one balanced tree in the Penn format
+        whose non-terminal nodes are all labelled with well-formed labels.
+    """
+    tokens = [token for token, _ in strs.TreeWithParent.tokenize_kai_penn(text)]
+
+    if not tokens or tokens[0] != "(":
+        fail("insert takes a tree and a position")
+    if len(tokens) < 2 or tokens[1] in ("(", ")"):
+        fail("The tree to be inserted has no label")
+
+    depth = 0
+
+    for number, token in enumerate(tokens):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+
+            if depth < 0:
+                fail("An unbalanced parenthesis in the tree")
+            elif depth == 0 and number < len(tokens) - 1:
+                fail(
+                    "An unbalanced parenthesis in the tree" if tokens[number + 1] == ")"
+                    else "insert takes exactly one tree"
+                    )
+        elif tokens[number - 1] == "(" and not _is_kai_penn_label(token):
+            fail("An ill-formed label {!r} in the tree".format(token))
+
+    if depth > 0:
+        fail("An unclosed parenthesis in the tree")
+
+    # ===END===
+
+def _parse_position(
+        text: str,
+        fail: typing.Callable[[str], None]
+    ) -> Position:
+    fields = text.split()
+    if len(fields) != 2: fail("A position (e.g. $+ NAME) expected")
+
+    relation, anchor = fields
+
+    if relation in ("$+", "$-"):
+        return Position(relation, 0, anchor)
+    elif relation.startswith(">"):
+        try:
+            index = int(relation[1:])
+        except ValueError:
+            index = None
+
+        # >0 is the first child, >-1 the last one
+        if index is None or relation[1:].startswith("-0"):
+            fail("A child position (e.g. >0 or >-1) expected")
+
+        return Position(">", index, anchor)
+    else:
+        fail("Unknown position {!r}".format(relation))
+
+    # ===END===
+
+def _collect_names(pattern: pat.Node_Pattern) -> typing.Set[str]:
+    """
+        Give the names given in a pattern.
+    """
+    names: typing.Set[str] = set()
+    stack: typing.List[object] = [pattern]
+
+    while stack:
+        current = stack.pop()
+
+        if isinstance(current, pat.Node_Pattern):
+            description = current.description
+            if description.name is not None and description.kind != "backreference":
+                names.add(description.name)
+            if current.relations is not None: stack.append(current.relations)
+        elif current.kind == "relation":
+            stack.append(current.target)
+        else:
+            stack.extend(current.items)
+
+    return names
+
+    # ===END===
+
+# ======
+# Transformation
+# ======
+
+def transform_tree(
+        tree: strs.TreeWithParent,
+        rules: typing.Iterable[Rule]
+    ) -> typing.List[strs.TreeWithParent]:
+    """
+        Apply the rules in order to a parentless top-level tree.
+
+        Returns
+        -------
+        items: List[TreeWithParent]
+            The parentless items that take the place of the tree:
+            none if the tree is deleted, several if its root is excised.
+
+        Raises
+        ------
+        Surgery_Error
+            If an edit cannot be made.
+    """
+    # a temporary root, under which the top-level tree can be edited like other nodes
+    document = strs.TreeWithParent(None, children = [tree])
+
+    for rule in rules:
+        rule.apply(document)
+
+    items = list(document)
+    document.clear()
+
+    return items
+
+    # ===END===
+
+def transform_trees(
+        trees: typing.Iterable[strs.TreeWithParent],
+        rules: typing.Iterable[Rule]
+    ) -> typing.Iterator[strs.TreeWithParent]:
+    """
+        Apply the rules to a stream of top-level trees tree by tree (see transform_tree).
+    """
+    rules = tuple(rules)
+
+    for tree in trees:
+        yield from transform_tree(tree, rules)
+
+    # ===END===
+
+def _is_attached(node: strs.TreeWithParent, document: strs.TreeWithParent) -> bool:
+    while node is not None:
+        if node is document: return True
+        node = node.get_parent()
+
+    return False
+
+    # ===END===
+
+def _describe(node: strs.TreeWithParent) -> str:
+    return node.print_kai_penn_squeezed(show_comments = False)
+
+    # ===END===
+
+def _get_insertion_index(
+        position: Position,
+        anchor: strs.TreeWithParent
+    ) -> typing.Tuple[strs.TreeWithParent, int]:
+    """
+        Give the node under which a tree is to be inserted
+        and the index among its children (comments included).
+    """
+    if position.relation in ("$+", "$-"):
+        parent = anchor.get_parent()
+        if parent is None:
+            raise Surgery_Error("The node {} has no parent".format(_describe(anchor)))
+
+        index = anchor.get_parent_index()
+        return parent, index if position.relation == "$+" else index + 1
+
+    indices = [
+        index for index, child in enumerate(anchor)
+        if not isinstance(child.get_label(), strs.Comment_with_Pos)
+    ]
+
+    # the position among the children after the insertion
+    index = position.index if position.index >= 0 else len(indices) + 1 + position.index
+
+    if not 0 <= index <= len(indices):
+        raise Surgery_Error(
+            "The node {node} has no position {index} among its {count} children".format(
+                node = _describe(anchor),
+                index = position.index,
+                count = len(indices)
+                )
+            )
+
+    if index < len(indices):
+        return anchor, indices[index]
+    else:
+        return anchor, indices[-1] + 1 if indices else len(anchor)
+
+    # ===END===
+
+def _apply_operation(
+        document: strs.TreeWithParent,
+        operation: Operation,
+        named: typing.Dict[str, strs.TreeWithParent]
+    ) -> None:
+    names = operation.names \
+        + ((operation.position.anchor, ) if operation.position else ())
+
+    # skip the operation on the nodes unnamed or gone
+    if not all(name in named and _is_attached(named[name], document) for name in names):
+        return
+
+    kind = operation.kind
+
+    if kind == "relabel":
+        named[operation.names[0]].set_label(
+            strs.Label_Complex_with_Pos.parse_from_kai_penn(operation.argument)
+            )
+    elif kind in ("delete", "prune", "excise"):
+        for name in operation.names:
+            node = named[name]
+            if not _is_attached(node, document): continue
+
+            parent = node.get_parent()
+
+            if kind == "excise":
+                # rebuild the children of the parent at once
+                # rather than moving those of the node one by one
+                index = node.get_parent_index()
+                siblings = list(parent)
+                children = list(node)
+
+                node.clear()
+                parent.clear()
+                parent.extend(siblings[:index] + children + siblings[index + 1:])
+                continue
+
+            parent.remove(node)
+
+            if kind == "prune":
+                while parent is not document and not any(
+                        not isinstance(child.get_label(), strs.Comment_with_Pos)
+                        for child in parent
+                        ):
+                    node, parent = parent, parent.get_parent()
+                    parent.remove(node)
+    else:
+        anchor = named[operation.position.anchor]
+
+        if kind == "move":
+            node = named[operation.names[0]]
+
+            if _is_attached(anchor, node):
+                raise Surgery_Error(
+                    "The node {} cannot be moved under itself".format(_describe(node))
+                    )
+
+            node.get_parent().remove(node)
+        else:
+            node, = strs.TreeWithParent.iter_kai_penn(io.StringIO(operation.argument))
+
+        parent, index = _get_insertion_index(operation.position, anchor)
+        parent.insert(index, node)
+
+    # ===END===
@@ -0,0 +1,111 @@
+import io
+import json
+import asyncio
+
+import pytest
+
+import kail.conversion as conv
+import kail.aio as aio
+
+SOURCE = "(S (NP (N 太郎)\n;;a\n)\n(VB 走っ))\n;; b\n(S (VB 走っ))\n\n(S (NP x))\n"
+
+def make_reader(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+
+    return reader
+
+class Bytes_Writer:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data: bytes):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+def test_aiter_trees_agrees_with_iter_trees():
+    async def collect():
+        return [
+            tree.print_kai_penn_squeezed()
+            async for tree in aio.aiter_trees(make_reader(SOURCE.encode()), chunk_size = 10)
+        ]
+
+    assert asyncio.run(collect()) == [
+        tree.print_kai_penn_squeezed() for tree in conv.iter_trees(io.StringIO(SOURCE))
+    ]
+
+@pytest.mark.parametrize(
+    "output_format, compact",
+    (("penn", False), ("penn", True), ("kail", False))
+)
+def test_aconvert_stream_agrees_with_convert_stream(output_format, compact):
+    writer = Bytes_Writer()
+
+    async def convert():
+        return await aio.aconvert_stream(
+            make_reader(SOURCE.encode()),
+            writer,
+            output_format = output_format,
+            compact = compact,
+            chunk_size = 10
+            )
+
+    items = asyncio.run(convert())
+
+    expected = io.StringIO()
+    assert items == conv.convert_stream(
+        io.StringIO(SOURCE), expected, output_format = output_format, compact = compact
+        )
+    assert writer.data.decode("utf-8") == expected.getvalue()
+
+def test_server():
+    requests = [
+        {"id": 1, "text": SOURCE, "output_format": "kail"},
+        {"id": 2, "text": SOURCE, "compact": True, "comments": False},
+        {"id": 3, "text": SOURCE, "output_format": "xml"},
+        {"id": 4},
+    ]
+
+    async def talk():
+        server = await aio.start_server(port = 0)
+        port = server.sockets[0].getsockname()[1]
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for request in requests:
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        writer.write(b"[]\n")
+        writer.write_eof()
+
+        responses = [json.loads(line) async for line in aio.aiter_lines(reader)]
+
+        writer.close()
+        server.close()
+        await server.wait_closed()
+
+        return responses
+
+    responses = {response["id"]: response for response in asyncio.run(talk())}
+
+    assert responses[1]["text"] == aio.convert_text(SOURCE, output_format = "kail")
+    assert responses[2]["text"] == "(S (NP (N 太郎)) (VB 走っ))\n(S (VB 走っ))\n(S (NP x))"
+    assert responses[3]["error"].startswith("ValueError")
+    assert responses[4]["error"].startswith("TypeError")
+    assert responses[None]["error"].startswith("Bad request")
+
+def test_serve_stdio():
+    input_file = io.BytesIO(
+        json.dumps({"id": "a", "text": SOURCE, "output_format": "kail"}).encode("utf-8")
+        + b"\n\n"
+        + json.dumps({"id": "b", "text": SOURCE, "input_format": "xml"}).encode("utf-8")
+        + b"\n"
+        )
+    output_file = io.BytesIO()
+
+    aio.serve_stdio(input_file, output_file)
+
+    first, second = map(json.loads, output_file.getvalue().splitlines())
+    assert first == {"id": "a", "text": aio.convert_text(SOURCE, output_format = "kail")}
+    assert second["id"] == "b" and second["error"].startswith("ValueError")
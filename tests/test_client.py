@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+import pytest
+
+import kail.aio as aio
+import kail.client as client
+
+SOURCE = "(S (NP (N 太郎)\n;;a\n)\n(VB 走っ))"
+
+@pytest.fixture
+def unix_path(tmp_path):
+    path = str(tmp_path / "kail.sock")
+    started = threading.Event()
+    loop = asyncio.new_event_loop()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(aio.start_server(unix_path = path))
+        started.set()
+
+        loop.run_forever()
+
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+
+    thread = threading.Thread(target = run, daemon = True)
+    thread.start()
+    started.wait(5)
+
+    yield path
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+def test_client_convert(unix_path):
+    with client.Client(unix_path, timeout = 5) as connection:
+        for options in ({"output_format": "kail"}, {"compact": True, "comments": False}):
+            assert connection.convert(SOURCE, **options) \
+                == aio.convert_text(SOURCE, **options)
+
+        with pytest.raises(client.Conversion_Error):
+            connection.convert(SOURCE, output_format = "xml")
+
+        # the connection is still usable
+        assert connection.convert(SOURCE) == aio.convert_text(SOURCE)
+
+def test_convert_fallback(tmp_path):
+    missing = str(tmp_path / "missing.sock")
+
+    assert client.convert(SOURCE, address = missing, output_format = "kail") \
+        == aio.convert_text(SOURCE, output_format = "kail")
+
+    with pytest.raises(OSError):
+        client.convert(SOURCE, address = missing, fallback = False)
+
+def test_get_default_address(monkeypatch):
+    monkeypatch.delenv(client.SOCKET_VARIABLE, raising = False)
+    monkeypatch.setenv(client.PORT_VARIABLE, "9000")
+    assert client.get_default_address() == (client.DEFAULT_HOST, 9000)
+
+    monkeypatch.setenv(client.SOCKET_VARIABLE, "/tmp/kail.sock")
+    assert client.get_default_address() == "/tmp/kail.sock"
+
+def test_serve_keeps_what_it_did_not_bind(tmp_path):
+    path = tmp_path / "kail.sock"
+    path.write_text("not a socket")
+
+    with pytest.raises(OSError):
+        aio.serve(unix_path = str(path))
+
+    assert path.read_text() == "not a socket"
@@ -0,0 +1,259 @@
+import io
+import os
+
+import pytest
+
+import kail.structures as strs
+import kail.conversion as conv
+import kail.cache as cache
+
+def test_convert_stream_round_trip():
+    source = "(S (NP (N 太郎))\n   (ID 1;test))\n\n(S (VB 走っ))"
+
+    kail_text = io.StringIO()
+    conv.convert_stream(io.StringIO(source), kail_text, output_format = "kail")
+
+    penn_text = io.StringIO()
+    conv.convert_stream(io.StringIO(kail_text.getvalue()), penn_text, input_format = "kail")
+
+    assert penn_text.getvalue() == source
+
+def test_convert_trees_compact_leaves_trees_unchanged():
+    source = "(S (NP (N 太郎)\n;;a\n)\n;;b\n(VB 走っ))"
+    tree = next(strs.TreeWithParent.iter_kai_penn(io.StringIO(source)))
+    before = tree.print_kai_penn_indented()
+
+    result = io.StringIO()
+    assert conv.convert_trees([tree], result, compact = True) == 3
+
+    assert result.getvalue() == "(S (NP (N 太郎)) (VB 走っ))\n;;a\n;;b"
+    assert tree.print_kai_penn_indented() == before
+    assert tree.get_parent() is None
+
+def test_convert_trees_twice_with_comment_placements():
+    source = "(S (NP (N 太郎)\n;;a\n)\n(VB 走っ))"
+    trees = list(strs.TreeWithParent.iter_kai_penn(io.StringIO(source)))
+
+    pretty, compact = io.StringIO(), io.StringIO()
+    conv.convert_trees(trees, pretty, comment_placement = "raise_out")
+    conv.convert_trees(trees, compact, compact = True, comment_placement = "hide")
+
+    assert pretty.getvalue() == "(S (NP (N 太郎))\n   (VB 走っ))\n\n;;a"
+    assert compact.getvalue() == "(S (NP (N 太郎)) (VB 走っ))"
+
+def test_raise_comments_out_keeps_pre_order():
+    source = "(S (NP (N 太郎)\n;;a\n)\n;;b\n(VB (VB0 走っ)\n;;c\n))"
+    tree = next(strs.TreeWithParent.iter_kai_penn(io.StringIO(source)))
+    document = strs.TreeWithParent(None, children = [tree])
+
+    tree.raise_comments_out()
+
+    assert [item.print_kai_penn_squeezed() for item in document] \
+        == ["(S (NP (N 太郎)) (VB (VB0 走っ)))", ";;a", ";;b", ";;c"]
+
+def test_iter_batch_jobs(tmp_path):
+    (tmp_path / "in" / "sub").mkdir(parents = True)
+    for name in ("a.psd", "sub/b.kai", "notes.txt"):
+        (tmp_path / "in" / name).write_text("(S (NP x))\n")
+
+    jobs = list(
+        conv.iter_batch_jobs(
+            [str(tmp_path / "in"), str(tmp_path / "in" / "*.psd")],
+            str(tmp_path / "out"),
+            output_format = "kail"
+            )
+        )
+
+    assert jobs == [
+        (str(tmp_path / "in" / "a.psd"), str(tmp_path / "out" / "a.kail")),
+        (str(tmp_path / "in" / "sub" / "b.kai"), str(tmp_path / "out" / "sub" / "b.kail")),
+    ]
+
+@pytest.mark.parametrize("processes", (1, 2))
+def test_convert_files_reports_errors_in_order(tmp_path, processes):
+    inputs = []
+    for name, text in (
+        ("a.kail", "S\n  VB\n    走っ\n"),
+        ("bad.kail", "S\n    NP\n  VB\n"),
+        ("c.kail", "S\n  NP\n    太郎\n"),
+        ):
+        (tmp_path / name).write_text(text)
+        inputs.append(str(tmp_path / name))
+
+    results = list(
+        conv.convert_files(
+            conv.iter_batch_jobs(inputs, str(tmp_path / "out"), input_format = "kail"),
+            processes = processes,
+            input_format = "kail",
+            compact = True
+            )
+        )
+
+    assert [os.path.basename(input_path) for input_path, _, _ in results] \
+        == ["a.kail", "bad.kail", "c.kail"]
+    assert [error is None for _, _, error in results] == [True, False, True]
+    assert "Line 3" in results[1][2]
+    assert not os.path.exists(results[1][1])
+    assert (tmp_path / "out" / "c.psd").read_text() == "(S (NP 太郎))"
+
+def test_convert_files_never_overwrites_inputs(tmp_path):
+    for name in ("a/x.psd", "b/x.psd", "a/y.psd"):
+        (tmp_path / name).parent.mkdir(exist_ok = True)
+        (tmp_path / name).write_text("(S (NP x))\n")
+
+    inputs = [str(tmp_path / name) for name in ("a/x.psd", "b/x.psd", "a/y.psd")]
+
+    # the outputs of the first two are the same,
+    # and the last one would be written over itself
+    jobs = list(conv.iter_batch_jobs(inputs, str(tmp_path / "out")))
+    jobs[2] = (inputs[2], inputs[2])
+
+    results = list(conv.convert_files(jobs, processes = 1))
+
+    assert [error is not None for _, _, error in results] == [True, True, True]
+    assert "shared" in results[0][2] and "shared" in results[1][2]
+    assert "overwrite" in results[2][2]
+    assert not (tmp_path / "out" / "x.psd").exists()
+    assert (tmp_path / "a" / "y.psd").read_text() == "(S (NP x))\n"
+
+def test_check_batch_jobs_through_links(tmp_path):
+    (tmp_path / "in.psd").write_text("(S (NP x))\n")
+    os.link(tmp_path / "in.psd", tmp_path / "hard.psd")
+    os.symlink(tmp_path, tmp_path / "link")
+
+    input_path = str(tmp_path / "in.psd")
+    conflicts = conv.check_batch_jobs([
+        (input_path, str(tmp_path / "hard.psd")),
+        (input_path, str(tmp_path / "link" / "in.psd")),
+        (input_path, str(tmp_path / "out.psd")),
+    ])
+
+    assert [conflict is None for conflict in conflicts] == [False, False, True]
+
+def test_scan_tree_spans():
+    penn = "(S (NP x)\n   (VB y))\n;; note\n(S (VB z))\n".encode("utf-8")
+    assert [row for _, _, row in conv.scan_tree_spans(io.BytesIO(penn))] == [0, 2, 3]
+
+    kail = "S\n  VB\n    走っ\n# note\nS\n  NP\n".encode("utf-8")
+    spans = list(conv.scan_tree_spans(io.BytesIO(kail), "kail"))
+    assert [row for _, _, row in spans] == [0, 4]
+    assert sum(length for _, length, _ in spans) == len(kail)
+
+@pytest.mark.parametrize(
+    "input_name, options", 
+    (
+        ("sample_correct.psd", {}),
+        ("sample_correct.psd", {"compact": True, "comments": False}),
+        ("sample_correct.kail", {"input_format": "kail", "output_format": "kail"}),
+    )
+)
+def test_convert_file_parallel_agrees(input_name, options):
+    input_path = os.path.join(os.path.dirname(__file__), input_name)
+
+    expected = io.StringIO()
+    with open(input_path, encoding = "utf-8") as input_file:
+        conv.convert_stream(input_file, expected, **options)
+
+    result = io.StringIO()
+    conv.convert_file_parallel(input_path, result, processes = 2, chunk_size = 64, **options)
+
+    assert result.getvalue() == expected.getvalue()
+
+def test_convert_mapped_file(tmp_path):
+    source = "(S (NP (N 太郎))\n   (ID 1;test))\n\n(S (VB 走っ))"
+    (tmp_path / "a.psd").write_bytes(source.encode("utf-8"))
+    (tmp_path / "empty.psd").write_bytes(b"")
+
+    result = io.StringIO()
+    assert conv.convert_mapped_file(str(tmp_path / "a.psd"), result) == 2
+    assert result.getvalue() == source
+
+    assert conv.convert_mapped_file(str(tmp_path / "empty.psd"), io.StringIO()) == 0
+
+@pytest.mark.parametrize("options", ({}, {"compact": True}, {"output_format": "kail"}))
+def test_convert_cached_file(tmp_path, options):
+    input_path = str(tmp_path / "a.psd")
+    cache_dir = str(tmp_path / "cache")
+
+    def convert(text):
+        with open(input_path, "w", encoding = "utf-8") as input_file:
+            input_file.write(text)
+
+        expected = io.StringIO()
+        conv.convert_stream(io.StringIO(text), expected, **options)
+
+        for _ in range(2):
+            # parsed, and then loaded from the cache
+            result = io.StringIO()
+            conv.convert_cached_file(input_path, result, cache_dir = cache_dir, **options)
+            assert result.getvalue() == expected.getvalue()
+
+    convert("(S (NP (N 太郎) ;;taro\n) (VB 走っ))\n;; note\n(S (VB 寝)) ")
+    # the same size, but changed
+    convert("(S (NP (N 花子) ;;taro\n) (VB 走っ))\n;; note\n(S (VB 寝)) ")
+
+def test_prune_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+
+    # from the least recently used
+    for number, suffix in enumerate((".forest", ".outputs", ".forest", ".txt")):
+        path = cache_dir / "{}{}".format(number, suffix)
+        path.write_bytes(b"x" * 100)
+        os.utime(path, ns = (number * 10**9, number * 10**9))
+
+    assert cache.prune_cache(str(cache_dir), size_limit = 250) == 1
+    assert sorted(path.name for path in cache_dir.iterdir()) \
+        == ["1.outputs", "2.forest", "3.txt"]
+
+    assert cache.prune_cache(str(cache_dir), size_limit = 0) == 2
+    assert [path.name for path in cache_dir.iterdir()] == ["3.txt"]
+
+def test_convert_file_incremental(tmp_path, monkeypatch):
+    input_path = str(tmp_path / "a.kail")
+    cache_dir = str(tmp_path / "cache")
+    options = {"input_format": "kail", "compact": True}
+
+    converted = []
+    convert_bytes = conv.convert_bytes
+    def convert_bytes_logged(data, first_row, options):
+        converted.append(first_row)
+        return convert_bytes(data, first_row, options)
+    monkeypatch.setattr(conv, "convert_bytes", convert_bytes_logged)
+
+    def convert(text):
+        with open(input_path, "w", encoding = "utf-8") as input_file:
+            input_file.write(text)
+
+        expected = io.StringIO()
+        conv.convert_stream(io.StringIO(text), expected, **options)
+
+        result = io.StringIO()
+        conv.convert_file_incremental(input_path, result, cache_dir = cache_dir, **options)
+        assert result.getvalue() == expected.getvalue()
+
+    convert("S\n  NP\n    太郎 # taro\nS\n  VB\n    走っ\nS\n  VB\n    寝\n")
+    assert converted == [0, 3, 6]
+
+    del converted[:]
+    convert("S\n  NP\n    太郎 # taro\nS\n  VB\n    歩い\nS\n  VB\n    寝\n")
+    assert converted == [3]
+
+def test_convert_stream_multi_agrees_with_convert_stream():
+    source = "(S (NP (N 太郎)\n;;a\n)\n(VB 走っ))\n;; b\n(S (VB 走っ))"
+
+    outputs = [(variant, io.StringIO()) for variant in conv.OUTPUT_VARIANTS]
+    counts = conv.convert_stream_multi(io.StringIO(source), outputs)
+
+    for (variant, result), count in zip(outputs, counts):
+        output_format, compact = conv.OUTPUT_VARIANTS[variant]
+        expected = io.StringIO()
+
+        assert count == conv.convert_stream(
+            io.StringIO(source), expected, output_format = output_format, compact = compact
+            )
+        assert result.getvalue() == expected.getvalue()
+
+def test_convert_stream_multi_unknown_variant():
+    with pytest.raises(ValueError):
+        conv.convert_stream_multi(io.StringIO(""), [("xml", io.StringIO())])
@@ -0,0 +1,77 @@
+import io
+import os
+import shutil
+
+import pytest
+
+import kail.structures as strs
+import kail.index as ix
+
+@pytest.fixture
+def sample_correct_psd_path(tmp_path):
+    path = str(tmp_path / "sample_correct.psd")
+    shutil.copy(os.path.join(os.path.dirname(__file__), "sample_correct.psd"), path)
+
+    return path
+
+def test_fetch_agrees_with_parse(sample_correct_psd_path):
+    index = ix.write_index(sample_correct_psd_path)
+    assert os.path.exists(ix.get_index_path(sample_correct_psd_path))
+
+    with open(sample_correct_psd_path, encoding = "utf-8") as input_file:
+        trees = {
+            ix.get_tree_ID(tree): tree.print_kai_penn_squeezed()
+            for tree in strs.TreeWithParent.iter_kai_penn(input_file)
+        }
+    trees.pop(None, None)
+
+    assert list(index["entries"]) == list(trees)
+
+    IDs = ["12_aozora_Akutagawa-1922;JP", "3_aozora_Akutagawa-1922;JP"]
+    fetched = [
+        tree.print_kai_penn_squeezed()
+        for tree in ix.iter_fetched_trees(sample_correct_psd_path, IDs)
+    ]
+    assert fetched == [trees[ID] for ID in IDs]
+
+    with pytest.raises(KeyError):
+        list(ix.iter_fetched_trees(sample_correct_psd_path, ["nowhere"]))
+
+def test_stale_index(sample_correct_psd_path):
+    ix.write_index(sample_correct_psd_path)
+
+    with open(sample_correct_psd_path, "a", encoding = "utf-8") as input_file:
+        input_file.write("\n(S (ID appended))\n")
+
+    with pytest.raises(ix.Stale_Index_Error):
+        ix.load_index(sample_correct_psd_path)
+
+def test_stale_index_same_size_and_mtime(sample_correct_psd_path):
+    ix.write_index(sample_correct_psd_path)
+    stat = os.stat(sample_correct_psd_path)
+
+    with open(sample_correct_psd_path, "rb") as input_file:
+        data = input_file.read()
+    with open(sample_correct_psd_path, "wb") as input_file:
+        input_file.write(data.replace("トロッコ".encode("utf-8"), "とろっこ".encode("utf-8"), 1))
+    os.utime(sample_correct_psd_path, ns = (stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert os.path.getsize(sample_correct_psd_path) == stat.st_size
+    with pytest.raises(ix.Stale_Index_Error):
+        ix.load_index(sample_correct_psd_path)
+
+def test_fetch_with_index_out_of_date(sample_correct_psd_path):
+    # the file is changed after the index has been checked
+    index = ix.write_index(sample_correct_psd_path)
+
+    with open(sample_correct_psd_path, "rb") as input_file:
+        data = input_file.read()
+    with open(sample_correct_psd_path, "wb") as input_file:
+        input_file.write(b"\n\n" + data)
+
+    with pytest.raises(ix.Stale_Index_Error):
+        list(
+            ix.iter_fetched_trees(
+                sample_correct_psd_path, ["3_aozora_Akutagawa-1922;JP"], index = index
+                )
+            )
@@ -0,0 +1,79 @@
+import io
+import os
+import shutil
+
+import pytest
+
+import kail.structures as strs
+import kail.pattern as pat
+
+TREE_TEXT = "(S (NP-SBJ (NPR 太郎)\n    ;;taro\n) (PP (NP (N 学校)) (P-ROLE に)) (VB 行っ) (AX た))"
+
+@pytest.fixture(
+    scope = "module"
+)
+def tree():
+    return next(strs.TreeWithParent.iter_kai_penn(io.StringIO(TREE_TEXT)))
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    (
+        ("NP-SBJ", ["(NP-SBJ (NPR 太郎))"]),
+        ("__ < NPR", ["(NP-SBJ (NPR 太郎))"]),
+        ("/^N/ !< __", []),
+        ("/^N/ >> PP", ["(NP (N 学校))", "(N 学校)"]),
+        ("__ <: (N < 学校)", ["(NP (N 学校))"]),
+        ("VB $- PP $+ AX", ["(VB 行っ)"]),
+        ("__ $++ VB", ["(NP-SBJ (NPR 太郎))", "(PP (NP (N 学校)) (P-ROLE に))"]),
+        ("PP . VB", ["(PP (NP (N 学校)) (P-ROLE に))"]),
+        ("PP .. __ , P-ROLE", []),
+        ("__ , P-ROLE", ["(VB 行っ)", "行っ"]),
+        ("S <, NP-SBJ <- AX", ["(S (NP-SBJ (NPR 太郎)) (PP (NP (N 学校)) (P-ROLE に)) (VB 行っ) (AX た))"]),
+        ("NP|PP < N | < P-ROLE", ["(PP (NP (N 学校)) (P-ROLE に))", "(NP (N 学校))"]),
+        ("__ [< N | < NPR] > __", ["(NP-SBJ (NPR 太郎))", "(NP (N 学校))"]),
+        ("NP <<- !N", ["(NP (N 学校))"]),
+        ("NP <<- !/^(N|学校)$/", []),
+    )
+)
+def test_match(tree, pattern, expected):
+    assert [
+        found.node.print_kai_penn_squeezed(show_comments = False)
+        for found in pat.compile_pattern(pattern).iter_matches(tree)
+    ] == expected
+
+def test_named_nodes(tree):
+    found, = pat.compile_pattern("PP=pp < (NP=np < N=n) ?< NPR=absent").iter_matches(tree)
+
+    assert sorted(found.named) == ["n", "np", "pp"]
+    assert found.named["n"].print_kai_penn_squeezed() == "(N 学校)"
+    assert found.named["pp"] is found.node
+
+    assert list(pat.compile_pattern("NP=a > (PP < =a)").iter_matches(tree))
+    assert not list(pat.compile_pattern("NP=a > (PP < (P-ROLE == =a))").iter_matches(tree))
+
+@pytest.mark.parametrize("pattern", ("NP <", "(NP < N", "NP < /[/", "< NP", "NP # N"))
+def test_syntax_error(pattern):
+    with pytest.raises(SyntaxError):
+        pat.Pattern(pattern)
+
+def test_required_labels():
+    assert pat.Pattern("NP < (PP|VP !< N) ?< X [< Y | < Z]").required_labels \
+        == [frozenset({"NP"}), frozenset({"PP", "VP"})]
+
+def test_search_file_agrees_with_search(tmp_path, monkeypatch):
+    monkeypatch.setenv("KAIL_CACHE_DIR", str(tmp_path / "cache"))
+
+    path = str(tmp_path / "sample_correct.psd")
+    shutil.copy(os.path.join(os.path.dirname(__file__), "sample_correct.psd"), path)
+
+    pattern = pat.compile_pattern("PP-SBJ < (NP < NPR) $+ __")
+    with open(path, encoding = "utf-8") as input_file:
+        expected = [
+            found.node.print_kai_penn_squeezed() 
+            for found in pattern.search(strs.TreeWithParent.iter_kai_penn(input_file))
+        ]
+
+    assert expected
+    assert [
+        found.node.print_kai_penn_squeezed() for found in pattern.search_file(path)
+    ] == expected
@@ -0,0 +1,90 @@
+import os
+import shutil
+
+import pytest
+
+import kail.structures as strs
+import kail.search as search
+
+@pytest.fixture
+def sample_correct_psd_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("KAIL_CACHE_DIR", str(tmp_path / "cache"))
+
+    path = str(tmp_path / "sample_correct.psd")
+    shutil.copy(os.path.join(os.path.dirname(__file__), "sample_correct.psd"), path)
+
+    return path
+
+def find_by_traversal(path, predicate):
+    with open(path, encoding = "utf-8") as input_file:
+        return [
+            (
+                tree.print_kai_penn_squeezed(), 
+                [node.print_kai_penn_squeezed() for node in nodes]
+            )
+            for tree in strs.TreeWithParent.iter_kai_penn(input_file)
+            for nodes in [list(filter(predicate, tree.traverse_dfs_pre()))]
+            if nodes
+        ]
+
+@pytest.mark.parametrize(
+    "conditions, predicate",
+    (
+        (
+            {"label": "NP", "sort_info": "*SBJ*"},
+            lambda node: len(node) and node.get_label().label.content == "NP" 
+                and node.get_label().sort_info.content == "*SBJ*"
+        ),
+        (
+            {"has_ICHed": True},
+            lambda node: len(node) and isinstance(node.get_label(), strs.Label_Complex_with_Pos)
+                and node.get_label().ICHed.content > 0
+        ),
+        (
+            {"word": "トロッコ"},
+            lambda node: not len(node) and isinstance(node.get_label(), strs.Label_Complex_with_Pos)
+                and node.get_label().print_kai_penn() == "トロッコ"
+        ),
+    )
+)
+def test_search_agrees_with_traversal(sample_correct_psd_path, conditions, predicate):
+    expected = find_by_traversal(sample_correct_psd_path, predicate)
+    assert expected
+
+    for _ in range(2):
+        # built, and then loaded
+        found = [
+            (
+                tree.print_kai_penn_squeezed(), 
+                [node.print_kai_penn_squeezed() for node in nodes]
+            )
+            for tree, nodes in search.search(sample_correct_psd_path, **conditions)
+        ]
+
+        assert found == expected
+        assert os.path.exists(search.get_label_index_path(sample_correct_psd_path))
+
+def test_search_after_same_size_edit(sample_correct_psd_path):
+    assert list(search.search(sample_correct_psd_path, word = "トロッコ"))
+    stat = os.stat(sample_correct_psd_path)
+
+    with open(sample_correct_psd_path, "rb") as input_file:
+        data = input_file.read()
+    with open(sample_correct_psd_path, "wb") as input_file:
+        input_file.write(data.replace("トロッコ".encode("utf-8"), "とろっこ".encode("utf-8")))
+    os.utime(sample_correct_psd_path, ns = (stat.st_atime_ns, stat.st_mtime_ns))
+
+    expected = find_by_traversal(
+        sample_correct_psd_path,
+        lambda node: not len(node) and node.get_label().print_kai_penn() == "とろっこ"
+        )
+    assert expected
+
+    assert list(search.search(sample_correct_psd_path, word = "トロッコ")) == []
+    assert [
+        (
+            tree.print_kai_penn_squeezed(), 
+            [node.print_kai_penn_squeezed() for node in nodes]
+        )
+        for tree, nodes in search.search(sample_correct_psd_path, word = "とろっこ")
+    ] == expected
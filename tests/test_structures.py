@@ -0,0 +1,437 @@
+import io
+import re
+import sys
+import random
+
+import pytest
+
+import kail.structures as strs
+import kail.columnar as col
+
+@pytest.fixture(
+    scope = "module"
+)
+def sample_correct_kai_penn_text():
+    with open("./tests/sample_correct.psd") as f:
+        return f.read()
+
+def test_iter_kai_penn_yields_each_tree_before_eof():
+    lines_read = []
+
+    def stream():
+        for line in (
+            "(S (NP (N 太郎))\n",
+            "   (ID 1;test)) ;; after\n",
+            ";; between\n",
+            "(S (VB 走っ))\n",
+            ):
+            lines_read.append(line)
+            yield line
+
+    trees = strs.TreeWithParent.iter_kai_penn(stream())
+
+    first = next(trees)
+    assert len(lines_read) == 2
+    assert first.get_parent() is None
+    assert first.print_kai_penn_squeezed(show_comments = False) \
+        == "(S (NP (N 太郎)) (ID 1;test))"
+
+    rest = list(trees)
+    assert [str(tree.get_label()) for tree in rest] == [";; between", "S"]
+
+def test_iter_kai_penn_agrees_with_parse_kai_penn(sample_correct_kai_penn_text):
+    streamed = [
+        tree.print_kai_penn_indented()
+        for tree in strs.TreeWithParent.iter_kai_penn(
+            io.StringIO(sample_correct_kai_penn_text)
+            )
+    ]
+    parsed = [
+        tree.print_kai_penn_indented()
+        for tree in strs.TreeWithParent.parse_kai_penn(
+            io.StringIO(sample_correct_kai_penn_text)
+            )
+    ]
+
+    assert streamed == parsed
+
+def test_iter_kai_penn_bytes_agrees_with_iter_kai_penn(sample_correct_kai_penn_text):
+    from_text = [
+        tree.print_kai_penn_indented()
+        for tree in strs.TreeWithParent.iter_kai_penn(
+            io.StringIO(sample_correct_kai_penn_text)
+            )
+    ]
+    from_bytes = [
+        tree.print_kai_penn_indented()
+        for tree in strs.TreeWithParent.iter_kai_penn_bytes(
+            sample_correct_kai_penn_text.encode("utf-8")
+            )
+    ]
+
+    assert from_bytes == from_text
+
+def test_iter_kail_yields_each_tree_when_next_one_begins():
+    lines_read = []
+
+    def stream():
+        for line in (
+            "S\n",
+            "  NP\n",
+            "    太郎\n",
+            "  # after\n",
+            "S\n",
+            "  VB\n",
+            "    走っ\n",
+            ):
+            lines_read.append(line)
+            yield line
+
+    trees = strs.TreeWithParent.iter_kail(stream())
+
+    first = next(trees)
+    assert len(lines_read) == 5
+    assert first.get_parent() is None
+    assert first.print_kai_penn_squeezed() == "(S (NP (太郎 ;; after)))"
+
+    second = next(trees)
+    assert second.print_kai_penn_squeezed() == "(S (VB 走っ))"
+    assert second[0].get_label().label.row == 5
+
+    assert list(trees) == []
+
+@pytest.mark.parametrize(
+    ("line", "tokens"),
+    (
+        (
+            "(NP (N 太郎))",
+            [("(", 0), ("NP", 1), ("(", 4), ("N", 5), ("太郎", 7), (")", 9), (")", 10)]
+        ),
+        (
+            "((S (NP(N 太郎)))",
+            [
+                ("(", 0), ("(", 1), ("S", 2), ("(", 4), ("NP", 5), ("(", 7), ("N", 8),
+                ("太郎", 10), (")", 12), (")", 13), (")", 14)
+            ]
+        ),
+        # a bare word at the beginning of the line
+        (
+            "太郎)) \t(ID 1;x)",
+            [("太郎", 0), (")", 2), (")", 3), ("(", 6), ("ID", 7), ("1;x", 10), (")", 13)]
+        ),
+        ("太郎", [("太郎", 0)]),
+        ("  \t", []),
+    )
+)
+def test_tokenize_kai_penn(line, tokens):
+    assert strs.TreeWithParent.tokenize_kai_penn(line) == tokens
+
+def test_iter_kai_penn_keeps_leading_bare_word():
+    tree, = strs.TreeWithParent.iter_kai_penn(io.StringIO("(S (N\n太郎))\n"))
+
+    assert tree.print_kai_penn_squeezed() == "(S (N 太郎))"
+
+    leaf = tree[0][0].get_label().label
+    assert (leaf.content, leaf.row, leaf.column) == ("太郎", 1, 0)
+
+def test_parse_label_complex_kai_penn_cached_keeps_rows():
+    first = strs.Label_Complex_with_Pos.parse_from_kai_penn("NP-SBJ-2;{TARO}", 3)
+    second = strs.Label_Complex_with_Pos.parse_from_kai_penn("NP-SBJ-2;{TARO}", 8)
+
+    assert first.print_kail() == second.print_kail() == "NP-SBJ 2 {TARO}"
+    assert (first.label.row, second.label.row) == (3, 8)
+    assert (second.label.column, second.ICHed.column, second.sort_info.column) \
+        == (0, 7, 9)
+
+def test_print_label_complex_after_mutation():
+    label_complex = strs.Label_Complex_with_Pos.parse_from_kai_penn("NP-SBJ-2;{TARO}")
+    assert label_complex.print_kai_penn() == "NP-SBJ-2;{TARO}"
+
+    label_complex.ICHed.content = 0
+    assert label_complex.print_kai_penn() == "NP-SBJ;{TARO}"
+    assert label_complex.print_kail() == "NP-SBJ 0 {TARO}"
+
+    label_complex.sort_info = strs.Object_with_Row_Column("", -1, -1)
+    assert label_complex.print_kai_penn() == label_complex.print_kail() == "NP-SBJ"
+
+@pytest.mark.parametrize(
+    ("text", "columns"),
+    (
+        ("NP-SBJ 2 {TARO}", (0, 7, 9)),
+        ("    NP-SBJ 2 {TARO}", (4, 11, 13)),
+        ("\t NP-SBJ", (2, -1, -1)),
+    )
+)
+def test_parse_label_complex_kail_columns(text, columns):
+    label_complex = strs.Label_Complex_with_Pos.parse_from_kail(text, 5)
+
+    assert (
+        label_complex.label.column, 
+        label_complex.ICHed.column, 
+        label_complex.sort_info.column
+        ) == columns
+    assert label_complex.label.row == 5
+
+def test_parse_label_complex_kail_redundant():
+    with pytest.raises(SyntaxError, match = "Line 4, Column 10"):
+        strs.Label_Complex_with_Pos.parse_from_kail("   A 1 B C", 3)
+
+def test_columnar_forest_agrees_with_tree_with_parent(sample_correct_kai_penn_text):
+    trees = list(
+        strs.TreeWithParent.iter_kai_penn(io.StringIO(sample_correct_kai_penn_text))
+        )
+    forest = col.ColumnarForest.parse_kai_penn(io.StringIO(sample_correct_kai_penn_text))
+
+    assert len(forest.roots) == len(trees)
+    assert len(forest) == sum(
+        sum(1 for _ in tree.traverse_dfs_pre()) for tree in trees
+        )
+
+    for tree, root in zip(trees, forest.roots):
+        assert forest.print_kai_penn_indented(root) == tree.print_kai_penn_indented()
+        assert forest.print_kail(root) == tree.print_kail()
+
+    for tree, converted in zip(trees, col.ColumnarForest.from_trees(trees).iter_trees()):
+        assert [repr(node.get_label()) for node in converted.traverse_dfs_pre()] \
+            == [repr(node.get_label()) for node in tree.traverse_dfs_pre()]
+
+def test_columnar_forest_parse_kail():
+    forest = col.ColumnarForest.parse_kail(
+        io.StringIO("S\n  NP-SBJ 2\n    太郎 # taro\n  VB\n    走っ\n")
+        )
+    root, = forest.roots
+
+    assert forest.print_kai_penn_squeezed(root) \
+        == "(S (NP-SBJ-2 ;; taro 太郎) (VB 走っ))"
+    assert [forest.row[node] for node in forest.traverse_dfs_pre(root)] \
+        == [0, 1, 2, 2, 3, 4]
+
+def test_columnar_forest_dump_load(sample_correct_kai_penn_text):
+    forest = col.ColumnarForest.parse_kai_penn(io.StringIO(sample_correct_kai_penn_text))
+
+    dumped = io.BytesIO()
+    forest.dump(dumped)
+    loaded = col.ColumnarForest.load(io.BytesIO(dumped.getvalue()))
+
+    assert loaded.labels == forest.labels
+    for name in (
+            "parent", "first_child", "last_child", "next_sibling", "label_id",
+            "row", "column", "ICHed_column", "sort_info_column", "roots",
+            ):
+        assert getattr(loaded, name) == getattr(forest, name)
+    assert [loaded.print_kai_penn_indented(root) for root in loaded.roots] \
+        == [forest.print_kai_penn_indented(root) for root in forest.roots]
+
+    with pytest.raises(ValueError):
+        col.ColumnarForest.load(io.BytesIO(dumped.getvalue()[:-1]))
+
+@pytest.mark.parametrize("name, beyond", [
+    ("first_child", 0), ("first_child", 5), ("next_sibling", 0), 
+    ("next_sibling", None),
+])
+def test_columnar_forest_load_broken_links(sample_correct_kai_penn_text, name, beyond):
+    forest = col.ColumnarForest.parse_kai_penn(io.StringIO(sample_correct_kai_penn_text))
+    # a link past the last node, or before the first one
+    getattr(forest, name)[1] = -3 if beyond is None else len(forest.parent) + beyond
+
+    dumped = io.BytesIO()
+    forest.dump(dumped)
+
+    with pytest.raises(ValueError):
+        col.ColumnarForest.load(io.BytesIO(dumped.getvalue()))
+
+def make_flat_tree(width: int) -> strs.TreeWithParent:
+    # the children are all equal to each other as deques
+    return strs.TreeWithParent(
+        strs.Label_Complex_with_Pos.parse_from_kai_penn("NP"),
+        children = [
+            strs.TreeWithParent(
+                strs.Label_Complex_with_Pos.parse_from_kai_penn("N{}".format(i)),
+                children = []
+                )
+            for i in range(width)
+            ]
+        )
+
+def assert_parent_indices(tree: strs.TreeWithParent):
+    for index, child in enumerate(tree):
+        assert child.get_parent() is tree
+        assert child.get_parent_index() == index
+        assert list(child.iter_left_siblings()) == list(tree)[:index]
+        assert list(child.iter_right_siblings()) == list(tree)[index + 1:]
+
+def test_parent_index_after_insert():
+    tree = make_flat_tree(5)
+    assert_parent_indices(tree)
+
+    new = strs.TreeWithParent(None, children = [])
+    tree.insert(2, new)
+
+    assert new.get_parent_index() == 2
+    assert_parent_indices(tree)
+
+def test_parent_index_after_remove():
+    tree = make_flat_tree(5)
+    assert_parent_indices(tree)
+
+    removed = tree[3]
+    assert tree.remove(removed) is removed
+
+    assert removed.get_parent() is None
+    assert str(tree[3].get_label()) == "N4"
+    assert_parent_indices(tree)
+
+    with pytest.raises(ValueError):
+        tree.remove(removed)
+
+def test_parent_index_after_pop():
+    tree = make_flat_tree(5)
+    assert_parent_indices(tree)
+
+    popped = tree.pop()
+    popped_left = tree.popleft()
+
+    assert popped.get_parent() is None
+    assert popped_left.get_parent() is None
+    assert [str(child.get_label()) for child in tree] == ["N1", "N2", "N3"]
+    assert_parent_indices(tree)
+
+def test_parent_index_after_appendleft():
+    tree = make_flat_tree(5)
+    assert_parent_indices(tree)
+
+    new = strs.TreeWithParent(None, children = [])
+    tree.appendleft(new)
+    tree.append(strs.TreeWithParent(None, children = []))
+
+    assert new.get_parent_index() == 0
+    assert_parent_indices(tree)
+
+def test_traverse_dfs_post():
+    tree, = strs.TreeWithParent.iter_kai_penn(
+        io.StringIO("(S (NP (N a)\n;;c\n(P b)) (VB d))")
+        )
+
+    assert [str(node.get_label()) for node in tree.traverse_dfs_post()] \
+        == ["a", "N", ";;c", "b", "P", "NP", "d", "VB", "S"]
+    assert [str(node.get_label()) for node in tree.traverse_dfs_pre()] \
+        == ["S", "NP", "N", "a", ";;c", "P", "b", "VB", "d"]
+
+def test_print_and_parse_deep_tree():
+    depth = sys.getrecursionlimit() + 1000
+    text = "(A " * depth + "x" + ")" * depth
+
+    tree, = strs.TreeWithParent.iter_kai_penn(io.StringIO(text))
+    assert tree.print_kai_penn_squeezed() == text
+    assert len(list(tree.traverse_dfs_post())) == depth + 1
+
+    indented, = strs.TreeWithParent.iter_kai_penn(io.StringIO(tree.print_kai_penn_indented()))
+    assert indented.print_kai_penn_squeezed() == text
+
+    kail, = strs.TreeWithParent.iter_kail(io.StringIO(tree.print_kail()))
+    assert kail.print_kai_penn_squeezed() == text
+
+def test_write_agrees_with_print(sample_correct_kai_penn_text):
+    for tree in strs.TreeWithParent.iter_kai_penn(io.StringIO(sample_correct_kai_penn_text)):
+        for method, kwargs in (
+            ("kai_penn_indented", {"show_comments": False}),
+            ("kai_penn_indented", {"indent": 4}),
+            ("kai_penn_squeezed", {}),
+            ("kail", {"indent_amount": 4}),
+            ):
+            out = io.StringIO()
+            getattr(tree, "write_" + method)(out, **kwargs)
+
+            assert out.getvalue() == getattr(tree, "print_" + method)(**kwargs)
+
+# labels, words and comments with whitespaces and parentheses in them
+SQUEEZE_TEXTS = ("NP", "太郎", " x", "y\t", "a b", "b　", "(", ")", "x(y)", "\n", "  ", "")
+
+def make_random_tree(rng: random.Random, depth: int = 0) -> strs.TreeWithParent:
+    def position(content):
+        return strs.Object_with_Row_Column(content, 0, 0)
+
+    label = strs.Label_Complex_with_Pos(
+        position(rng.choice(SQUEEZE_TEXTS)),
+        position(rng.choice((0, 0, 3))),
+        position(rng.choice(("", "{A B}", "*SBJ*")))
+        )
+
+    if depth > 4 or rng.random() < 0.3:
+        return strs.TreeWithParent(label, children = [])
+
+    children = [
+        strs.TreeWithParent(
+            strs.Comment_with_Pos(position(rng.choice(SQUEEZE_TEXTS))), children = []
+            )
+        if rng.random() < 0.25 else make_random_tree(rng, depth + 1)
+        for _ in range(rng.randint(1, 3))
+    ]
+
+    return strs.TreeWithParent(label, children = children)
+
+def test_print_kai_penn_squeezed_agrees_with_squeezing_indented():
+    rng = random.Random(0)
+
+    for _ in range(500):
+        tree = make_random_tree(rng)
+
+        for show_comments in (True, False):
+            # the one-line form used to be made by squeezing the indented one
+            expected = re.sub(
+                r"\s+", " ", tree.print_kai_penn_indented(show_comments = show_comments)
+                )
+
+            assert tree.print_kai_penn_squeezed(show_comments = show_comments) == expected
+
+            out = io.StringIO()
+            tree.write_kai_penn_squeezed(out, show_comments = show_comments)
+            assert out.getvalue() == expected
+
+def test_columnar_forest_printers_agree_with_trees():
+    rng = random.Random(1)
+    trees = [make_random_tree(rng) for _ in range(300)]
+    forest = col.ColumnarForest.from_trees(trees)
+
+    for tree, root in zip(trees, forest.roots):
+        for show_comments in (True, False):
+            for method in ("kai_penn_indented", "kai_penn_squeezed"):
+                expected = getattr(tree, "print_" + method)(show_comments = show_comments)
+                assert getattr(forest, "print_" + method)(root, show_comments = show_comments) \
+                    == expected
+
+                out = io.StringIO()
+                getattr(forest, "write_" + method)(out, root, show_comments = show_comments)
+                assert out.getvalue() == expected
+
+        out = io.StringIO()
+        forest.write_kail(out, root)
+        assert out.getvalue() == forest.print_kail(root) == tree.print_kail()
+
+@pytest.mark.parametrize(
+    ("comment_placement", "expected"),
+    (
+        ("inline", "(S (NP (N 太郎) ;;a) (VB 走っ) ;;b)"),
+        ("raise_out", "(S (NP (N 太郎)) (VB 走っ))\n;;a\n;;b"),
+        ("hide", "(S (NP (N 太郎)) (VB 走っ))"),
+    )
+)
+def test_print_comment_placement(comment_placement, expected):
+    tree = next(
+        strs.TreeWithParent.iter_kai_penn(
+            io.StringIO("(S (NP (N 太郎)\n;;a\n)\n(VB 走っ)\n;;b\n)")
+            )
+        )
+    before = tree.print_kai_penn_indented()
+
+    assert tree.print_kai_penn_squeezed(comment_placement = comment_placement) == expected
+
+    out = io.StringIO()
+    tree.write_kai_penn_squeezed(out, comment_placement = comment_placement)
+    assert out.getvalue() == expected
+
+    assert tree.print_kai_penn_indented() == before
+
+def test_print_comment_placement_unknown():
+    with pytest.raises(ValueError):
+        strs.TreeWithParent(None).print_kai_penn_squeezed(comment_placement = "above")
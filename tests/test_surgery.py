@@ -0,0 +1,105 @@
+import io
+
+import pytest
+
+import kail.structures as strs
+import kail.surgery as surgery
+
+TREE_TEXT = "(S (NP-SBJ (NPR 太郎)\n    ;;taro\n) (PP (NP (N 学校)) (P-ROLE に)) (VB 行っ) (AX た))"
+
+def transform(script, text = TREE_TEXT):
+    return [
+        item.print_kai_penn_squeezed()
+        for item in surgery.transform_trees(
+            strs.TreeWithParent.iter_kai_penn(io.StringIO(text)),
+            surgery.parse_script(script)
+            )
+    ]
+
+@pytest.mark.parametrize(
+    "script, expected",
+    (
+        (
+            "NP-SBJ=a\nrelabel a NP-OB1-3;{X}",
+            ["(S (NP-OB1-3;{X} (NPR 太郎) ;;taro) (PP (NP (N 学校)) (P-ROLE に)) (VB 行っ) (AX た))"]
+        ),
+        (
+            "NP=a > PP\ndelete a",
+            ["(S (NP-SBJ (NPR 太郎) ;;taro) (PP (P-ROLE に)) (VB 行っ) (AX た))"]
+        ),
+        (
+            "N=a\nprune a",
+            ["(S (NP-SBJ (NPR 太郎) ;;taro) (PP (P-ROLE に)) (VB 行っ) (AX た))"]
+        ),
+        (
+            "PP=p\nexcise p",
+            ["(S (NP-SBJ (NPR 太郎) ;;taro) (NP (N 学校)) (P-ROLE に) (VB 行っ) (AX た))"]
+        ),
+        (
+            "NP=n > PP=p\nexcise p n",
+            ["(S (NP-SBJ (NPR 太郎) ;;taro) (N 学校) (P-ROLE に) (VB 行っ) (AX た))"]
+        ),
+        (
+            "S=s\nexcise s",
+            ["(NP-SBJ (NPR 太郎) ;;taro)", "(PP (NP (N 学校)) (P-ROLE に))", "(VB 行っ)", "(AX た)"]
+        ),
+        ("S=s\ndelete s", []),
+        (
+            "VB=v $ NP-SBJ=n\nmove v $+ n",
+            ["(S (VB 行っ) (NP-SBJ (NPR 太郎) ;;taro) (PP (NP (N 学校)) (P-ROLE に)) (AX た))"]
+        ),
+        (
+            "VB=v > S=s\nmove v >-1 s",
+            ["(S (NP-SBJ (NPR 太郎) ;;taro) (PP (NP (N 学校)) (P-ROLE に)) (AX た) (VB 行っ))"]
+        ),
+        (
+            "% the rules are applied in order\n"
+            "S=s\ninsert (NP-SBJ (PRO *pro*)) >1 s\n\n"
+            "NP-SBJ=n < PRO\nrelabel n NP-SBJ2",
+            ["(S (NP-SBJ (NPR 太郎) ;;taro) (NP-SBJ2 (PRO *pro*)) (PP (NP (N 学校)) (P-ROLE に)) (VB 行っ) (AX た))"]
+        ),
+        (
+            # the second operation is skipped since the node has gone
+            "NP=a > PP=p\ndelete p\nrelabel a X",
+            ["(S (NP-SBJ (NPR 太郎) ;;taro) (VB 行っ) (AX た))"]
+        ),
+    )
+)
+def test_transform(script, expected):
+    assert transform(script) == expected
+
+def test_transform_keeps_unmatched_trees():
+    assert transform("X=x\ndelete x", "(A (B c))\n(D e)") == ["(A (B c))", "(D e)"]
+
+@pytest.mark.parametrize(
+    "script",
+    (
+        "NP=a\nrelabel b X",
+        "NP=a\nfoo a",
+        "NP=a",
+        "NP=a\nmove a >x a",
+        "NP=a\ninsert (X y) (Z w) $+ a",
+        "NP <\ndelete a",
+        "VB=v\ninsert (PRO *pro*))) >0 v",
+        "VB=v\ninsert ((PRO *pro*) >0 v",
+        "VB=v\ninsert (NP (PRO *pro*) >0 v",
+        "VB=v\ninsert (NP. (PRO *pro*)) >0 v",
+        "VB=v\ninsert *pro* >0 v",
+        "VB=v\nrelabel v NP(",
+        "VB=v\nrelabel v NP.",
+    )
+)
+def test_syntax_error(script):
+    with pytest.raises(SyntaxError, match = "at Line [12]$"):
+        surgery.parse_script(script)
+
+@pytest.mark.parametrize(
+    "script",
+    (
+        "NP-SBJ=n\nmove n >0 n",
+        "VB=v > S=s\nmove v >5 s",
+    )
+)
+def test_surgery_error(script):
+    with pytest.raises(surgery.Surgery_Error):
+        transform(script)